@@ -2,6 +2,9 @@
 """
 Recursively walk an unzipped Apigee API bundle, parse all XML files, and create a JSON file with each XML file as a separate entity containing all its information (no data loss).
 The JSON file will mirror the bundle structure and be placed under the respective unzipped API bundle folder.
+A bundle zip can be given instead of a directory: its XML members are parsed straight from the archive and the JSON is written next to the zip.
+With --ndjson the bundle is streamed instead: one apigee_bundle.ndjson line per XML file, large files parsed with
+iterparse and cleared as they go, so memory is bounded by the biggest single file rather than by the bundle.
 """
 
 import os
@@ -9,12 +12,20 @@ import sys
 import json
 import xml.etree.ElementTree as ET
 from collections import OrderedDict
+from bundle_fs import as_bundle_fs
+from bundle_model import as_bundle_model
+from xml_node import XmlNode, XmlNodeEncoder, node_from_element
+from bundle_json_sidecar import is_sidecar_enabled, write_sidecar
+
+# Files above this size are parsed incrementally in streaming mode
+LARGE_FILE_BYTES = 1024 * 1024
 
 def get_bundle_dir():
-    if len(sys.argv) != 2:
-        print("Usage: python apigee_bundle_xml2json.py <unzipped_api_bundle_dir>")
+    args = [a for a in sys.argv[1:] if a != '--ndjson']
+    if len(args) != 1:
+        print("Usage: python apigee_bundle_xml2json.py [--ndjson] <unzipped_api_bundle_dir|bundle.zip>")
         sys.exit(1)
-    return sys.argv[1]
+    return args[0]
 
 def xml_to_dict(elem):
     d = OrderedDict()
@@ -24,13 +35,40 @@ def xml_to_dict(elem):
     d['children'] = [xml_to_dict(child) for child in elem]
     return d
 
-def collect_xml_files(root_dir):
-    xml_files = []
-    for dirpath, _, filenames in os.walk(root_dir):
+def iterparse_to_node(source):
+    """
+    Same result as node_from_element(ET.parse(source).getroot()), built from iterparse events. Each element is
+    cleared once converted, so the parsed tree never exists in full next to its node form.
+    """
+    stack = []
+    root = None
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append((elem.tag, dict(elem.attrib), []))
+            continue
+        tag, attrib, children = stack.pop()
+        node = XmlNode(tag, attrib, elem.text.strip() if elem.text and elem.text.strip() else '', children)
+        if stack:
+            stack[-1][2].append(node)
+        else:
+            root = node
+        elem.clear()
+    return root
+
+def collect_xml_members(bundle):
+    """
+    Relative ('/'-separated) paths of all XML files in a bundle directory or zip.
+    """
+    fs = as_bundle_fs(bundle)
+    xml_members = []
+    for dirpath, _, filenames in fs.walk(''):
         for f in filenames:
             if f.lower().endswith('.xml'):
-                xml_files.append(os.path.join(dirpath, f))
-    return xml_files
+                xml_members.append(f"{dirpath}/{f}" if dirpath else f)
+    return xml_members
+
+def collect_xml_files(root_dir):
+    return [os.path.join(root_dir, *m.split('/')) for m in collect_xml_members(root_dir)]
 
 def parse_and_build_json(bundle_dir, xml_files):
     bundle_json = OrderedDict()
@@ -39,22 +77,99 @@ def parse_and_build_json(bundle_dir, xml_files):
         try:
             tree = ET.parse(xml_path)
             root = tree.getroot()
-            bundle_json[rel_path] = xml_to_dict(root)
+            bundle_json[rel_path] = node_from_element(root)
         except Exception as e:
             bundle_json[rel_path] = {'error': str(e)}
     return bundle_json
 
+def parse_members_and_build_json(bundle, xml_members):
+    fs = as_bundle_fs(bundle)
+    bundle_json = OrderedDict()
+    for member in xml_members:
+        try:
+            with fs.open(member) as f:
+                root = ET.parse(f).getroot()
+            bundle_json[member] = node_from_element(root)
+        except Exception as e:
+            bundle_json[member] = {'error': str(e)}
+    return bundle_json
+
+def build_json_from_model(model):
+    """
+    Same document as parse_members_and_build_json, built from an already parsed BundleModel.
+    """
+    bundle_json = OrderedDict()
+    for member in model.members:
+        if member in model.errors:
+            bundle_json[member] = {'error': model.errors[member]}
+        else:
+            bundle_json[member] = node_from_element(model.documents[member])
+    return bundle_json
+
+def get_json_dir(bundle):
+    """
+    Unzipped bundles keep apigee_bundle.json inside the bundle folder; zips get <zipname>/ next to the archive.
+    """
+    fs = as_bundle_fs(bundle)
+    if os.path.isdir(fs.source):
+        return fs.source
+    return os.path.join(os.path.dirname(fs.source), fs.name)
+
 def write_json(bundle_dir, bundle_json):
+    os.makedirs(bundle_dir, exist_ok=True)
     json_path = os.path.join(bundle_dir, 'apigee_bundle.json')
     with open(json_path, 'w') as f:
-        json.dump(bundle_json, f, indent=2)
+        json.dump(bundle_json, f, indent=2, cls=XmlNodeEncoder)
     print(f"Wrote {json_path} with {len(bundle_json)} XML entities.")
+    if is_sidecar_enabled():
+        write_sidecar(json_path, bundle_json)
+
+def iter_member_records(bundle, large_file_bytes=LARGE_FILE_BYTES):
+    """
+    Yield one {'path', 'entity'} record per XML member, parsing members one at a time.
+    """
+    fs = as_bundle_fs(bundle)
+    for member in collect_xml_members(fs):
+        try:
+            with fs.open(member) as f:
+                if fs.size(member) > large_file_bytes:
+                    entity = iterparse_to_node(f)
+                else:
+                    entity = node_from_element(ET.parse(f).getroot())
+        except Exception as e:
+            entity = {'error': str(e)}
+        yield {'path': member, 'entity': entity}
+
+def write_ndjson(bundle_dir, records):
+    """
+    Stream records to <bundle_dir>/apigee_bundle.ndjson, one JSON object per line. Returns the record count.
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+    ndjson_path = os.path.join(bundle_dir, 'apigee_bundle.ndjson')
+    count = 0
+    with open(ndjson_path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':'), cls=XmlNodeEncoder))
+            f.write('\n')
+            count += 1
+    print(f"Wrote {ndjson_path} with {count} XML entities.")
+    return count
+
+def read_ndjson(ndjson_path):
+    with open(ndjson_path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line, object_pairs_hook=OrderedDict)
 
 def apigee_bundle_xml2json():
     bundle_dir = get_bundle_dir()
-    xml_files = collect_xml_files(bundle_dir)
-    bundle_json = parse_and_build_json(bundle_dir, xml_files)
-    write_json(bundle_dir, bundle_json)
+    if '--ndjson' in sys.argv[1:]:
+        with as_bundle_fs(bundle_dir) as fs:
+            write_ndjson(get_json_dir(fs), iter_member_records(fs))
+        return
+    with as_bundle_model(bundle_dir) as model:
+        bundle_json = build_json_from_model(model)
+        write_json(get_json_dir(model.fs), bundle_json)
 
 if __name__ == "__main__":
     apigee_bundle_xml2json()
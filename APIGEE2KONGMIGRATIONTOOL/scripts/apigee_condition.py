@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Compiler for Apigee flow <Condition> expressions, lowered to Kong route matching fields.
+- Conditions are tokenised and parsed once into an AST (and/or/not, parentheses and the comparison operators
+  ==, !=, :=, =|/StartsWith, ~/ MatchesPath, ~~ JavaRegex, ~ Matches/Like, Contains, Equals, ...); compile_condition()
+  is cached.
+- The AST is normalised to disjunctive normal form; every conjunction becomes one RouteSpec with the request
+  verbs, path patterns and headers Kong's router can check by itself.
+- Comparisons Kong cannot express (response variables, numeric tests, negated path matches, ...) are kept as
+  residual source text so callers can flag them instead of silently widening the route.
+- Paths are emitted as anchored Kong 3 regex paths. For the traditional router: ~^<basePath>(?=<suffix>$), so
+  strip_path still strips only the base path, exactly like Apigee forwards proxy.pathsuffix to the target. ATC-based
+  routers have no lookaround: ~^<basePath>(?P<pathsuffix><suffix>)$, the capture being what the upstream path is
+  rewritten to.
+- Usage: python apigee_condition.py '<condition>' [<basePath>]
+"""
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+ALL_METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD")
+MAX_CONJUNCTIONS = 64
+
+Var = namedtuple('Var', 'name')
+Literal = namedtuple('Literal', 'value')
+Compare = namedtuple('Compare', 'op left right')
+Truthy = namedtuple('Truthy', 'operand')
+Not = namedtuple('Not', 'operand')
+And = namedtuple('And', 'operands')
+Or = namedtuple('Or', 'operands')
+
+# paths: suffix regexes under the base path; full_paths: regexes on the whole request path;
+# methods: allowed verbs or None for any; headers: ((name, (values...)), ...); residual: source text not lowered
+RouteSpec = namedtuple('RouteSpec', 'paths full_paths methods headers regex_priority residual')
+
+class ConditionError(ValueError):
+    pass
+
+OPERATORS = {
+    '==': 'eq', '=': 'eq', 'equals': 'eq', 'is': 'eq',
+    '!=': 'ne', 'notequals': 'ne', 'isnot': 'ne',
+    ':=': 'ieq', 'equalscaseinsensitive': 'ieq',
+    '=|': 'startswith', 'startswith': 'startswith',
+    '~/': 'matchespath', 'matchespath': 'matchespath', 'lowercasematchespath': 'matchespath',
+    '~~': 'javaregex', 'javaregex': 'javaregex',
+    '~': 'matches', 'matches': 'matches', 'like': 'matches',
+    'contains': 'contains',
+    '>': 'gt', 'greaterthan': 'gt', '>=': 'ge', 'greaterthanorequals': 'ge',
+    '<': 'lt', 'lesserthan': 'lt', '<=': 'le', 'lesserthanorequals': 'le',
+}
+NEGATED = {'eq': 'ne', 'ne': 'eq', 'gt': 'le', 'le': 'gt', 'lt': 'ge', 'ge': 'lt'}
+SYMMETRIC = ('eq', 'ne', 'ieq')
+KEYWORDS = {'and': 'and', '&&': 'and', 'or': 'or', '||': 'or', 'not': 'not', '!': 'not'}
+
+TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<symbol>==|!=|=\||:=|~~|~/|>=|<=|&&|\|\||[=~<>!()])
+  | (?P<word>[A-Za-z_$][\w.\-$]*|-?\d+(?:\.\d+)?)
+)''', re.X)
+
+def tokenize(text):
+    """
+    Split a condition into (kind, value) tokens: 'string', 'op', 'and', 'or', 'not', '(', ')', 'word'.
+    """
+    tokens, pos, text = [], 0, text.strip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ConditionError(f"Unexpected character {text[pos]!r} at {pos} in condition: {text}")
+        pos = m.end()
+        if m.group('string'):
+            tokens.append(('string', re.sub(r'\\(["\'])', r'\1', m.group('string')[1:-1])))
+            continue
+        value = m.group('symbol') or m.group('word')
+        lowered = value.lower()
+        if lowered in KEYWORDS:
+            tokens.append((KEYWORDS[lowered], value))
+        elif lowered in OPERATORS:
+            tokens.append(('op', OPERATORS[lowered]))
+        elif value in '()':
+            tokens.append((value, value))
+        else:
+            tokens.append(('word', value))
+    return tokens
+
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self, kind=None):
+        if self.pos >= len(self.tokens) or (kind and self.tokens[self.pos][0] != kind):
+            raise ConditionError(f"Expected {kind or 'a token'} at token {self.pos} in condition: {self.text}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ConditionError(f"Unexpected {self.tokens[self.pos][1]!r} in condition: {self.text}")
+        return node
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.peek() == 'or':
+            self.take()
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def parse_and(self):
+        operands = [self.parse_unary()]
+        while self.peek() == 'and':
+            self.take()
+            operands.append(self.parse_unary())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def parse_unary(self):
+        if self.peek() == 'not':
+            self.take()
+            return Not(self.parse_unary())
+        if self.peek() == '(':
+            self.take()
+            node = self.parse_or()
+            self.take(')')
+            return node
+        left = self.parse_operand()
+        if self.peek() != 'op':
+            return Truthy(left)
+        op = self.take()[1]
+        return Compare(op, left, self.parse_operand())
+
+    def parse_operand(self):
+        kind, value = self.take()
+        if kind == 'string':
+            return Literal(value)
+        if kind == 'word':
+            if re.fullmatch(r'-?\d+(?:\.\d+)?', value) or value.lower() in ('true', 'false', 'null'):
+                return Literal(value)
+            return Var(value)
+        raise ConditionError(f"Expected a variable or value, got {value!r} in condition: {self.text}")
+
+def parse_condition(text):
+    """
+    Parse an Apigee condition into an AST of Compare/Truthy/Not/And/Or nodes.
+    Raises:
+        ConditionError: If the condition is not valid Apigee condition syntax.
+    """
+    return _Parser(text).parse()
+
+def _dnf(node, negate=False):
+    """
+    Disjunctive normal form: list of conjunctions, each a tuple of (negated, Compare|Truthy) literals.
+    """
+    if isinstance(node, Not):
+        return _dnf(node.operand, not negate)
+    if isinstance(node, (And, Or)):
+        parts = [_dnf(operand, negate) for operand in node.operands]
+        if isinstance(node, Or) != negate:
+            return [conj for part in parts for conj in part]
+        result = [()]
+        for part in parts:
+            result = [conj + other for conj in result for other in part]
+            if len(result) > MAX_CONJUNCTIONS:
+                raise ConditionError('Condition too complex to lower to routes')
+        return result
+    return [((negate, node),)]
+
+def _source(negated, node):
+    if isinstance(node, Truthy):
+        text = _operand_source(node.operand)
+    else:
+        op = next(symbol for symbol, canonical in OPERATORS.items() if canonical == node.op)
+        text = f"{_operand_source(node.left)} {op} {_operand_source(node.right)}"
+    return f"!({text})" if negated else text
+
+def _operand_source(operand):
+    if isinstance(operand, Var):
+        return operand.name
+    if re.fullmatch(r'-?\d+(?:\.\d+)?', operand.value) or operand.value.lower() in ('true', 'false', 'null'):
+        return operand.value
+    return f'"{operand.value}"'
+
+def _glob_regex(pattern, one_segment):
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith('/**', i):
+            out.append('(?:/.*)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*' if one_segment else '.*')
+            i += 1
+        elif pattern[i] == '?' and not one_segment:
+            out.append('.')
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(out)
+
+def path_regex(op, value):
+    """
+    Unanchored regex matching a whole path for one comparison operator; None when op is not a path match.
+    """
+    if op == 'eq':
+        return re.escape(value)
+    if op == 'ieq':
+        return f"(?i:{re.escape(value)})"
+    if op == 'startswith':
+        return re.escape(value) + '.*'
+    if op == 'matchespath':
+        return _glob_regex(value, one_segment=True)
+    if op == 'matches':
+        return _glob_regex(value, one_segment=False)
+    if op == 'javaregex':
+        return f"(?:{value})"
+    if op == 'contains':
+        return f".*{re.escape(value)}.*"
+    return None
+
+def path_priority(op, value):
+    """
+    Specificity of a path match, used as Kong regex_priority: literal segments weigh most, single-segment
+    wildcards less, multi-segment wildcards and opaque regexes nothing; exact matches get a bonus.
+    """
+    if op in ('javaregex', 'contains'):
+        return 0
+    score = 0
+    for segment in (s for s in value.split('/') if s):
+        if '**' in segment:
+            continue
+        score += 1 if '*' in segment else 3
+    if op in ('eq', 'ieq'):
+        score += 2
+    elif op == 'matchespath' and '**' not in value:
+        score += 1
+    return score
+
+def _lower_conjunction(conj):
+    """
+    RouteSpec for one conjunction, or None if it can never match (e.g. two different verbs).
+    """
+    paths, full_paths, residual, headers = [], [], [], {}
+    methods, priority = None, 0
+    for negated, node in conj:
+        if isinstance(node, Truthy) or not isinstance(node.left, (Var, Literal)):
+            residual.append(_source(negated, node))
+            continue
+        op, left, right = node.op, node.left, node.right
+        if isinstance(left, Literal) and isinstance(right, Var) and op in SYMMETRIC:
+            left, right = right, left
+        if negated and op in NEGATED:
+            op, negated = NEGATED[op], False
+        if negated or not isinstance(left, Var) or not isinstance(right, Literal):
+            residual.append(_source(negated, node))
+            continue
+        var, value = left.name.lower(), right.value
+        if var == 'request.verb' and op in ('eq', 'ieq', 'ne'):
+            allowed = set(ALL_METHODS) - {value.upper()} if op == 'ne' else {value.upper()}
+            methods = allowed if methods is None else methods & allowed
+            if not methods:
+                return None
+        elif var in ('proxy.pathsuffix', 'request.path') and path_regex(op, value) is not None:
+            (paths if var == 'proxy.pathsuffix' else full_paths).append(path_regex(op, value))
+            priority += path_priority(op, value)
+        elif var.startswith('request.header.') and op in ('eq', 'ieq', 'startswith', 'javaregex', 'contains'):
+            name = left.name[len('request.header.'):].lower()
+            pattern = value if op in ('eq', 'ieq') else f"~*^{path_regex(op, value)}$"
+            if name in headers and headers[name] != pattern:
+                return None
+            headers[name] = pattern
+        else:
+            residual.append(_source(False, Compare(op, left, right)))
+    return RouteSpec(
+        paths=tuple(dict.fromkeys(paths)),
+        full_paths=tuple(dict.fromkeys(full_paths)),
+        methods=tuple(m for m in ALL_METHODS if m in methods) if methods is not None else None,
+        headers=tuple((name, (pattern,)) for name, pattern in sorted(headers.items())),
+        regex_priority=priority,
+        residual=tuple(residual),
+    )
+
+@lru_cache(maxsize=4096)
+def compile_condition(text):
+    """
+    Compile an Apigee condition to route specs, one per alternative of its disjunctive normal form.
+    Args:
+        text (str): Condition expression as written in <Condition>. (MANDATORY)
+    Returns:
+        tuple[RouteSpec]: Satisfiable alternatives; an empty tuple means the condition can never match.
+    Raises:
+        ConditionError: On invalid syntax, or when the condition expands to too many alternatives.
+    """
+    specs = (_lower_conjunction(conj) for conj in _dnf(parse_condition(text)))
+    return tuple(spec for spec in specs if spec is not None)
+
+SUFFIX_GROUP = 'pathsuffix'
+
+def route_paths(spec, base_paths, lookaround=True):
+    """
+    Kong paths for a spec under the endpoint's base paths: plain prefixes when the spec has no path match,
+    otherwise anchored regexes whose lookaheads keep the base path as the only stripped prefix.
+    Without lookaround (ATC-based routers) the path is matched in place instead: the suffix is captured as
+    (?P<pathsuffix>...) and only the first pattern is used, as several cannot be intersected (see needs_lookaround()).
+    """
+    if not spec.paths and not spec.full_paths:
+        return list(base_paths)
+    if not lookaround:
+        if not spec.paths:
+            return [f"~^(?:{spec.full_paths[0]})$"]
+        return [f"~^{re.escape(bp.rstrip('/'))}(?P<{SUFFIX_GROUP}>{spec.paths[0]})$" for bp in base_paths]
+    full = ''.join(f"(?={p}$)" for p in spec.full_paths)
+    suffix = ''.join(f"(?={p}$)" for p in spec.paths)
+    if not spec.paths:
+        return [f"~^{full}"]
+    return [f"~^{full}{re.escape(bp.rstrip('/'))}{suffix}" for bp in base_paths]
+
+def needs_lookaround(spec):
+    """
+    True when the spec matches the path against more than one pattern, which only lookaheads can express.
+    """
+    return len(spec.paths) + len(spec.full_paths) > 1
+
+# Apigee flow variables with a direct Kong PDK equivalent, for conditions evaluated in Lua
+LUA_VARIABLES = {
+    'request.verb': 'kong.request.get_method()',
+    'request.path': 'kong.request.get_path()',
+    'request.uri': 'kong.request.get_path_with_query()',
+    'request.querystring': 'kong.request.get_raw_query()',
+    'proxy.pathsuffix': 'pathsuffix()',
+    'client.ip': 'kong.client.get_ip()',
+    'response.status.code': 'kong.response.get_status()',
+    'message.status.code': 'kong.response.get_status()',
+}
+LUA_PREFIXES = {
+    'request.header.': 'kong.request.get_header',
+    'request.queryparam.': 'kong.request.get_query_arg',
+    'response.header.': 'kong.response.get_header',
+}
+
+def _lua_string(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+def _lua_operand(operand):
+    if isinstance(operand, Literal):
+        if operand.value.lower() == 'null':
+            return 'nil'
+        if operand.value.lower() in ('true', 'false'):
+            return operand.value.lower()
+        return _lua_string(operand.value)
+    name = operand.name.lower()
+    if name in LUA_VARIABLES:
+        return LUA_VARIABLES[name]
+    for prefix, getter in LUA_PREFIXES.items():
+        if name.startswith(prefix):
+            return f"{getter}({_lua_string(operand.name[len(prefix):])})"
+    # Custom flow variables live in the shared request context
+    return f"kong.ctx.shared[{_lua_string(operand.name)}]"
+
+def _lua_node(node):
+    if isinstance(node, Or):
+        return '(' + ' or '.join(_lua_node(n) for n in node.operands) + ')'
+    if isinstance(node, And):
+        return '(' + ' and '.join(_lua_node(n) for n in node.operands) + ')'
+    if isinstance(node, Not):
+        return f"not {_lua_node(node.operand)}"
+    if isinstance(node, Truthy):
+        return f"({_lua_operand(node.operand)} ~= nil)"
+    left, right = _lua_operand(node.left), _lua_operand(node.right)
+    if node.op in ('eq', 'ne') and 'nil' in (left, right):
+        return f"({left} {'==' if node.op == 'eq' else '~='} {right})"
+    if node.op in ('eq', 'ne'):
+        # Both sides compare as strings: a variable through tostring(), a literal (even true/false/1) as written
+        left, right = (_lua_string(o.value) if isinstance(o, Literal) else f"tostring({v})"
+                       for o, v in ((node.left, left), (node.right, right)))
+        return f"({left} {'==' if node.op == 'eq' else '~='} {right})"
+    if node.op == 'ieq':
+        return f"(string.lower(tostring({left})) == string.lower(tostring({right})))"
+    if node.op in ('gt', 'ge', 'lt', 'le'):
+        symbol = {'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}[node.op]
+        return f"((tonumber({left}) or 0) {symbol} (tonumber({right}) or 0))"
+    if not isinstance(node.right, Literal):
+        raise ConditionError(f"{node.op} needs a literal pattern: {_source(False, node)}")
+    regex = _lua_string(f"^{path_regex(node.op, node.right.value)}$")
+    return f"(ngx.re.find(tostring({left} or ''), {regex}, 'jo') ~= nil)"
+
+@lru_cache(maxsize=4096)
+def condition_to_lua(text):
+    """
+    Lua boolean expression (Kong PDK) equivalent to an Apigee condition, for guards evaluated at request time.
+    proxy.pathsuffix is read through a pathsuffix() function the surrounding chunk must define.
+    Raises:
+        ConditionError: On invalid syntax.
+    """
+    return _lua_node(parse_condition(text))
+
+def _lookahead_end(pattern, start):
+    """
+    Index just past the '(?=...)' group opening at start, honouring escapes and character classes.
+    """
+    depth, i, in_class = 0, start, False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError(f"Unbalanced group in {pattern}")
+
+def _take_lookaheads(pattern, i):
+    groups = []
+    while pattern.startswith('(?=', i):
+        end = _lookahead_end(pattern, i)
+        body = pattern[i + 3:end - 1]
+        groups.append(body[:-1] if body.endswith('$') else body)
+        i = end
+    return groups, i
+
+CAPTURE_PATH_RE = re.compile(r'^~\^((?:\\.|[^\\.^$*+?()\[\]{}|])*)\(\?P<' + SUFFIX_GROUP + r'>(.*)\)\$$')
+FULL_PATH_RE = re.compile(r'^~\^\(\?:(.*)\)\$$')
+
+def split_route_path(path):
+    """
+    Inverse of route_paths() for one path: (full_patterns, base_path, suffix_patterns), or None for paths
+    route_paths() did not produce. Plain prefix paths come back as ((), path, ()).
+    """
+    if not path.startswith('~^'):
+        return None if path.startswith('~') else ((), path, ())
+    match = CAPTURE_PATH_RE.match(path)
+    if match:
+        return (), re.sub(r'\\(.)', r'\1', match.group(1)), (match.group(2),)
+    match = FULL_PATH_RE.match(path)
+    if match:
+        return (match.group(1),), '', ()
+    pattern = path[2:]
+    try:
+        full, i = _take_lookaheads(pattern, 0)
+        base, j = [], i
+        while j < len(pattern) and not pattern.startswith('(?=', j):
+            if pattern[j] == '\\' and j + 1 < len(pattern):
+                base.append(pattern[j + 1])
+                j += 2
+            elif pattern[j] in '.^$*+?()[]{}|':
+                return None
+            else:
+                base.append(pattern[j])
+                j += 1
+        suffix, k = _take_lookaheads(pattern, j)
+    except ValueError:
+        return None
+    if k != len(pattern) or not (full or suffix):
+        return None
+    return tuple(full), ''.join(base), tuple(suffix)
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python apigee_condition.py '<condition>' [<basePath>]")
+        sys.exit(1)
+    base_paths = [sys.argv[2]] if len(sys.argv) == 3 else ['/']
+    for spec in compile_condition(sys.argv[1]):
+        print({'paths': route_paths(spec, base_paths), 'methods': spec.methods, 'headers': dict(spec.headers),
+               'regex_priority': spec.regex_priority, 'residual': list(spec.residual)})
+
+if __name__ == "__main__":
+    main()
@@ -6,27 +6,22 @@ _ Usage: python apigee_policy2http_log.py <policy.xml> <output.yaml>
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
 
 def load_policy2plugin_mapper(mapper_path):
     with open(mapper_path) as f:
         return json.load(f)
 
 def parse_messagelogging_policy(xml_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     config = {}
     # Map Apigee MessageLogging policy fields to Kong http_log plugin config as needed
     return config
 
-def render_plugin(plugin_name, config, template_dir, output_path):
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
+def render_plugin(plugin_name, config, template_dir, output_path, output_format=None):
     plugin_info = {'name': plugin_name, 'config': config}
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -6,8 +6,8 @@ _ Usage: python apigee_policy2oauth2.py <policy.xml> <service_name> <output.yaml
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
 
 def load_policy2plugin_mapper(mapper_path):
     """
@@ -20,12 +20,11 @@ def parse_oauth2_policy(xml_path):
     """
     Parse Apigee OAuthV2 policy XML and extract config for oauth2 plugin.
     Args:
-        xml_path (str): Path to Apigee policy XML file. (MANDATORY)
+        xml_path (str|Element): Path to Apigee policy XML file, or its already parsed root element. (MANDATORY)
     Returns:
         dict: Plugin config (MANDATORY/OPTIONAL fields)
     """
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     config = {
         'scopes': [],
         'mandatory_scope': False,
@@ -49,7 +48,7 @@ def parse_oauth2_policy(xml_path):
             config[f'enable_{grant_type.lower()}'] = elem.text.strip().lower() == 'true'
     return config
 
-def render_plugin(plugin_name, config, service_name, template_dir, output_path):
+def render_plugin(plugin_name, config, service_name, template_dir, output_path, output_format=None):
     """
     Render Kong plugin YAML using Jinja template and extracted config.
     Args:
@@ -58,9 +57,8 @@ def render_plugin(plugin_name, config, service_name, template_dir, output_path):
         service_name (str): Associated Kong service name (MANDATORY)
         template_dir (str): Directory containing Jinja template (MANDATORY)
         output_path (str): Output YAML file path (MANDATORY)
+        output_format (str): 'yaml', 'json' or 'template'; defaults to other.output_format (OPTIONAL)
     """
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
     plugin_info = {
         'name': plugin_name,
         'service': service_name,
@@ -69,9 +67,7 @@ def render_plugin(plugin_name, config, service_name, template_dir, output_path):
         'protocols': ['http', 'https'],
         'tags': ['apigee_migrated']
     }
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -87,11 +83,10 @@ def main():
     mapper_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../mappers/policy2plugin.json')
     template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../templates')
     mapper = load_policy2plugin_mapper(mapper_path)
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     apigee_policy_type = root.tag
     kong_plugin = mapper.get(apigee_policy_type, 'oauth2')
-    config = parse_oauth2_policy(xml_path)
+    config = parse_oauth2_policy(root)
     render_plugin(kong_plugin, config, service_name, template_dir, output_path)
 
 if __name__ == "__main__":
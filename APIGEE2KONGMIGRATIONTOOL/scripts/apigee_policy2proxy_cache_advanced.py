@@ -6,27 +6,170 @@ _ Usage: python apigee_policy2proxy_cache_advanced.py <policy.xml> <output.yaml>
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
+from apigee_condition import ConditionError, condition_to_lua
+from pipeline_settings import get_setting, note, other_config
 
 def load_policy2plugin_mapper(mapper_path):
     with open(mapper_path) as f:
         return json.load(f)
 
-def parse_responsecache_policy(xml_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-    config = {}
-    # Map Apigee ResponseCache policy fields to Kong proxy_cache_advanced plugin config as needed
+# Status codes Kong caches when Apigee caches every response, and when <ExcludeErrorResponse> drops 4xx/5xx
+ALL_CACHEABLE_CODES = [200, 203, 204, 206, 300, 301, 404, 405, 410, 414, 501]
+SUCCESS_CACHEABLE_CODES = [200, 203, 204, 206, 300, 301]
+CONTENT_TYPES = ['text/plain', 'text/html', 'text/xml', 'application/json', 'application/xml']
+ACCEPT_HEADERS = ['accept', 'accept-encoding', 'accept-language', 'accept-charset']
+CACHE_STRATEGIES = ('memory', 'redis')
+DEFAULT_TTL = 300
+DEFAULT_REDIS = {'host': '127.0.0.1', 'port': 6379}
+# Key fragments Kong's cache key already contains (method, path and query string)
+# Request Cache-Control directive that makes the plugin bypass the cache for each skip condition
+SKIP_DIRECTIVES = (('SkipCacheLookup', 'no-cache'), ('SkipCachePopulation', 'no-store'))
+IMPLICIT_KEY_REFS = ('request.uri', 'request.url', 'request.path', 'proxy.pathsuffix', 'request.verb', 'proxy.basepath')
+
+def get_cache_strategy(strategy=None):
+    strategy = strategy or get_setting('cache_strategy') or 'memory'
+    if strategy not in CACHE_STRATEGIES:
+        raise ValueError(f"Unknown cache strategy '{strategy}', expected one of {', '.join(CACHE_STRATEGIES)}")
+    return strategy
+
+def _text(elem):
+    return elem.text.strip() if elem is not None and elem.text and elem.text.strip() else None
+
+def _expiry_ttl(expiry, report):
+    """
+    cache_ttl in seconds from <ExpirySettings>; Kong only has a relative TTL.
+    An <ExpiryDate> is reported as not convertible rather than turned into a TTL that starts counting down at
+    conversion time.
+    """
+    if expiry is None:
+        return DEFAULT_TTL
+    for tag in ('TimeoutInSec', 'TimeoutInSeconds', 'TimeOfDay', 'ExpiryDate'):
+        elem = expiry.find(tag)
+        if elem is None:
+            continue
+        if elem.get('ref'):
+            note(report, f"ExpirySettings/{tag}", elem.get('ref'), 'expiry read from a flow variable; static fallback used')
+        value = _text(elem)
+        if value is None:
+            continue
+        if tag.startswith('TimeoutIn'):
+            return int(value)
+        if tag == 'TimeOfDay':
+            note(report, 'ExpirySettings/TimeOfDay', value, 'daily expiry at a fixed time approximated by a 24h TTL')
+            return 86400
+        note(report, 'ExpirySettings/ExpiryDate', value,
+             f"NOT CONVERTED: Kong has no fixed expiry date; cache_ttl defaults to {DEFAULT_TTL}s and must be set by hand")
+        return DEFAULT_TTL
+    return DEFAULT_TTL
+
+def skip_cache_guards(root, report=None):
+    """
+    Lua statements for <SkipCacheLookup>/<SkipCachePopulation>: when the condition holds, the request gets a
+    Cache-Control directive that makes proxy-cache-advanced (with cache_control on) bypass the cache.
+    Kong bypasses lookup and population together, so either condition skips both.
+    """
+    guards = []
+    for tag, directive in SKIP_DIRECTIVES:
+        condition = _text(root.find(tag))
+        if not condition:
+            continue
+        try:
+            lua = condition_to_lua(condition)
+        except ConditionError as e:
+            note(report, tag, condition, f"NOT CONVERTED: {e}")
+            continue
+        if 'pathsuffix()' in lua:
+            note(report, tag, condition, 'NOT CONVERTED: proxy.pathsuffix is not known outside the flow')
+            continue
+        guards.append(f'if {lua} then kong.service.request.set_header("Cache-Control", "{directive}") end')
+        if tag == 'SkipCachePopulation':
+            note(report, tag, condition, 'Kong skips the cache lookup as well when it skips population')
+    return guards
+
+def parse_responsecache_policy(xml_path, report=None, strategy=None, companions=None):
+    """
+    Parse Apigee ResponseCache XML and extract config for proxy_cache_advanced plugin.
+    Args:
+        xml_path (str|Element): Path to Apigee policy XML file, or its already parsed root element. (MANDATORY)
+        report (list): Receives {'setting', 'value', 'reason'} for settings Kong cannot express exactly. (OPTIONAL)
+        strategy (str): 'memory' or 'redis'; defaults to other.cache_strategy (OPTIONAL)
+        companions (list): Receives the pre-function plugin {'name', 'config'} carrying the skip guards. (OPTIONAL)
+    Returns:
+        dict: Plugin config (MANDATORY/OPTIONAL fields)
+    """
+    root = xml_root(xml_path)
+    exclude_errors = (_text(root.find('ExcludeErrorResponse')) or 'false').lower() == 'true'
+    config = {
+        'strategy': get_cache_strategy(strategy),
+        'response_code': SUCCESS_CACHEABLE_CODES if exclude_errors else ALL_CACHEABLE_CODES,
+        'request_method': ['GET', 'HEAD'],
+        'content_type': CONTENT_TYPES,
+        'cache_ttl': _expiry_ttl(root.find('ExpirySettings'), report),
+        'cache_control': (_text(root.find('UseResponseCacheHeaders')) or 'false').lower() == 'true',
+        'vary_headers': [],
+        'vary_query_params': [],
+    }
+    # OPTIONAL: Cache key fragments -> vary_headers / vary_query_params
+    cache_key = root.find('CacheKey')
+    whole_query = False
+    if cache_key is not None:
+        if _text(cache_key.find('Prefix')):
+            note(report, 'CacheKey/Prefix', _text(cache_key.find('Prefix')), 'key prefix not needed: Kong keys are scoped per plugin instance')
+        for fragment in cache_key.findall('KeyFragment'):
+            ref = fragment.get('ref')
+            if not ref:
+                if _text(fragment):
+                    note(report, 'CacheKey/KeyFragment', _text(fragment), 'constant key fragment dropped')
+                continue
+            lowered = ref.lower()
+            if lowered.startswith('request.header.'):
+                config['vary_headers'].append(ref[len('request.header.'):].lower())
+            elif lowered.startswith('request.queryparam.'):
+                config['vary_query_params'].append(ref[len('request.queryparam.'):])
+            elif lowered in ('request.uri', 'request.url', 'request.querystring'):
+                whole_query = True
+            elif lowered not in IMPLICIT_KEY_REFS:
+                note(report, 'CacheKey/KeyFragment', ref, 'flow variable cannot be part of the Kong cache key')
+    if whole_query:
+        # An empty vary_query_params list makes Kong vary on every query parameter
+        config['vary_query_params'] = []
+    elif not config['vary_query_params']:
+        note(report, 'CacheKey', 'no query parameters', 'Kong always varies on the query string unless vary_query_params is set')
+    if (_text(root.find('UseAcceptHeader')) or 'false').lower() == 'true':
+        config['vary_headers'].extend(h for h in ACCEPT_HEADERS if h not in config['vary_headers'])
+    # OPTIONAL: Cache storage scope
+    resource = _text(root.find('CacheResource'))
+    scope = _text(root.find('Scope')) or 'Exclusive'
+    if config['strategy'] == 'redis':
+        # other.cache_redis, else the Redis the rate limiting plugins share counters in
+        redis = dict(other_config().get('cache_redis') or other_config().get('rate_limit_redis') or DEFAULT_REDIS)
+        lookup_timeout = _text(root.find('CacheLookupTimeoutInSeconds'))
+        if lookup_timeout:
+            redis['timeout'] = int(float(lookup_timeout) * 1000)
+        config['redis'] = redis
+    else:
+        config['memory'] = {'dictionary_name': 'kong_db_cache'}
+        if resource:
+            note(report, 'CacheResource', resource, 'memory strategy caches per node; use strategy redis to share one cache across nodes')
+    if scope != 'Exclusive' or resource:
+        note(report, 'Scope', f"{scope}/{resource}" if resource else scope,
+              'entries are scoped to this plugin instance; policies sharing a cache in Apigee do not share entries in Kong')
+    # OPTIONAL: Conditional bypass has no proxy-cache-advanced setting; carried over as a pre-function guard
+    guards = skip_cache_guards(root, report)
+    if guards:
+        if companions is not None:
+            companions.append({'name': 'pre-function', 'config': {'access': ['\n'.join(guards)]}})
+        if not config['cache_control']:
+            note(report, 'UseResponseCacheHeaders', 'false',
+                 'cache_control enabled so the skip guards can bypass the cache; response Cache-Control headers are honoured too')
+            config['cache_control'] = True
     return config
 
-def render_plugin(plugin_name, config, template_dir, output_path):
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
+def render_plugin(plugin_name, config, template_dir, output_path, output_format=None):
     plugin_info = {'name': plugin_name, 'config': config}
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -39,8 +182,11 @@ def main():
     template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../templates')
     mapper = load_policy2plugin_mapper(mapper_path)
     plugin_name = 'proxy_cache_advanced'
-    config = parse_responsecache_policy(xml_path)
+    report = []
+    config = parse_responsecache_policy(xml_path, report)
     render_plugin(plugin_name, config, template_dir, output_path)
+    for item in report:
+        print(f"Not expressed exactly: {item['setting']} = {item['value']}: {item['reason']}")
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,19 @@
 """
 Enterprise_grade script to convert Apigee SpikeArrest/Quota policy to Kong rate_limiting plugin YAML using Jinja template and policy2plugin.json mapping.
 _ Modular functions, clear comments, mandatory/optional fields.
+_ SpikeArrest <Rate> (ps/pm), <Identifier> and <UseEffectiveCount>, and Quota <Allow>/<Interval>/<TimeUnit> and
+  <Distributed> are mapped; settings Kong cannot express (<MessageWeight>, flow-variable refs) go to a report.
+_ Counters Apigee shares across message processors use other.rate_limit_strategy (cluster or redis) in
+  configs/config.json instead of per-node local counters; OTHER__RATE_LIMIT_STRATEGY overrides.
 _ Usage: python apigee_policy2rate_limiting.py <policy.xml> <service_name> <output.yaml>
 """
+import re
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
+from pipeline_settings import get_setting, note, other_config
 
 def load_policy2plugin_mapper(mapper_path):
     """
@@ -16,34 +22,142 @@ def load_policy2plugin_mapper(mapper_path):
     with open(mapper_path) as f:
         return json.load(f)
 
-def parse_spikearrest_quota_policy(xml_path):
+RATE_UNITS = {'ps': 'second', 'pm': 'minute'}
+RATE_RE = re.compile(r'^\s*(\d+)\s*(ps|pm)\s*$', re.IGNORECASE)
+WINDOW_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400, 'week': 604800, 'month': 2592000, 'year': 31536000}
+STRATEGIES = ('local', 'cluster', 'redis')
+DEFAULT_REDIS = {'host': '127.0.0.1', 'port': 6379}
+# Identifier refs Kong can key counters on natively
+CONSUMER_REFS = ('client_id', 'developer.app.name', 'developer.id', 'developer.email', 'apiproduct.name')
+
+def get_rate_limit_strategy(strategy=None):
+    """
+    Counter strategy for distributed limits: other.rate_limit_strategy (OTHER__RATE_LIMIT_STRATEGY overrides).
+    """
+    strategy = strategy or get_setting('rate_limit_strategy') or 'cluster'
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown rate limit strategy '{strategy}', expected one of {', '.join(STRATEGIES)}")
+    return strategy
+
+def get_sync_rate():
+    value = get_setting('rate_limit_sync_rate', 10)
+    return float(value) if '.' in str(value) else int(value)
+
+def get_redis_config():
+    return dict(other_config().get('rate_limit_redis') or DEFAULT_REDIS)
+
+def element_value(root, tag, report=None, attr='ref'):
+    """
+    Text of a child element; a ref="" flow variable is reported and the literal text used as the static value.
+    """
+    elem = root.find(tag)
+    if elem is None:
+        return None
+    if elem.get(attr):
+        note(report, tag, elem.get(attr), 'value read from a flow variable at runtime; static value used')
+    return elem.text.strip() if elem.text and elem.text.strip() else None
+
+def parse_identifier(root, report=None):
+    """
+    Kong counter key for <Identifier ref="...">: (limit_by, header_name).
+    Without an Identifier Apigee counts all traffic of the proxy, i.e. per service.
+    """
+    elem = root.find('Identifier')
+    ref = (elem.get('ref') or '').strip() if elem is not None else ''
+    if not ref:
+        return 'service', None
+    lowered = ref.lower()
+    if lowered.startswith('request.header.'):
+        return 'header', ref[len('request.header.'):]
+    if lowered in ('client.ip', 'proxy.client.ip', 'request.header.x-forwarded-for'):
+        return 'ip', None
+    if lowered in CONSUMER_REFS or lowered.startswith(('verifyapikey.', 'oauthv2', 'accesstoken.')):
+        return 'consumer', None
+    note(report, 'Identifier', ref, 'Kong cannot key counters on this variable; counting per consumer')
+    return 'consumer', None
+
+def parse_message_weight(root, report=None):
+    elem = root.find('MessageWeight')
+    if elem is not None and (elem.get('ref') or (elem.text or '').strip()):
+        note(report, 'MessageWeight', elem.get('ref') or elem.text.strip(), 'Kong counts every request as 1; weighted requests are not supported')
+
+def parse_spike_rate(root, report=None):
+    """
+    <Rate>30ps</Rate> / <Rate>100pm</Rate> -> {'second': 30} / {'minute': 100}
+    """
+    rate = element_value(root, 'Rate', report)
+    if not rate:
+        return {}
+    match = RATE_RE.match(rate)
+    if not match:
+        note(report, 'Rate', rate, 'unrecognised rate; expected <n>ps or <n>pm')
+        return {}
+    value, unit = match.groups()
+    return {RATE_UNITS[unit.lower()]: int(value)}
+
+def parse_quota_window(root, report=None):
+    """
+    (count, window unit, interval) of a Quota's <Allow>, <Interval> and <TimeUnit>.
+    """
+    allow = root.find('Allow')
+    count = None
+    if allow is not None:
+        if allow.get('countRef'):
+            note(report, 'Allow', allow.get('countRef'), 'quota count read from a flow variable at runtime; static count used')
+        count = allow.get('count') or (allow.text.strip() if allow.text and allow.text.strip() else None)
+    interval = int(element_value(root, 'Interval', report) or 1)
+    unit = (element_value(root, 'TimeUnit', report) or 'minute').lower()
+    if unit not in WINDOW_SECONDS:
+        note(report, 'TimeUnit', unit, 'unknown time unit; using minute')
+        unit = 'minute'
+    return (int(count) if count else None), unit, interval
+
+def is_distributed(root):
+    return (element_value(root, 'Distributed') or 'false').lower() == 'true'
+
+def is_synchronous(root):
+    return (element_value(root, 'Synchronous') or 'false').lower() == 'true'
+
+def parse_spikearrest_quota_policy(xml_path, report=None, strategy=None):
     """
     Parse Apigee SpikeArrest/Quota XML and extract config for rate_limiting plugin.
     Args:
-        xml_path (str): Path to Apigee policy XML file. (MANDATORY)
+        xml_path (str|Element): Path to Apigee policy XML file, or its already parsed root element. (MANDATORY)
+        report (list): Receives {'setting', 'value', 'reason'} for settings Kong cannot express exactly. (OPTIONAL)
+        strategy (str): 'local', 'cluster' or 'redis' for distributed counters; defaults to other.rate_limit_strategy (OPTIONAL)
     Returns:
         dict: Plugin config (MANDATORY/OPTIONAL fields)
     """
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     config = {}
-    # Example: <Rate>100pm</Rate> or <Interval>1</Interval> <TimeUnit>minute</TimeUnit>
-    rate_elem = root.find('Rate')
-    if rate_elem is not None and rate_elem.text:
-        import re
-        match = re.match(r'(\d+)([a_z]+)', rate_elem.text.strip())
-        if match:
-            value, unit = match.groups()
-            config[unit] = int(value)
-    interval_elem = root.find('Interval')
-    timeunit_elem = root.find('TimeUnit')
-    if interval_elem is not None and timeunit_elem is not None:
-        config[timeunit_elem.text.strip()] = int(interval_elem.text.strip())
-    # Policy type
-    config['policy'] = 'local'
+    if root.tag == 'Quota':
+        # Example: <Allow count="1000"/> <Interval>1</Interval> <TimeUnit>hour</TimeUnit>
+        count, unit, interval = parse_quota_window(root, report)
+        if count is not None:
+            if unit not in ('second', 'minute', 'hour', 'day', 'month', 'year') or interval != 1:
+                # rate-limiting only has fixed one-unit windows: spread the quota over the nearest one
+                seconds = WINDOW_SECONDS[unit] * interval
+                window = next(u for u in ('year', 'month', 'day', 'hour', 'minute', 'second') if WINDOW_SECONDS[u] <= seconds)
+                note(report, 'Interval', f"{interval} {unit}", f"window approximated by one {window}")
+                count, unit = max(1, count * WINDOW_SECONDS[window] // seconds), window
+            config[unit] = count
+        distributed = is_distributed(root)
+    else:
+        # Example: <Rate>100pm</Rate>; Apigee smooths the rate, Kong counts per fixed window
+        config.update(parse_spike_rate(root, report))
+        distributed = (element_value(root, 'UseEffectiveCount') or 'false').lower() == 'true'
+    parse_message_weight(root, report)
+    limit_by, header_name = parse_identifier(root, report)
+    config['limit_by'] = limit_by
+    if header_name:
+        config['header_name'] = header_name
+    # Policy type: counters shared across nodes only when Apigee shares them across message processors
+    config['policy'] = get_rate_limit_strategy(strategy) if distributed else 'local'
+    if config['policy'] == 'redis':
+        config['redis'] = get_redis_config()
     return config
 
-def render_plugin(plugin_name, config, service_name, template_dir, output_path):
+def render_plugin(plugin_name, config, service_name, template_dir, output_path, output_format=None):
     """
     Render Kong plugin YAML using Jinja template and extracted config.
     Args:
@@ -52,9 +166,8 @@ def render_plugin(plugin_name, config, service_name, template_dir, output_path):
         service_name (str): Associated Kong service name (MANDATORY)
         template_dir (str): Directory containing Jinja template (MANDATORY)
         output_path (str): Output YAML file path (MANDATORY)
+        output_format (str): 'yaml', 'json' or 'template'; defaults to other.output_format (OPTIONAL)
     """
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
     plugin_info = {
         'name': plugin_name,
         'service': service_name,
@@ -63,9 +176,7 @@ def render_plugin(plugin_name, config, service_name, template_dir, output_path):
         'protocols': ['http', 'https'],
         'tags': ['apigee_migrated']
     }
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -82,11 +193,13 @@ def main():
     template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../templates')
     mapper = load_policy2plugin_mapper(mapper_path)
     # Determine plugin type from XML root tag
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     apigee_policy_type = root.tag
     kong_plugin = mapper.get(apigee_policy_type, 'rate_limiting')
-    config = parse_spikearrest_quota_policy(xml_path)
+    report = []
+    config = parse_spikearrest_quota_policy(root, report)
+    for item in report:
+        print(f"Not mapped exactly: {item['setting']}={item['value']}: {item['reason']}")
     render_plugin(kong_plugin, config, service_name, template_dir, output_path)
 
 if __name__ == "__main__":
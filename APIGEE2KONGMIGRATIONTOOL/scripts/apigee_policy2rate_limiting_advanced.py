@@ -1,32 +1,74 @@
 """
 Enterprise_grade script to convert Apigee Quota policy to Kong rate_limiting_advanced plugin YAML using Jinja template and policy2plugin.json mapping.
 _ Modular functions, clear comments, mandatory/optional fields.
+_ <Allow>/<Interval>/<TimeUnit> become one limit/window_size pair; type="rollingwindow" a sliding window.
+_ <Distributed>true</Distributed> shares counters via other.rate_limit_strategy (cluster or redis), synced every
+  other.rate_limit_sync_rate seconds, or on every request with <Synchronous>true</Synchronous>.
 _ Usage: python apigee_policy2rate_limiting_advanced.py <policy.xml> <output.yaml>
 """
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
+from apigee_policy2rate_limiting import (WINDOW_SECONDS, element_value, get_rate_limit_strategy, get_redis_config, get_sync_rate,
+                                         is_distributed, is_synchronous, parse_identifier, parse_message_weight,
+                                         parse_quota_window, parse_spike_rate)
+from pipeline_settings import note
 
 def load_policy2plugin_mapper(mapper_path):
     with open(mapper_path) as f:
         return json.load(f)
 
-def parse_quota_policy(xml_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+def parse_quota_policy(xml_path, report=None, strategy=None):
+    """
+    Parse Apigee Quota (or SpikeArrest) XML and extract config for rate_limiting_advanced plugin.
+    Args:
+        xml_path (str|Element): Path to Apigee policy XML file, or its already parsed root element. (MANDATORY)
+        report (list): Receives {'setting', 'value', 'reason'} for settings Kong cannot express exactly. (OPTIONAL)
+        strategy (str): 'local', 'cluster' or 'redis' for distributed counters; defaults to other.rate_limit_strategy (OPTIONAL)
+    Returns:
+        dict: Plugin config (MANDATORY/OPTIONAL fields)
+    """
+    root = xml_root(xml_path)
     config = {}
-    # Map Apigee Quota policy fields to Kong rate_limiting_advanced plugin config as needed
+    if root.tag == 'SpikeArrest':
+        rate = parse_spike_rate(root, report)
+        config['limit'] = list(rate.values())
+        config['window_size'] = [WINDOW_SECONDS[unit] for unit in rate]
+        distributed = (element_value(root, 'UseEffectiveCount') or 'false').lower() == 'true'
+        synchronous = False
+    else:
+        count, unit, interval = parse_quota_window(root, report)
+        if count is not None:
+            config['limit'] = [count]
+            config['window_size'] = [WINDOW_SECONDS[unit] * interval]
+        # Apigee calendar/flexi/default quotas reset on fixed boundaries; rollingwindow slides
+        config['window_type'] = 'sliding' if (root.get('type') or '').lower() == 'rollingwindow' else 'fixed'
+        if (root.get('type') or '').lower() == 'calendar' and root.find('StartTime') is not None:
+            note(report, 'StartTime', root.findtext('StartTime').strip(), 'Kong windows start at the epoch, not a calendar start time')
+        distributed, synchronous = is_distributed(root), is_synchronous(root)
+    parse_message_weight(root, report)
+    identifier, header_name = parse_identifier(root, report)
+    config['identifier'] = identifier
+    if header_name:
+        config['header_name'] = header_name
+    if distributed:
+        config['strategy'] = get_rate_limit_strategy(strategy)
+        # Synchronous quotas check the shared counter on every request
+        config['sync_rate'] = 0 if synchronous or config['strategy'] == 'local' else get_sync_rate()
+    else:
+        # Non-distributed quotas count per message processor: per-node counters, never synced
+        config['strategy'] = 'local'
+        config['sync_rate'] = -1
+    if config['strategy'] == 'redis':
+        config['redis'] = get_redis_config()
+    config['namespace'] = root.get('name') or root.tag
     return config
 
-def render_plugin(plugin_name, config, template_dir, output_path):
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
+def render_plugin(plugin_name, config, template_dir, output_path, output_format=None):
     plugin_info = {'name': plugin_name, 'config': config}
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -39,7 +81,10 @@ def main():
     template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../templates')
     mapper = load_policy2plugin_mapper(mapper_path)
     plugin_name = 'rate_limiting_advanced'
-    config = parse_quota_policy(xml_path)
+    report = []
+    config = parse_quota_policy(xml_path, report)
+    for item in report:
+        print(f"Not mapped exactly: {item['setting']}={item['value']}: {item['reason']}")
     render_plugin(plugin_name, config, template_dir, output_path)
 
 if __name__ == "__main__":
@@ -6,38 +6,45 @@ _ Usage: python apigee_policy2request_transformer.py <policy.xml> <output.yaml>
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
 
 def load_policy2plugin_mapper(mapper_path):
     with open(mapper_path) as f:
         return json.load(f)
 
-def parse_assignmessage_policy(xml_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-    config = {'add': {}, 'remove': [], 'replace': {}, 'append': {}}
-    for setvar in root.findall('.//Set'):  # <Set><Headers><Header name="foo">bar</Header></Headers></Set>
-        headers = setvar.find('Headers')
-        if headers is not None:
-            for header in headers.findall('Header'):
-                name = header.get('name')
-                value = header.text or ''
-                config['add'][name] = value
-    for remove in root.findall('.//Remove/Headers/Header'):
-        name = remove.get('name')
-        if name:
-            config['remove'].append(name)
-    # Extend as needed for replace/append
+# Apigee AssignMessage containers -> Kong transformer sections
+PARAM_SECTIONS = (('Headers', 'Header', 'headers'), ('QueryParams', 'QueryParam', 'querystring'), ('FormParams', 'FormParam', 'body'))
+TRANSFORM_ACTIONS = ('remove', 'replace', 'add', 'append')
+
+def _params(root, action, container, item):
+    for parent in root.findall(f"{action}/{container}"):
+        for elem in parent.findall(item):
+            if elem.get('name'):
+                yield elem.get('name'), (elem.text or '').strip()
+
+def assignmessage_transforms(root, sections=PARAM_SECTIONS):
+    """
+    Kong transformer actions ({action: {section: [...]}}) for an AssignMessage's Remove/Set/Add.
+    <Set> overwrites or creates, so it lands in both replace (existing) and add (missing); <Add> appends.
+    """
+    config = {action: {section: [] for _, _, section in sections} for action in TRANSFORM_ACTIONS}
+    for container, item, section in sections:
+        config['remove'][section].extend(name for name, _ in _params(root, 'Remove', container, item))
+        for name, value in _params(root, 'Set', container, item):
+            config['replace'][section].append(f"{name}:{value}")
+            config['add'][section].append(f"{name}:{value}")
+        config['append'][section].extend(f"{name}:{value}" for name, value in _params(root, 'Add', container, item))
     return config
 
-def render_plugin(plugin_name, config, template_dir, output_path):
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
+def parse_assignmessage_policy(xml_path):
+    root = xml_root(xml_path)
+    # Example: <Set><Headers><Header name="foo">bar</Header></Headers></Set> -> add/replace headers ["foo:bar"]
+    return assignmessage_transforms(root)
+
+def render_plugin(plugin_name, config, template_dir, output_path, output_format=None):
     plugin_info = {'name': plugin_name, 'config': config}
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -6,38 +6,22 @@ _ Usage: python apigee_policy2response_transformer.py <policy.xml> <output.yaml>
 import sys
 import os
 import json
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from yaml_emitter import render_or_emit
+from bundle_model import xml_root
+from apigee_policy2request_transformer import PARAM_SECTIONS, assignmessage_transforms
 
 def load_policy2plugin_mapper(mapper_path):
     with open(mapper_path) as f:
         return json.load(f)
 
 def parse_assignmessage_response_policy(xml_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-    config = {'add': {}, 'remove': [], 'replace': {}, 'append': {}}
-    for setvar in root.findall('.//Set'):  # <Set><Headers><Header name="foo">bar</Header></Headers></Set>
-        headers = setvar.find('Headers')
-        if headers is not None:
-            for header in headers.findall('Header'):
-                name = header.get('name')
-                value = header.text or ''
-                config['add'][name] = value
-    for remove in root.findall('.//Remove/Headers/Header'):
-        name = remove.get('name')
-        if name:
-            config['remove'].append(name)
-    # Extend as needed for replace/append
-    return config
+    root = xml_root(xml_path)
+    # Response transformers only rewrite headers; query and form parameters do not apply to responses
+    return assignmessage_transforms(root, PARAM_SECTIONS[:1])
 
-def render_plugin(plugin_name, config, template_dir, output_path):
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template(f'{plugin_name}.j2')
+def render_plugin(plugin_name, config, template_dir, output_path, output_format=None):
     plugin_info = {'name': plugin_name, 'config': config}
-    rendered = template.render(**plugin_info)
-    with open(output_path, 'w') as f:
-        f.write(rendered)
+    render_or_emit(plugin_name, plugin_info, output_path, template_dir, output_format, root_key='plugin')
     print(f"Kong plugin YAML written to {output_path}")
 
 def main():
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Persistent content-hash build cache for the migration pipeline.
+- Keys are SHA-256 digests of the inputs (zip, bundle XML tree, policy XML) combined with a fingerprint of templates/ and mappers/.
+- Each entry records the outputs it produced together with their digests; an entry is only reused while every output is still intact.
+- Entries are one small JSON file each, written atomically, so concurrent pipeline workers never contend for a shared manifest.
+- Config: other.build_cache (on/off) and other.build_cache_dir in configs/config.json; OTHER__BUILD_CACHE and
+  OTHER__BUILD_CACHE_DIR override them. An empty directory means the user cache dir (~/.cache/apigee2kong/build).
+"""
+import os
+import json
+import glob
+import hashlib
+import tempfile
+from functools import lru_cache
+from pipeline_settings import get_flag, get_setting, user_cache_dir
+
+CACHE_VERSION = '3'
+CHUNK_SIZE = 1024 * 1024
+
+def get_scripts_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+def is_cache_enabled():
+    return get_flag('build_cache')
+
+def get_cache_dir():
+    cache_dir = get_setting('build_cache_dir')
+    if not cache_dir:
+        return user_cache_dir('build')
+    return os.path.normpath(os.path.join(get_scripts_dir(), os.path.expanduser(cache_dir)))
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def tree_sha256(root_dir):
+    """
+    Digest of every file (relative path and content) under root_dir, independent of walk order.
+    """
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for f in sorted(filenames):
+            path = os.path.join(dirpath, f)
+            digest.update(os.path.relpath(path, root_dir).replace(os.sep, '/').encode())
+            digest.update(file_sha256(path).encode())
+    return digest.hexdigest()
+
+@lru_cache(maxsize=None)
+def toolchain_fingerprint():
+    """
+    Digest of all templates, mappers and configs, so editing any of them invalidates every cached conversion.
+    """
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+    for pattern in ('../templates/*.j2', '../mappers/*.json', '../configs/*.json'):
+        for path in sorted(glob.glob(os.path.join(get_scripts_dir(), pattern))):
+            digest.update(os.path.basename(path).encode())
+            digest.update(file_sha256(path).encode())
+    return digest.hexdigest()
+
+def make_key(*parts):
+    digest = hashlib.sha256(toolchain_fingerprint().encode())
+    for part in parts:
+        digest.update(b'\0')
+        digest.update(str(part).encode())
+    return digest.hexdigest()
+
+def bundle_cache_key(bundle_dir):
+    """
+    Key for a whole bundle. A zip is keyed by its own digest; for an unzipped bundle only apiproxy/ is hashed,
+    so files the pipeline writes next to it do not count.
+    """
+    if os.path.isfile(bundle_dir):
+        return make_key('bundle-zip', file_sha256(bundle_dir))
+    return make_key('bundle', tree_sha256(os.path.join(bundle_dir, 'apiproxy')))
+
+def _entry_path(kind, ident, cache_dir=None):
+    ident_hash = hashlib.sha256(os.path.abspath(ident).encode()).hexdigest()
+    return os.path.join(cache_dir or get_cache_dir(), kind, ident_hash[:2], f"{ident_hash}.json")
+
+def _output_intact(output):
+    if output['sha256'] is None:
+        return os.path.exists(output['path'])
+    return os.path.isfile(output['path']) and file_sha256(output['path']) == output['sha256']
+
+def lookup(kind, ident, key, cache_dir=None):
+    """
+    Return the cached entry for (kind, ident) when it was built from the same key and its outputs are intact, else None.
+    Args:
+        kind (str): Stage name, e.g. 'unzip', 'xml2json', 'policy'. (MANDATORY)
+        ident (str): Path identifying the unit of work. (MANDATORY)
+        key (str): Current input key from make_key(). (MANDATORY)
+    """
+    if not is_cache_enabled():
+        return None
+    try:
+        with open(_entry_path(kind, ident, cache_dir)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get('key') != key or not all(_output_intact(o) for o in entry.get('outputs', [])):
+        return None
+    return entry
+
+def record(kind, ident, key, outputs=(), value=None, cache_dir=None):
+    """
+    Store an entry for (kind, ident). Directories in outputs are checked for existence only, files by digest.
+    Args:
+        outputs (list[str]): Paths produced by the unit of work. (OPTIONAL)
+        value: JSON-serialisable result handed back on a cache hit. (OPTIONAL)
+    """
+    if not is_cache_enabled():
+        return
+    entry = {
+        'key': key,
+        'outputs': [{'path': os.path.abspath(p), 'sha256': None if os.path.isdir(p) else file_sha256(p)} for p in outputs],
+        'value': value,
+    }
+    path = _entry_path(kind, ident, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Virtual bundle filesystem so pipeline stages can read an Apigee API bundle either from an unzipped directory
+or straight from its zip archive, without extracting anything to disk.
+- Paths are '/'-separated and relative to the bundle root ('' is the root, which holds apiproxy/).
+- ZipBundleFS indexes the archive's member listing once; walk/listdir/isdir are then dictionary lookups.
+- as_bundle_fs() accepts a directory, a .zip path or an existing bundle filesystem.
+"""
+import os
+import zipfile
+import posixpath
+
+class DirBundleFS:
+    """
+    Bundle filesystem over an unzipped bundle directory.
+    """
+    def __init__(self, root):
+        self.source = os.path.abspath(root)
+        self.name = os.path.basename(os.path.normpath(root))
+        # Parsed BundleModel, attached lazily by bundle_model.as_bundle_model
+        self.model = None
+
+    def _abs(self, path):
+        return os.path.join(self.source, *[p for p in path.split('/') if p])
+
+    def location(self, path=''):
+        return self._abs(path)
+
+    def exists(self, path):
+        return os.path.exists(self._abs(path))
+
+    def isdir(self, path):
+        return os.path.isdir(self._abs(path))
+
+    def isfile(self, path):
+        return os.path.isfile(self._abs(path))
+
+    def listdir(self, path=''):
+        return sorted(os.listdir(self._abs(path)))
+
+    def walk(self, top=''):
+        base = self._abs(top)
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames.sort()
+            rel = os.path.relpath(dirpath, self.source).replace(os.sep, '/')
+            yield ('' if rel == '.' else rel), dirnames, sorted(filenames)
+
+    def open(self, path):
+        return open(self._abs(path), 'rb')
+
+    def read_bytes(self, path):
+        with self.open(path) as f:
+            return f.read()
+
+    def size(self, path):
+        return os.path.getsize(self._abs(path))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ZipBundleFS:
+    """
+    Bundle filesystem over an Apigee bundle zip. Members are read on demand with ZipFile.open.
+    Archives that wrap apiproxy/ in a single top-level folder are rooted at that folder.
+    """
+    def __init__(self, zip_path):
+        self.source = os.path.abspath(zip_path)
+        self.name = os.path.splitext(os.path.basename(zip_path))[0]
+        self.model = None
+        self._zip = zipfile.ZipFile(zip_path, 'r')
+        self._infos = {}
+        self._dirs = {'': (set(), [])}
+        names = [i.filename for i in self._zip.infolist()]
+        self._prefix = self._detect_prefix(names)
+        for info in self._zip.infolist():
+            if not info.filename.startswith(self._prefix):
+                continue
+            rel = info.filename[len(self._prefix):].strip('/')
+            if not rel:
+                continue
+            if info.is_dir():
+                self._add_dir(rel)
+                continue
+            self._infos[rel] = info
+            parent, filename = posixpath.split(rel)
+            self._add_dir(parent)
+            self._dirs[parent][1].append(filename)
+        for rel in self._dirs:
+            if rel:
+                parent, child = posixpath.split(rel)
+                self._dirs[parent][0].add(child)
+
+    @staticmethod
+    def _detect_prefix(names):
+        if any(n.split('/', 1)[0] == 'apiproxy' for n in names):
+            return ''
+        tops = {n.split('/', 1)[0] for n in names if '/' in n}
+        if len(tops) == 1:
+            top = tops.pop()
+            if any(n.startswith(f"{top}/apiproxy/") for n in names):
+                return f"{top}/"
+        return ''
+
+    def _add_dir(self, rel):
+        while rel not in self._dirs:
+            self._dirs[rel] = (set(), [])
+            rel = posixpath.dirname(rel)
+
+    def _norm(self, path):
+        return path.strip('/')
+
+    def location(self, path=''):
+        return f"{self.source}!/{self._norm(path)}"
+
+    def exists(self, path):
+        path = self._norm(path)
+        return path in self._infos or path in self._dirs
+
+    def isdir(self, path):
+        return self._norm(path) in self._dirs
+
+    def isfile(self, path):
+        return self._norm(path) in self._infos
+
+    def listdir(self, path=''):
+        path = self._norm(path)
+        if path not in self._dirs:
+            raise FileNotFoundError(self.location(path))
+        dirs, files = self._dirs[path]
+        return sorted(list(dirs) + files)
+
+    def walk(self, top=''):
+        top = self._norm(top)
+        if top not in self._dirs:
+            return
+        stack = [top]
+        while stack:
+            path = stack.pop(0)
+            dirs, files = self._dirs[path]
+            dirnames = sorted(dirs)
+            yield path, dirnames, sorted(files)
+            stack[0:0] = [posixpath.join(path, d) if path else d for d in dirnames]
+
+    def open(self, path):
+        path = self._norm(path)
+        if path not in self._infos:
+            raise FileNotFoundError(self.location(path))
+        return self._zip.open(self._infos[path])
+
+    def read_bytes(self, path):
+        with self.open(path) as f:
+            return f.read()
+
+    def size(self, path):
+        return self._infos[self._norm(path)].file_size
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def as_bundle_fs(bundle):
+    """
+    Return a bundle filesystem for a directory, a .zip archive or an already opened bundle filesystem.
+    """
+    if isinstance(bundle, (DirBundleFS, ZipBundleFS)):
+        return bundle
+    if os.path.isfile(bundle) and zipfile.is_zipfile(bundle):
+        return ZipBundleFS(bundle)
+    return DirBundleFS(bundle)
+
+def list_bundle_sources(unzipped_dir, input_dir, from_zip=False):
+    """
+    Bundles to process: zip archives under input_dir when streaming, else unzipped bundle directories.
+    """
+    if from_zip:
+        if not os.path.isdir(input_dir):
+            return []
+        return [os.path.join(input_dir, f) for f in sorted(os.listdir(input_dir)) if f.lower().endswith('.zip')]
+    if not os.path.isdir(unzipped_dir):
+        return []
+    return [os.path.join(unzipped_dir, d) for d in sorted(os.listdir(unzipped_dir)) if os.path.isdir(os.path.join(unzipped_dir, d))]
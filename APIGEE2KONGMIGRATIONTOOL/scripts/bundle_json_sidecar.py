@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Binary sidecar for apigee_bundle.json so downstream tools can reload a parsed bundle without re-decoding the JSON.
+- apigee_bundle.msgpack when msgpack is installed, else a versioned pickle (apigee_bundle.pickle).
+- The sidecar starts with a JSON header line storing the SHA-256 of the JSON it was written with; the payload is
+  only deserialised while that hash still matches, else load_bundle_json() falls back to (and refreshes from) the JSON.
+- Either way elements come back as XmlNode and every other object as OrderedDict.
+- Config: other.bundle_sidecar (on/off) in configs/config.json; OTHER__BUNDLE_SIDECAR overrides.
+- Usage: python bundle_json_sidecar.py <apigee_bundle.json>   (writes or refreshes the sidecar)
+"""
+import os
+import sys
+import json
+import pickle
+import tempfile
+
+from build_cache import file_sha256
+from xml_node import XmlNode, node_object_hook
+from pipeline_settings import get_flag
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SIDECAR_VERSION = 2
+
+def is_sidecar_enabled():
+    return get_flag('bundle_sidecar')
+
+def sidecar_format():
+    return 'msgpack' if msgpack is not None else 'pickle'
+
+def sidecar_path(json_path, fmt=None):
+    return os.path.join(os.path.dirname(json_path), f"apigee_bundle.{fmt or sidecar_format()}")
+
+def _msgpack_default(o):
+    if isinstance(o, XmlNode):
+        return o.to_dict()
+    raise TypeError(f"Cannot serialise {type(o).__name__}")
+
+def write_sidecar(json_path, bundle_json, fmt=None):
+    """
+    Write the sidecar for json_path (which must already be written) and return its path.
+    The header is a JSON line of its own ahead of the payload, so it can be checked without deserialising anything.
+    """
+    fmt = fmt or sidecar_format()
+    header = {'version': SIDECAR_VERSION, 'format': fmt, 'source_sha256': file_sha256(json_path)}
+    path = sidecar_path(json_path, fmt)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(json.dumps(header).encode() + b'\n')
+        if fmt == 'msgpack':
+            f.write(msgpack.packb(bundle_json, default=_msgpack_default, use_bin_type=True))
+        else:
+            pickle.dump(bundle_json, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+def read_sidecar(json_path, fmt=None):
+    """
+    Return (header, bundle_json) from the sidecar, or None when it is missing, unreadable, of another version or
+    not written from the current json_path. The header is checked before the payload is deserialised, so a stale
+    or foreign pickle is never loaded.
+    """
+    fmt = fmt or sidecar_format()
+    path = sidecar_path(json_path, fmt)
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if (not isinstance(header, dict) or header.get('version') != SIDECAR_VERSION or header.get('format') != fmt
+                    or header.get('source_sha256') != file_sha256(json_path)):
+                return None
+            if fmt == 'msgpack':
+                bundle_json = msgpack.unpackb(f.read(), raw=False, object_pairs_hook=node_object_hook)
+            else:
+                bundle_json = pickle.load(f)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError, TypeError):
+        return None
+    return header, bundle_json
+
+def load_bundle_json(json_path, refresh=True):
+    """
+    Load apigee_bundle.json, preferring the binary sidecar when it was written from the current JSON.
+    Args:
+        json_path (str): Path to apigee_bundle.json. (MANDATORY)
+        refresh (bool): Rewrite a missing or stale sidecar after decoding the JSON. (OPTIONAL)
+    """
+    cached = read_sidecar(json_path)
+    if cached is not None:
+        return cached[1]
+    with open(json_path) as f:
+        bundle_json = json.load(f, object_pairs_hook=node_object_hook)
+    if refresh and is_sidecar_enabled():
+        write_sidecar(json_path, bundle_json)
+    return bundle_json
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python bundle_json_sidecar.py <apigee_bundle.json>")
+        sys.exit(1)
+    json_path = sys.argv[1]
+    with open(json_path) as f:
+        bundle_json = json.load(f, object_pairs_hook=node_object_hook)
+    print(f"Wrote {write_sidecar(json_path, bundle_json)}")
+
+if __name__ == "__main__":
+    main()
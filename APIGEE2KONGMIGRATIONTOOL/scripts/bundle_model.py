@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+In-memory document model of an Apigee API bundle: every XML file is parsed exactly once and shared by
+xml2json, structure extraction, the endpoint scripts and the policy converters.
+- policies are indexed by name and by root tag, endpoints by name, flow steps by the policy they reference.
+- Parse errors are recorded per member instead of aborting the whole bundle; two policies with the same name raise ValueError.
+- xml_root() lets the converters accept an already parsed Element, a file path or an open file alike.
+"""
+import os
+import hashlib
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from bundle_fs import as_bundle_fs
+
+FLOW_PHASES = ('Request', 'Response')
+
+def xml_root(source):
+    """
+    Root element of an Apigee XML document.
+    Args:
+        source (Element|str|file): Already parsed element, path to an XML file or a binary file object. (MANDATORY)
+    """
+    if isinstance(source, ET.Element):
+        return source
+    return ET.parse(source).getroot()
+
+def _member_stem(member):
+    return os.path.splitext(member.rsplit('/', 1)[-1])[0]
+
+def _flow_steps(flow_elem, endpoint, flow_name):
+    steps = []
+    for phase in FLOW_PHASES:
+        phase_elem = flow_elem.find(phase)
+        if phase_elem is None:
+            continue
+        for step in phase_elem.findall('Step'):
+            steps.append({
+                'policy': step.findtext('Name', '').strip(),
+                'condition': step.findtext('Condition'),
+                'endpoint': endpoint,
+                'flow': flow_name,
+                'phase': phase.lower(),
+            })
+    return steps
+
+def endpoint_flows(root, endpoint=None):
+    """
+    Flows of a proxy/target endpoint in execution order: PreFlow, conditional Flows, PostFlow.
+    Returns:
+        list[dict]: {'name', 'kind' (preflow|flow|postflow), 'condition', 'steps'}
+    """
+    endpoint = endpoint or root.get('name')
+    flows = []
+    for kind, elems in (('preflow', root.findall('PreFlow')),
+                        ('flow', root.findall('Flows/Flow')),
+                        ('postflow', root.findall('PostFlow'))):
+        for flow_elem in elems:
+            name = flow_elem.get('name') or kind
+            flows.append({
+                'name': name,
+                'kind': kind,
+                'condition': flow_elem.findtext('Condition'),
+                'steps': _flow_steps(flow_elem, endpoint, name),
+            })
+    return flows
+
+class BundleModel:
+    """
+    Parse-once view of an Apigee bundle (directory or zip).
+    Attributes:
+        members (list[str]): All XML members in walk order.
+        documents (dict): member -> root Element for members that parsed.
+        errors (dict): member -> parse error message.
+        policies (OrderedDict): policy name -> root Element.
+        policies_by_tag (dict): root tag -> [policy names].
+        proxy_endpoints / target_endpoints (OrderedDict): endpoint file name -> root Element.
+        flows (dict): endpoint file name -> endpoint_flows() of that endpoint.
+        steps (dict): policy name -> [step references across all endpoints].
+    """
+    def __init__(self, bundle):
+        self.fs = as_bundle_fs(bundle)
+        self.source = self.fs.source
+        self.name = self.fs.name
+        self.members = []
+        self.documents = {}
+        self.errors = {}
+        self.digests = {}
+        self.policies = OrderedDict()
+        self.policy_members = {}
+        self.policies_by_tag = {}
+        self.proxy_endpoints = OrderedDict()
+        self.target_endpoints = OrderedDict()
+        self.flows = {}
+        self.steps = {}
+        self._load()
+        self._index()
+
+    def _load(self):
+        for dirpath, _, filenames in self.fs.walk(''):
+            for f in filenames:
+                if not f.lower().endswith('.xml'):
+                    continue
+                member = f"{dirpath}/{f}" if dirpath else f
+                self.members.append(member)
+                data = self.fs.read_bytes(member)
+                self.digests[member] = hashlib.sha256(data).hexdigest()
+                try:
+                    self.documents[member] = ET.fromstring(data)
+                except ET.ParseError as e:
+                    self.errors[member] = str(e)
+
+    def _index(self):
+        for member, root in self.documents.items():
+            folder = member.rsplit('/', 1)[0] if '/' in member else ''
+            if folder == 'apiproxy/policies':
+                name = root.get('name') or _member_stem(member)
+                if name in self.policies:
+                    # Apigee rejects such bundles on import; keeping either file would silently drop the other
+                    raise ValueError(f"Duplicate policy name '{name}' in {self.policy_members[name]} and {member}")
+                self.policies[name] = root
+                self.policy_members[name] = member
+                self.policies_by_tag.setdefault(root.tag, []).append(name)
+            elif folder == 'apiproxy/proxies':
+                self.proxy_endpoints[_member_stem(member)] = root
+            elif folder == 'apiproxy/targets':
+                self.target_endpoints[_member_stem(member)] = root
+        for endpoints in (self.proxy_endpoints, self.target_endpoints):
+            for endpoint, root in endpoints.items():
+                self.flows[endpoint] = endpoint_flows(root, endpoint)
+                for flow in self.flows[endpoint]:
+                    for step in flow['steps']:
+                        self.steps.setdefault(step['policy'], []).append(step)
+
+    @property
+    def api_name(self):
+        root = self.documents.get('apiproxy/apiproxy.xml')
+        if root is not None and root.findtext('Name'):
+            return root.findtext('Name')
+        return self.name
+
+    def policy(self, name):
+        return self.policies.get(name)
+
+    def policies_of(self, tag):
+        return [self.policies[name] for name in self.policies_by_tag.get(tag, [])]
+
+    def step_order(self):
+        """
+        Policy name -> position of its first step in Apigee execution order: request steps of the proxy and then
+        the target endpoints, response steps of the targets and then the proxy; PreFlow, Flows, PostFlow in each.
+        """
+        order = {}
+        sequence = (('request', self.proxy_endpoints), ('request', self.target_endpoints),
+                    ('response', self.target_endpoints), ('response', self.proxy_endpoints))
+        for phase, endpoints in sequence:
+            for endpoint, root in endpoints.items():
+                for flow in endpoint_flows(root, endpoint):
+                    for step in flow['steps']:
+                        if step['phase'] == phase:
+                            order.setdefault(step['policy'], len(order))
+        return order
+
+    def policy_digest(self, name):
+        return self.digests[self.policy_members[name]]
+
+    def close(self):
+        self.fs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def as_bundle_model(bundle):
+    """
+    Return a BundleModel for a directory, a .zip archive, an open bundle filesystem or an existing model.
+    The model is attached to the bundle filesystem, so every stage handed the same filesystem shares one parse.
+    """
+    if isinstance(bundle, BundleModel):
+        return bundle
+    fs = as_bundle_fs(bundle)
+    if fs.model is None:
+        fs.model = BundleModel(fs)
+    return fs.model
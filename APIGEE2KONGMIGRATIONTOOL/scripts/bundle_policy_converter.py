@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Convert all policies of an Apigee bundle to Kong plugins in one call.
+- Each policy is dispatched by its root tag through mappers/policy2plugin.json to the first candidate plugin
+  that has a converter (apigee_policy2<plugin>.py) able to parse that tag.
+- Policies only attached to response flows prefer response-side candidates (e.g. AssignMessage -> response-transformer).
+- Plugins are returned as dicts and written together to a single YAML file; nothing is launched per policy.
+- JavaScript policies are consolidated per flow phase by js_flow_consolidator into pre-/post-function plugins.
+- Usage: python bundle_policy_converter.py <unzipped_api_bundle_dir|bundle.zip> [<service_name>] [<output.yaml>]
+"""
+import os
+import sys
+import glob
+import json
+import inspect
+import importlib
+from functools import lru_cache
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import build_cache
+from bundle_model import as_bundle_model
+from js_flow_consolidator import consolidate_js_flows
+from template_registry import apply_defaults, render
+from yaml_emitter import LOADER, emit, get_output_format
+
+# Kong plugin name -> (converter module, parse function, Apigee root tags the parse function understands)
+PARSERS = {
+    'acl': ('apigee_policy2acl', 'parse_accessentity_policy', ('AccessEntity',)),
+    'basic-auth': ('apigee_policy2basic_auth', 'parse_basicauth_policy', ('BasicAuthentication',)),
+    'cors': ('apigee_policy2cors', 'parse_cors_policy', ('CORS',)),
+    'file-log': ('apigee_policy2file_log', 'parse_messagelogging_policy', ('MessageLogging',)),
+    'hmac-auth': ('apigee_policy2hmac_auth', 'parse_hmac_policy', ('HMAC',)),
+    'http-log': ('apigee_policy2http_log', 'parse_messagelogging_policy', ('MessageLogging',)),
+    'ip-restriction': ('apigee_policy2ip_restriction', 'parse_accesscontrol_policy', ('AccessControl',)),
+    'jwt': ('apigee_policy2jwt', 'parse_jwt_policy', ('JWT', 'VerifyJWT')),
+    'key-auth': ('apigee_policy2key_auth', 'parse_key_auth_policy', ('VerifyAPIKey',)),
+    'ldap-auth': ('apigee_policy2ldap_auth', 'parse_ldap_policy', ('LDAP',)),
+    'oauth2': ('apigee_policy2oauth2', 'parse_oauth2_policy', ('OAuthV2',)),
+    'prometheus': ('apigee_policy2prometheus', 'parse_statisticscollector_policy', ('StatisticsCollector',)),
+    'proxy-cache-advanced': ('apigee_policy2proxy_cache_advanced', 'parse_responsecache_policy', ('ResponseCache',)),
+    'rate-limiting': ('apigee_policy2rate_limiting', 'parse_spikearrest_quota_policy', ('SpikeArrest',)),
+    'rate-limiting-advanced': ('apigee_policy2rate_limiting_advanced', 'parse_quota_policy', ('Quota',)),
+    'request-termination': ('apigee_policy2request_termination', 'parse_raisefault_policy', ('RaiseFault',)),
+    'request-transformer': ('apigee_policy2request_transformer', 'parse_assignmessage_policy', ('AssignMessage',)),
+    'request-validator': ('apigee_policy2request_validator', 'parse_messagevalidation_policy', ('MessageValidation',)),
+    'response-transformer': ('apigee_policy2response_transformer', 'parse_assignmessage_response_policy', ('AssignMessage',)),
+    'response-transformer-advanced': ('apigee_policy2response_transformer_advanced', 'parse_assignmessage_response_policy', ('AssignMessage',)),
+}
+
+DEFAULT_PROTOCOLS = ['http', 'https']
+MIGRATED_TAG = 'apigee-migrated'
+
+def get_scripts_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_template_dir():
+    return os.path.join(get_scripts_dir(), '../templates')
+
+@lru_cache(maxsize=None)
+def load_policy2plugin_mapper(mapper_path=None):
+    mapper_path = mapper_path or os.path.join(get_scripts_dir(), '../mappers/policy2plugin.json')
+    with open(mapper_path) as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def converter_digest():
+    """
+    Digest of the converter code (every script the converters and their helpers live in), part of each cache key
+    so a fixed or changed converter never serves plugins produced by its previous version.
+    """
+    return build_cache.make_key(*(f"{os.path.basename(path)}:{build_cache.file_sha256(path)}"
+                                  for path in sorted(glob.glob(os.path.join(get_scripts_dir(), '*.py')))))
+
+def policy_phases(model, policy_name):
+    """
+    Flow phases ('request'/'response') in which the policy is attached anywhere in the bundle.
+    """
+    return sorted({step['phase'] for step in model.steps.get(policy_name, [])})
+
+def resolve_plugin(tag, phases=(), mapper=None):
+    """
+    Pick the Kong plugin for an Apigee root tag.
+    Args:
+        tag (str): Apigee policy root tag. (MANDATORY)
+        phases (list[str]): Flow phases the policy runs in; response-only policies prefer response candidates. (OPTIONAL)
+        mapper (dict): policy2plugin mapping; defaults to mappers/policy2plugin.json. (OPTIONAL)
+    Returns:
+        str|None: Kong plugin name (dash form), or None when no converter handles the tag.
+    """
+    mapper = load_policy2plugin_mapper() if mapper is None else mapper
+    candidates = [c for c in mapper.get(tag, []) if c['plugin_name'] in PARSERS and tag in PARSERS[c['plugin_name']][2]]
+    if not candidates:
+        # Tags missing from the mapper can still have a dedicated converter
+        return next((plugin for plugin, (_, _, tags) in PARSERS.items() if tag in tags), None)
+    wanted = 'response' if list(phases) == ['response'] else 'request'
+    for c in candidates:
+        if c.get('api_flow') in (wanted, 'both'):
+            return c['plugin_name']
+    return candidates[0]['plugin_name']
+
+def build_plugin(plugin_name, policy_name, config, service_name=None, template_dir=None, output_format=None):
+    """
+    Kong plugin dict named and tagged for the source policy. The converter's config is used as is, unless the
+    output format is 'template', in which case the plugin's Jinja template is rendered and loaded back; otherwise
+    the template's defaults are filled in.
+    """
+    context = {
+        'name': plugin_name,
+        'service': service_name,
+        'config': config,
+        'enabled': True,
+        'protocols': DEFAULT_PROTOCOLS,
+        'tags': [MIGRATED_TAG],
+    }
+    template = plugin_name.replace('-', '_')
+    if get_output_format(output_format) == 'template':
+        rendered = yaml.load(render(template, context, template_dir or get_template_dir()), Loader=LOADER)
+        plugin = dict(rendered.get('plugin', rendered)) if isinstance(rendered, dict) else {}
+    else:
+        plugin = apply_defaults(template, context, template_dir or get_template_dir())
+    plugin['name'] = plugin_name
+    for field in ('service', 'route', 'consumer'):
+        if not plugin.get(field):
+            plugin.pop(field, None)
+    if service_name:
+        plugin['service'] = service_name
+    plugin.setdefault('enabled', True)
+    plugin.setdefault('protocols', DEFAULT_PROTOCOLS)
+    plugin.setdefault('config', config)
+    tags = [str(t) for t in plugin.get('tags') or []]
+    plugin['tags'] = list(dict.fromkeys(tags + [MIGRATED_TAG, f"apigee-policy:{policy_name}"]))
+    return plugin
+
+def convert_policy(model, policy_name, service_name=None, template_dir=None):
+    """
+    Convert one policy of a BundleModel. Returns ('plugins', [dict, ...], notes) or ('unconverted', reason, []).
+    notes lists the settings a converter reported as not expressible in Kong (parse functions taking `report`);
+    parse functions taking `companions` can add plugins that must run along with the main one (e.g. a
+    pre-function guard), which follow it in the list.
+    """
+    root = model.policy(policy_name)
+    plugin_name = resolve_plugin(root.tag, policy_phases(model, policy_name))
+    if plugin_name is None:
+        return 'unconverted', f"no converter for {root.tag}", []
+    module_name, parse_name, _ = PARSERS[plugin_name]
+    parse = getattr(importlib.import_module(module_name), parse_name)
+    parameters = inspect.signature(parse).parameters
+    notes, companions = [], []
+    kwargs = {name: value for name, value in (('report', notes), ('companions', companions)) if name in parameters}
+    config = parse(root, **kwargs)
+    plugins = [build_plugin(plugin_name, policy_name, config, service_name, template_dir)]
+    # Companion plugins have no template of their own: always built from their dicts
+    plugins += [build_plugin(c['name'], policy_name, c['config'], service_name, template_dir, output_format='yaml')
+                for c in companions]
+    return 'plugins', plugins, notes
+
+def convert_bundle_policies(bundle, service_name=None, output_path=None, template_dir=None):
+    """
+    Convert every policy of a bundle in memory and optionally write all plugins to one YAML file.
+    Args:
+        bundle (str|BundleModel): Bundle directory, bundle zip, bundle filesystem or parsed model. (MANDATORY)
+        service_name (str): Kong service the plugins attach to. (OPTIONAL)
+        output_path (str): YAML file receiving {'plugins': [...]}. (OPTIONAL)
+    Returns:
+        dict: {'plugins': [plugin dicts], 'unconverted': [{'policy', 'tag', 'reason'}],
+               'notes': [{'policy', 'setting', 'value', 'reason'}]}
+    """
+    model = as_bundle_model(bundle)
+    plugins, unconverted, notes = [], [], []
+    for policy_name, root in model.policies.items():
+        ident = f"{model.source}/{model.policy_members[policy_name]}"
+        key = build_cache.make_key('policy-plugin', converter_digest(), model.policy_digest(policy_name), service_name,
+                                   ','.join(policy_phases(model, policy_name)), get_output_format())
+        cached = build_cache.lookup('policy-plugin', ident, key)
+        if cached:
+            kind, value, policy_notes = cached['value']
+        else:
+            try:
+                kind, value, policy_notes = convert_policy(model, policy_name, service_name, template_dir)
+                build_cache.record('policy-plugin', ident, key, value=[kind, value, policy_notes])
+            except Exception as e:
+                # Failures are not cached: the next run retries them
+                kind, value, policy_notes = 'unconverted', f"{type(e).__name__}: {e}", []
+        notes.extend(dict(note, policy=policy_name) for note in policy_notes)
+        if kind == 'plugins':
+            plugins.extend(value)
+        else:
+            unconverted.append({'policy': policy_name, 'tag': root.tag, 'reason': value})
+    # JavaScript steps are merged per flow phase into pre-/post-function chunks instead of one plugin each
+    js = consolidate_js_flows(model, service_name)
+    plugins.extend(js['plugins'])
+    unconverted = [item for item in unconverted if item['policy'] not in js['policies']] + js['unconverted']
+    if output_path:
+        write_plugins(plugins, output_path)
+    return {'plugins': plugins, 'unconverted': unconverted, 'notes': notes}
+
+def write_plugins(plugins, output_path):
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    emit({'plugins': plugins}, output_path, 'json' if output_path.endswith('.json') else 'yaml')
+    print(f"Kong plugins YAML ({len(plugins)} plugins) written to {output_path}")
+
+def main():
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        print("Usage: python bundle_policy_converter.py <unzipped_api_bundle_dir|bundle.zip> [<service_name>] [<output.yaml>]")
+        sys.exit(1)
+    bundle = sys.argv[1]
+    service_name = sys.argv[2] if len(sys.argv) > 2 else None
+    with as_bundle_model(bundle) as model:
+        output_path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.getcwd(), f"kong_plugins_{model.name}.yaml")
+        result = convert_bundle_policies(model, service_name, output_path)
+    for item in result['unconverted']:
+        print(f"Not converted: {item['policy']} ({item['tag']}): {item['reason']}")
+    for item in result['notes']:
+        print(f"Not expressed exactly: {item['policy']} {item['setting']} = {item['value']}: {item['reason']}")
+
+if __name__ == "__main__":
+    main()
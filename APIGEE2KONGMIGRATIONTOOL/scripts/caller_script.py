@@ -27,12 +27,26 @@ def run_apigee_bundle_xml2json(bundle_dir):
     sys.argv = ['apigee_bundle_xml2json.py', bundle_dir]
     apigee_bundle_xml2json()
 
-def caller_script():
+def run_parallel_bundles(unzipped_dir, input_dir=None, from_zip=False):
+    from bundle_fs import list_bundle_sources
+    from parallel_bundle_executor import run_bundles_parallel, summarize_results, print_summary, get_output_dir
+    results = run_bundles_parallel(list_bundle_sources(unzipped_dir, input_dir, from_zip), get_output_dir())
+    summary = summarize_results(results)
+    print_summary(summary)
+    return summary
+
+def caller_script(parallel=False, from_zip=False):
     run_config_loaded()
     run_list_apigee_zipfiles()
+    unzipped_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../apigeeapiunzipped')
+    if from_zip:
+        # Bundles are read straight from inputs/*.zip, so the unzip step is not needed
+        input_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../inputs')
+        return run_parallel_bundles(unzipped_dir, input_dir, from_zip=True)
     run_unzip_apigee_zipfiles()
     # Iterate over unzipped bundles and run next steps
-    unzipped_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../apigeeapiunzipped')
+    if parallel:
+        return run_parallel_bundles(unzipped_dir)
     for bundle_name in os.listdir(unzipped_dir):
         bundle_dir = os.path.join(unzipped_dir, bundle_name)
         if os.path.isdir(bundle_dir):
@@ -40,4 +54,6 @@ def caller_script():
             run_apigee_bundle_xml2json(bundle_dir)
 
 if __name__ == "__main__":
-    caller_script()
+    # --parallel: run the full per-bundle chain in a process pool bounded by other.max_threads
+    # --from-zip: same chain, reading bundles directly from their zip archives without unzipping
+    caller_script(parallel='--parallel' in sys.argv[1:], from_zip='--from-zip' in sys.argv[1:])
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Streaming writer for decK declarative configuration (_format_version "3.0").
+- Entities are serialised one at a time into per-section spill files; close() stitches the sections together
+  under a single header, so memory stays bounded by the largest single entity, not by the output size.
+- The final file is written to a temporary path and renamed, so readers never see a half-written config.
+- merge_deck_files() folds many per-bundle kong.yaml files into one workspace file, one bundle in memory at a time.
+- Usage: python deck_writer.py <workspace.yaml> <kong.yaml> [<kong.yaml> ...]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import yaml
+from yaml_emitter import DUMPER, LOADER
+
+FORMAT_VERSION = '3.0'
+SECTIONS = ('services', 'routes', 'plugins', 'upstreams', 'consumers')
+
+
+class DeckWriter:
+    """
+    Incremental decK file writer. Use as a context manager, or call close() (commit) / abort().
+    Args:
+        output_path (str): Destination decK file. (MANDATORY)
+        workspace (str): Optional _workspace value for Kong Enterprise. (OPTIONAL)
+    """
+    def __init__(self, output_path, workspace=None):
+        self.output_path = os.path.abspath(output_path)
+        self.workspace = workspace
+        self.counts = {section: 0 for section in SECTIONS}
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        self._spill_dir = tempfile.mkdtemp(prefix='.deck-', dir=os.path.dirname(self.output_path))
+        self._spills = {}
+        self._closed = False
+
+    def _spill(self, section):
+        if section not in self._spills:
+            self._spills[section] = open(os.path.join(self._spill_dir, f"{section}.yaml"), 'w')
+        return self._spills[section]
+
+    def add(self, section, entity):
+        if section not in self.counts:
+            raise ValueError(f"Unknown decK section: {section}")
+        yaml.dump([entity], self._spill(section), Dumper=DUMPER, default_flow_style=False, sort_keys=False)
+        self.counts[section] += 1
+
+    def add_service(self, entity):
+        self.add('services', entity)
+
+    def add_route(self, entity):
+        self.add('routes', entity)
+
+    def add_plugin(self, entity):
+        self.add('plugins', entity)
+
+    def close(self):
+        if self._closed:
+            return
+        for f in self._spills.values():
+            f.close()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.output_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as out:
+            out.write(f'_format_version: "{FORMAT_VERSION}"\n')
+            if self.workspace:
+                out.write(yaml.dump({'_workspace': self.workspace}, Dumper=DUMPER, default_flow_style=False))
+            for section in SECTIONS:
+                if not self.counts[section]:
+                    continue
+                out.write(f"{section}:\n")
+                with open(os.path.join(self._spill_dir, f"{section}.yaml")) as spill:
+                    shutil.copyfileobj(spill, out)
+        os.replace(tmp_path, self.output_path)
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+        self._closed = True
+
+    def abort(self):
+        for f in self._spills.values():
+            f.close()
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def _drop_empty(entity):
+    return {k: v for k, v in entity.items() if v not in (None, '', [], {})}
+
+def service_entity(service):
+    """
+    decK service from a parse_target_endpoint() service dict.
+    """
+    return _drop_empty({
+        'name': service['name'],
+        'protocol': service.get('protocol'),
+        'host': service.get('host'),
+        'port': service.get('port'),
+        'path': service.get('path'),
+        'retries': service.get('retries'),
+        'connect_timeout': service.get('connect_timeout'),
+        'write_timeout': service.get('write_timeout'),
+        'read_timeout': service.get('read_timeout'),
+        'tags': service.get('tags'),
+    })
+
+def route_entity(route, service_name):
+    """
+    decK route from a parse_proxy_endpoint() route dict (or its expression_route() form), attached to service_name.
+    """
+    return _drop_empty({
+        'name': route['name'],
+        'service': {'name': service_name} if service_name else None,
+        'paths': sorted(route.get('paths') or []),
+        'methods': sorted(route.get('methods') or []),
+        'headers': route.get('headers'),
+        'hosts': route.get('hosts'),
+        'protocols': route.get('protocols'),
+        'strip_path': route.get('strip_path', True),
+        'preserve_host': route.get('preserve_host', False),
+        'regex_priority': route.get('regex_priority'),
+        'expression': route.get('expression'),
+        'priority': route.get('priority'),
+        'tags': route.get('tags'),
+    })
+
+def plugin_entity(plugin):
+    entity = dict(plugin)
+    # decK references the parent service/route by name
+    for field in ('service', 'route', 'consumer'):
+        if isinstance(entity.get(field), dict):
+            entity[field] = entity[field].get('name')
+    return _drop_empty(entity)
+
+def load_deck_file(path):
+    with open(path) as f:
+        return yaml.load(f, Loader=LOADER) or {}
+
+def merge_deck_files(paths, output_path, workspace=None, route_priorities=None):
+    """
+    Merge per-bundle decK files into one, streaming each input's entities straight to the writer.
+    Args:
+        route_priorities (dict): (input path, route name) -> regex_priority overrides, e.g. from route_index. (OPTIONAL)
+    Returns:
+        dict: Entity count per section.
+    """
+    with DeckWriter(output_path, workspace) as writer:
+        for path in paths:
+            config = load_deck_file(path)
+            for section in SECTIONS:
+                for entity in config.get(section) or []:
+                    if section == 'routes' and route_priorities and (path, entity.get('name')) in route_priorities:
+                        entity = dict(entity, regex_priority=route_priorities[(path, entity.get('name'))])
+                    writer.add(section, entity)
+    print(f"decK file written to {output_path}: " + ', '.join(f"{n} {s}" for s, n in writer.counts.items() if n))
+    return writer.counts
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python deck_writer.py <workspace.yaml> <kong.yaml> [<kong.yaml> ...]")
+        sys.exit(1)
+    merge_deck_files(sys.argv[2:], sys.argv[1])
+
+if __name__ == "__main__":
+    main()
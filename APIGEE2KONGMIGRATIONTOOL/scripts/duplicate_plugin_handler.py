@@ -21,14 +21,18 @@ def check_alternative_plugin(plugin_name, alternatives_map):
     return alternatives_map.get(plugin_name)
 
 def merge_plugin_configs(config1, config2):
-    merged = config1.copy()
+    """
+    Merge config2 into a copy of config1: lists are joined in order without repeats, dicts merge recursively,
+    and config1 keeps its value for any other key present in both.
+    """
+    merged = dict(config1)
     for k, v in config2.items():
         if k not in merged:
             merged[k] = v
         elif isinstance(merged[k], list) and isinstance(v, list):
-            merged[k] = list(set(merged[k] + v))
+            merged[k] = merged[k] + [item for item in v if item not in merged[k]]
         elif isinstance(merged[k], dict) and isinstance(v, dict):
-            merged[k].update(v)
+            merged[k] = merge_plugin_configs(merged[k], v)
         # else: keep first config's value
     return merged
 
@@ -1,99 +1,108 @@
 #!/usr/bin/env python3
 """
 Extract Apigee API proxy structure, endpoints, flows, policies, and traffic forwarding logic from unzipped bundle and store in a structured JSON file under the bundle folder.
+The bundle may also be given as its zip archive, which is read in place.
 """
 
 import os
-import xml.etree.ElementTree as ET
 import json
+from bundle_fs import as_bundle_fs
+from bundle_model import xml_root, endpoint_flows, as_bundle_model
 
 def get_api_name(bundle_dir):
-    apiproxy_xml = os.path.join(bundle_dir, 'apiproxy', 'apiproxy.xml')
-    if os.path.exists(apiproxy_xml):
-        tree = ET.parse(apiproxy_xml)
-        root = tree.getroot()
+    fs = as_bundle_fs(bundle_dir)
+    if fs.isfile('apiproxy/apiproxy.xml'):
+        with fs.open('apiproxy/apiproxy.xml') as f:
+            root = xml_root(f)
         name = root.findtext('Name')
         return name
-    return os.path.basename(bundle_dir)
+    return fs.name
 
 def get_endpoints(bundle_dir, endpoint_type):
-    endpoints_dir = os.path.join(bundle_dir, 'apiproxy', endpoint_type)
+    fs = as_bundle_fs(bundle_dir)
+    endpoints_dir = f"apiproxy/{endpoint_type}"
     endpoints = []
-    if os.path.isdir(endpoints_dir):
-        for f in os.listdir(endpoints_dir):
+    if fs.isdir(endpoints_dir):
+        for f in fs.listdir(endpoints_dir):
             if f.endswith('.xml'):
                 endpoints.append(os.path.splitext(f)[0])
     return endpoints
 
-def parse_flows(endpoint_xml_path):
+def parse_flows(endpoint_xml_path, bundle_dir=None):
+    # endpoint_xml_path is a file path, or a member path inside bundle_dir (directory or zip) when given
     flows = []
-    if os.path.exists(endpoint_xml_path):
-        tree = ET.parse(endpoint_xml_path)
-        root = tree.getroot()
-        for flow in root.findall('.//Flow'):
-            flow_info = {
-                'name': flow.get('name'),
-                'condition': flow.findtext('Condition'),
-                'policies': []
-            }
-            for step in flow.findall('.//Step'):
-                policy = step.findtext('Name')
-                cond = step.findtext('Condition')
-                flow_info['policies'].append({'policy': policy, 'condition': cond})
-            flows.append(flow_info)
+    fs = as_bundle_fs(bundle_dir if bundle_dir is not None else os.path.dirname(os.path.abspath(endpoint_xml_path)))
+    member = endpoint_xml_path if bundle_dir is not None else os.path.basename(endpoint_xml_path)
+    if fs.isfile(member):
+        with fs.open(member) as f:
+            flows = flows_from_endpoint(xml_root(f))
     return flows
 
+def flows_from_endpoint(root):
+    return [{
+        'name': flow['name'],
+        'condition': flow['condition'],
+        'policies': [{'policy': step['policy'], 'condition': step['condition']} for step in flow['steps']],
+    } for flow in endpoint_flows(root) if flow['kind'] == 'flow']
+
 def get_proxy_structure(bundle_dir):
+    # Endpoint names and the API name come from the shared, parse-once bundle model
+    model = as_bundle_model(bundle_dir)
     structure = {
-        "api_name": get_api_name(bundle_dir),
+        "api_name": model.api_name,
         "endpoints": {
-            "proxy": get_endpoints(bundle_dir, "proxies"),
-            "target": get_endpoints(bundle_dir, "targets")
+            "proxy": list(model.proxy_endpoints),
+            "target": list(model.target_endpoints)
         },
-        "resources": get_resources_tree(os.path.join(bundle_dir, "apiproxy", "resources"), bundle_dir)
+        "resources": get_resources_tree(model.fs, "apiproxy/resources")
     }
     return structure
 
-def get_resources_tree(resources_dir, bundle_dir):
+def get_resources_tree(bundle_dir, resources_dir='apiproxy/resources'):
+    fs = as_bundle_fs(bundle_dir)
     resources_tree = {}
-    for root, dirs, files in os.walk(resources_dir):
-        rel_root = os.path.relpath(root, resources_dir)
-        if rel_root == '.':
-            rel_root = ''
+    for root, dirs, files in fs.walk(resources_dir):
+        rel_root = root[len(resources_dir):].strip('/')
         folder = resources_tree
         if rel_root:
-            for part in rel_root.split(os.sep):
+            for part in rel_root.split('/'):
                 folder = folder.setdefault(part, {})
         folder['files'] = files
     return resources_tree
 
 def print_tree(startpath, prefix=''):
-    for root, dirs, files in os.walk(startpath):
-        level = root.replace(startpath, '').count(os.sep)
+    fs = as_bundle_fs(startpath)
+    for root, dirs, files in fs.walk(''):
+        level = root.count('/') + 1 if root else 0
         indent = ' ' * 2 * level
-        print(f'{indent}{os.path.basename(root)}/')
+        print(f"{indent}{os.path.basename(root) if root else fs.name}/")
         subindent = ' ' * 2 * (level + 1)
         for f in files:
             print(f'{subindent}{f}')
 
-def main():
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python extract_apigee_api_structure.py <unzipped_api_bundle_dir>")
-        sys.exit(1)
-    bundle_dir = sys.argv[1]
-    api_name = get_api_name(bundle_dir)
-    print("\n___ API Filesystem Tree ___")
-    print_tree(bundle_dir)
-    structure = get_proxy_structure(bundle_dir)
-    print("\n___ API Structure ___")
-    print(json.dumps(structure, indent=2))
-    # Save to interim json file
-    interim_dir = os.path.join(os.path.dirname(bundle_dir), '..', 'interims')
+def write_interim_structure(bundle_dir, api_name, structure):
+    bundle_source = as_bundle_fs(bundle_dir).source
+    interim_dir = os.path.join(os.path.dirname(bundle_source), '..', 'interims')
     os.makedirs(interim_dir, exist_ok=True)
     interim_path = os.path.join(interim_dir, f"{api_name}_filesystem.json")
     with open(interim_path, 'w') as f:
         json.dump(structure, f, indent=2)
+    return interim_path
+
+def main():
+    import sys
+    if len(sys.argv) != 2:
+        print("Usage: python extract_apigee_api_structure.py <unzipped_api_bundle_dir|bundle.zip>")
+        sys.exit(1)
+    with as_bundle_model(sys.argv[1]) as model:
+        api_name = model.api_name
+        print("\n___ API Filesystem Tree ___")
+        print_tree(model.fs)
+        structure = get_proxy_structure(model)
+        print("\n___ API Structure ___")
+        print(json.dumps(structure, indent=2))
+        # Save to interim json file
+        interim_path = write_interim_structure(model.fs, api_name, structure)
     print(f"\nAPI structure written to {interim_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Flow-aware consolidation of Apigee JavaScript policies into one pre-function and one post-function plugin.
+- Steps are read in ProxyEndpoint execution order: request PreFlow, conditional Flows, PostFlow, then the same
+  for the response. Consecutive JavaScript steps form one run; all runs of a phase share a single Lua chunk.
+- Request runs before the first non-JavaScript step go to pre-function (which runs before every other plugin);
+  later request runs and all response runs go to post-function. Response runs use body_filter when their Lua
+  touches the body, else header_filter.
+- Flow and step <Condition>s become Lua guards (apigee_condition.condition_to_lua). Apigee runs only the
+  first conditional Flow that matches, so each chunk resolves the matching flow once and guards on it.
+- Lua bodies are the already converted scripts next to the JS resource (<name>_kong.lua from
+  apigee_to_kong_var_replacer.py, or <name>.lua) under apiproxy/resources/{jsc,lua}/ or a --lua-dir.
+  Steps without one keep their place as a logged stub and are reported as unconverted.
+- Usage: python js_flow_consolidator.py <unzipped_api_bundle_dir|bundle.zip> [<service_name>] [<output.yaml>] [--lua-dir <dir>]
+"""
+import os
+import sys
+from bundle_model import as_bundle_model
+from apigee_condition import ConditionError, condition_to_lua
+from yaml_emitter import emit
+
+JS_TAGS = ('Javascript',)
+LUA_FOLDERS = ('apiproxy/resources/jsc', 'apiproxy/resources/lua')
+MIGRATED_TAG = 'apigee-migrated'
+BODY_CALLS = ('get_raw_body', 'set_raw_body', 'ngx.arg[1]')
+
+def _script_stem(root):
+    url = (root.findtext('ResourceURL') or '').strip()
+    name = url.split('://', 1)[-1] if url else root.get('name')
+    return os.path.splitext(name.rsplit('/', 1)[-1])[0]
+
+def lua_body(model, policy_name, lua_dir=None):
+    """
+    Converted Lua source for a JavaScript policy, or None when no converted script exists.
+    """
+    stem = _script_stem(model.policy(policy_name))
+    for candidate in (f"{stem}_kong.lua", f"{stem}.lua"):
+        if lua_dir and os.path.isfile(os.path.join(lua_dir, candidate)):
+            with open(os.path.join(lua_dir, candidate), encoding='utf-8') as f:
+                return f.read()
+        for folder in LUA_FOLDERS:
+            if model.fs.isfile(f"{folder}/{candidate}"):
+                return model.fs.read_bytes(f"{folder}/{candidate}").decode('utf-8')
+    return None
+
+def _guard(condition):
+    text = (condition or '').strip()
+    return condition_to_lua(text) if text else None
+
+def _indent(code, prefix):
+    return '\n'.join(prefix + line if line.strip() else '' for line in code.rstrip().splitlines())
+
+def _is_js(model, policy_name):
+    root = model.policy(policy_name)
+    return root is not None and root.tag in JS_TAGS
+
+def endpoint_runs(model, endpoint):
+    """
+    Consecutive JavaScript step runs of one ProxyEndpoint, in execution order.
+    Returns:
+        list[dict]: {'phase' (request|response), 'first' (no non-JS step ran before it), 'steps': [(flow, step)]}
+    """
+    runs, current = [], None
+    for phase in ('request', 'response'):
+        seen_other = False
+        for flow in model.flows[endpoint]:
+            for step in flow['steps']:
+                if step['phase'] != phase:
+                    continue
+                if not _is_js(model, step['policy']):
+                    seen_other, current = True, None
+                    continue
+                if current is None or current['phase'] != phase:
+                    current = {'phase': phase, 'first': phase == 'request' and not seen_other, 'steps': []}
+                    runs.append(current)
+                current['steps'].append((flow, step))
+        current = None
+    return runs
+
+def _flow_selector(flows):
+    """
+    Lua assigning the name of the first matching conditional flow to local `flow`, as Apigee does.
+    """
+    branches = []
+    for flow in flows:
+        if flow['kind'] != 'flow':
+            continue
+        guard = _guard(flow['condition']) or 'true'
+        branches.append(f"{'if' if not branches else 'elseif'} {guard} then flow = \"{flow['name']}\"")
+    return ['local flow', '\n'.join(branches) + '\nend'] if branches else []
+
+def _step_code(model, flow, step, lua_dir, unconverted):
+    policy = step['policy']
+    body = lua_body(model, policy, lua_dir)
+    if body is None:
+        unconverted.append({'policy': policy, 'tag': model.policy(policy).tag, 'reason': 'no converted Lua script'})
+        body = f'kong.log.warn("Apigee JavaScript policy {policy} has no converted Lua script")'
+    guards = []
+    if flow['kind'] == 'flow':
+        guards.append(f"flow == \"{flow['name']}\"")
+    try:
+        step_guard = _guard(step['condition'])
+    except ConditionError as e:
+        unconverted.append({'policy': policy, 'tag': model.policy(policy).tag, 'reason': f"condition not converted: {e}"})
+        step_guard = 'false'
+    if step_guard:
+        guards.append(step_guard)
+    # Each body runs in its own function so its locals and early returns stay local to the step
+    code = f"-- {flow['name']}/{step['phase']}: {policy}\ndo\n  local step = function()\n{_indent(body, '    ')}\n  end\n"
+    if guards:
+        return code + f"  if {' and '.join(guards)} then step() end\nend"
+    return code + "  step()\nend"
+
+def _chunk_prelude(base_paths, flows, guard_endpoint=False):
+    lines = [
+        'local base_paths = {' + ', '.join(f'"{bp.rstrip("/")}"' for bp in base_paths) + '}',
+        'local function pathsuffix()',
+        '  local path = kong.request.get_path()',
+        '  for _, bp in ipairs(base_paths) do',
+        '    if path:sub(1, #bp) == bp then return path:sub(#bp + 1) end',
+        '  end',
+        '  return path',
+        'end',
+    ]
+    if guard_endpoint:
+        # Several ProxyEndpoints share the service: only run this endpoint's steps under its base paths
+        lines.append('if pathsuffix() == kong.request.get_path() and base_paths[1] ~= "" then return end')
+    return lines + _flow_selector(flows)
+
+def consolidate_js_flows(bundle, service_name=None, lua_dir=None):
+    """
+    Merge every JavaScript step of the bundle's ProxyEndpoints into pre-function/post-function phase chunks.
+    Args:
+        bundle (str|BundleModel): Bundle directory, bundle zip, bundle filesystem or parsed model. (MANDATORY)
+        service_name (str): Kong service the plugins attach to. (OPTIONAL)
+        lua_dir (str): Extra directory holding converted <script>_kong.lua / <script>.lua files. (OPTIONAL)
+    Returns:
+        dict: {'plugins': [plugin dicts], 'policies': [consolidated policy names], 'unconverted': [...]}
+    """
+    model = as_bundle_model(bundle)
+    chunks = {'pre-function': {}, 'post-function': {}}
+    merged = {'pre-function': [], 'post-function': []}
+    unconverted = []
+    for endpoint, root in model.proxy_endpoints.items():
+        runs = endpoint_runs(model, endpoint)
+        if not runs:
+            continue
+        base_paths = [bp.text.strip() for bp in root.findall('.//BasePath') if bp.text]
+        try:
+            prelude = _chunk_prelude(base_paths, model.flows[endpoint], len(model.proxy_endpoints) > 1)
+        except ConditionError as e:
+            for run in runs:
+                for _, step in run['steps']:
+                    unconverted.append({'policy': step['policy'], 'tag': model.policy(step['policy']).tag,
+                                        'reason': f"flow condition not converted: {e}"})
+            continue
+        for run in runs:
+            codes = [_step_code(model, flow, step, lua_dir, unconverted) for flow, step in run['steps']]
+            if run['phase'] == 'request':
+                plugin, phase = ('pre-function' if run['first'] else 'post-function'), 'access'
+            else:
+                plugin = 'post-function'
+                phase = 'body_filter' if any(call in code for code in codes for call in BODY_CALLS) else 'header_filter'
+            chunks[plugin].setdefault(phase, {}).setdefault(endpoint, prelude[:]).extend(codes)
+            merged[plugin].extend(step['policy'] for _, step in run['steps'])
+    plugins = []
+    for plugin_name, phases in chunks.items():
+        if not phases:
+            continue
+        plugin = {
+            'name': plugin_name,
+            'service': service_name,
+            'config': {phase: ['\n'.join(lines) + '\n' for lines in endpoints.values()] for phase, endpoints in phases.items()},
+            'enabled': True,
+            'protocols': ['http', 'https'],
+            'tags': [MIGRATED_TAG] + [f"apigee-policy:{p}" for p in dict.fromkeys(merged[plugin_name])],
+        }
+        if not service_name:
+            plugin.pop('service')
+        plugins.append(plugin)
+    policies = list(dict.fromkeys(merged['pre-function'] + merged['post-function']))
+    return {'plugins': plugins, 'policies': policies, 'unconverted': unconverted}
+
+def main():
+    args = sys.argv[1:]
+    lua_dir = None
+    if '--lua-dir' in args:
+        i = args.index('--lua-dir')
+        lua_dir = args[i + 1]
+        del args[i:i + 2]
+    if not 1 <= len(args) <= 3:
+        print("Usage: python js_flow_consolidator.py <unzipped_api_bundle_dir|bundle.zip> [<service_name>] [<output.yaml>] [--lua-dir <dir>]")
+        sys.exit(1)
+    with as_bundle_model(args[0]) as model:
+        service_name = args[1] if len(args) > 1 else None
+        output_path = args[2] if len(args) > 2 else os.path.join(os.getcwd(), f"kong_js_functions_{model.name}.yaml")
+        result = consolidate_js_flows(model, service_name, lua_dir)
+    emit({'plugins': result['plugins']}, output_path)
+    print(f"{len(result['policies'])} JavaScript steps consolidated into {len(result['plugins'])} plugins: {output_path}")
+    for item in result['unconverted']:
+        print(f"Not converted: {item['policy']} ({item['tag']}): {item['reason']}")
+
+if __name__ == "__main__":
+    main()
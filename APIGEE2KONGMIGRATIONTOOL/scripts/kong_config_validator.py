@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Single-pass validator for (very large) decK files.
+- The file is read as a libyaml event stream; each entity of a top-level section (services, routes, plugins, ...)
+  is built straight from the events (no node tree, no second pass), checked on its own and then dropped, so memory stays bounded by the largest entity plus the
+  names needed to resolve references, not by the file size.
+- Checks: plugin config against the bundled schemas (mappers/kong_plugin_schemas.json), references from routes
+  and plugins to services/routes/consumers, unique names (and one plugin per name and scope), tag presence, and
+  cycles or unknown plugins in dynamic ordering (ordering.before/after.access), per plugin scope.
+  Nested entities (services[].routes[].plugins[]) are checked in the same pass.
+- Findings are machine readable: {'severity', 'check', 'section', 'entity', 'field', 'line', 'message'}.
+- Usage: python kong_config_validator.py <kong.yaml> [--report <findings.json>] [--require-tag <tag>]
+"""
+import os
+import sys
+import json
+from functools import lru_cache
+import yaml
+from yaml.nodes import ScalarNode
+from yaml_emitter import LOADER
+from plugin_ordering_resolver import strongly_connected
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../mappers/kong_plugin_schemas.json')
+ENTITY_SECTIONS = ('services', 'routes', 'plugins', 'consumers', 'upstreams', 'certificates', 'consumer_groups')
+# Entities Kong names by a field other than 'name'
+NAME_FIELDS = {'consumers': 'username', 'certificates': 'id'}
+TAGGED_SECTIONS = ('services', 'routes', 'plugins')
+PYTHON_TYPES = {'string': str, 'integer': int, 'number': (int, float), 'boolean': bool, 'map': dict, 'record': dict, 'array': list}
+
+@lru_cache(maxsize=None)
+def load_plugin_schemas(path=SCHEMA_PATH):
+    with open(path) as f:
+        return {name: schema for name, schema in json.load(f).items() if not name.startswith('_')}
+
+def _spec(spec):
+    if isinstance(spec, dict):
+        return spec
+    if spec.endswith('[]'):
+        return {'type': 'array', 'elements': spec[:-2]}
+    return {'type': spec}
+
+class _Findings:
+    def __init__(self):
+        self.items = []
+
+    def add(self, severity, check, section, entity, message, field=None, line=None):
+        self.items.append({'severity': severity, 'check': check, 'section': section, 'entity': entity,
+                           'field': field, 'line': line, 'message': message})
+
+def _type_ok(value, type_name):
+    if type_name == 'any':
+        return True
+    if type_name in ('integer', 'number') and isinstance(value, bool):
+        return False
+    return isinstance(value, PYTHON_TYPES[type_name])
+
+def validate_value(value, spec, field, report, unknown=None):
+    """
+    Check one config value against a field spec; report(message, field) is called for every violation and
+    unknown(message, field) (default: report) for fields a record spec does not list.
+    """
+    spec = _spec(spec)
+    if value is None:
+        if spec.get('required'):
+            report('required field missing', field)
+        return
+    if not _type_ok(value, spec['type']):
+        report(f"expected {spec['type']}, got {type(value).__name__}", field)
+        return
+    if 'one_of' in spec and value not in spec['one_of']:
+        report(f"expected one of {', '.join(map(str, spec['one_of']))}, got {value!r}", field)
+    if spec['type'] == 'array' and 'elements' in spec:
+        for i, item in enumerate(value):
+            validate_value(item, spec['elements'], f"{field}[{i}]", report, unknown)
+    if spec['type'] == 'record' and 'fields' in spec:
+        validate_record(value, spec['fields'], field, report, unknown)
+
+def validate_record(value, fields, prefix, report, unknown=None):
+    for name, spec in fields.items():
+        validate_value(value.get(name), spec, f"{prefix}.{name}" if prefix else name, report, unknown)
+    for name in value:
+        if name not in fields:
+            (unknown or report)('unknown field', f"{prefix}.{name}" if prefix else name)
+
+def validate_plugin_config(plugin_name, config, report, warn=None, schemas=None):
+    """
+    Validate a plugin's config against its bundled schema. Returns False when no schema is bundled for it.
+    Args:
+        report (callable): report(message, field) for schema violations. (MANDATORY)
+        warn (callable): warn(message, field) for fields the schema does not know; defaults to report. (OPTIONAL)
+    """
+    schema = (schemas or load_plugin_schemas()).get(plugin_name)
+    if schema is None:
+        return False
+    config = config if isinstance(config, dict) else {}
+    validate_record(config, schema['fields'], 'config', report, warn)
+    for check in schema.get('entity_checks', []):
+        if 'at_least_one_of' in check and all(config.get(f) is None for f in check['at_least_one_of']):
+            report(f"at least one of {', '.join(check['at_least_one_of'])} is required", 'config')
+        if 'same_length' in check:
+            lengths = {len(config.get(f) or []) for f in check['same_length']}
+            if len(lengths) > 1:
+                report(f"{' and '.join(check['same_length'])} must have the same length", 'config')
+        if 'conditional' in check:
+            cond = check['conditional']
+            if config.get(cond['if_field']) == cond['if_match'] and config.get(cond['then_field']) in (None, '', {}):
+                report(f"{cond['then_field']} is required when {cond['if_field']} is {cond['if_match']}", f"config.{cond['then_field']}")
+    return True
+
+def _ref(value):
+    return value.get('name') or value.get('id') if isinstance(value, dict) else value
+
+def _covers(scope, other):
+    """
+    True when a plugin scoped to `scope` (service, route, consumer; None = any) also runs for requests in `other`.
+    """
+    return all(ref is None or ref == other_ref for ref, other_ref in zip(scope, other))
+
+class KongConfigValidator:
+    """
+    Stateful checker fed one entity at a time; call finish() once every entity has been seen.
+    Args:
+        required_tag (str): Tag every service, route and plugin must carry; any tag is enough when None. (OPTIONAL)
+    """
+    def __init__(self, required_tag=None, schemas=None):
+        self.required_tag = required_tag
+        self.schemas = schemas or load_plugin_schemas()
+        self.findings = _Findings()
+        self.names = {section: {} for section in ENTITY_SECTIONS}
+        self.plugin_scopes = {}
+        self.ordering_edges = {}
+        self.references = []
+        self.counts = {section: 0 for section in ENTITY_SECTIONS}
+
+    def check(self, section, entity, line=None, parent=None):
+        if not isinstance(entity, dict):
+            self.findings.add('error', 'structure', section, None, f"{section} entries must be mappings", line=line)
+            return
+        self.counts[section] += 1
+        name = entity.get(NAME_FIELDS.get(section, 'name')) or entity.get('id')
+        label = name or f"{section}#{self.counts[section]}"
+        # Plugin names are types; their uniqueness is per name and scope (_check_plugin)
+        if name is not None and section != 'plugins':
+            if name in self.names[section]:
+                self.findings.add('error', 'unique-name', section, label,
+                                  f"duplicate name, first defined on line {self.names[section][name]}", line=line)
+            else:
+                self.names[section][name] = line
+        elif section in ('services', 'routes', 'consumers', 'upstreams'):
+            self.findings.add('warning', 'unique-name', section, label, 'entity has no name', line=line)
+        if section in TAGGED_SECTIONS:
+            tags = entity.get('tags') or []
+            if not tags or (self.required_tag and self.required_tag not in tags):
+                self.findings.add('warning', 'tags', section, label,
+                                  f"missing tag {self.required_tag}" if self.required_tag else 'entity has no tags', 'tags', line)
+        parent = parent or {}
+        if section == 'routes':
+            service = _ref(entity.get('service')) or parent.get('service')
+            if entity.get('service') is not None:
+                self.references.append(('services', _ref(entity['service']), section, label, 'service', line))
+            if not service and not entity.get('expression') and not entity.get('paths') and not entity.get('hosts') and not entity.get('headers'):
+                self.findings.add('error', 'schema', section, label, 'route needs paths, hosts, headers or an expression', line=line)
+            parent = dict(parent, service=service, route=name)
+        elif section == 'services':
+            if not entity.get('host') and not entity.get('url'):
+                self.findings.add('error', 'schema', section, label, 'service needs a host or url', 'host', line)
+            parent = {'service': name}
+        elif section == 'consumers':
+            parent = {'consumer': name}
+        elif section == 'plugins':
+            self._check_plugin(entity, label, line, parent)
+        for nested in ('routes', 'plugins'):
+            for child in entity.get(nested) or []:
+                self.check(nested, child, getattr(child, 'line', line), parent)
+
+    def _check_plugin(self, plugin, label, line, parent):
+        plugin_name = plugin.get('name')
+        if not plugin_name:
+            self.findings.add('error', 'schema', 'plugins', label, 'plugin has no name', 'name', line)
+            return
+        scope = []
+        for field in ('service', 'route', 'consumer'):
+            ref = _ref(plugin.get(field)) or parent.get(field)
+            if plugin.get(field) is not None:
+                self.references.append((f"{field}s", _ref(plugin[field]), 'plugins', plugin_name, field, line))
+            scope.append(ref)
+        scope = tuple(scope)
+        key = (plugin_name, scope)
+        if key in self.plugin_scopes:
+            self.findings.add('error', 'unique-name', 'plugins', plugin_name,
+                              f"second {plugin_name} instance in one scope, first on line {self.plugin_scopes[key]}", line=line)
+        else:
+            self.plugin_scopes[key] = line
+        for direction in ('before', 'after'):
+            for other in ((plugin.get('ordering') or {}).get(direction) or {}).get('access') or []:
+                edge = (plugin_name, other) if direction == 'before' else (other, plugin_name)
+                self.ordering_edges.setdefault(scope, {}).setdefault(edge, (plugin_name, other, line))
+        report = lambda message, field: self.findings.add('error', 'schema', 'plugins', plugin_name, message, field, line)
+        warn = lambda message, field: self.findings.add('warning', 'schema', 'plugins', plugin_name, message, field, line)
+        if not validate_plugin_config(plugin_name, plugin.get('config'), report, warn, self.schemas):
+            self.findings.add('warning', 'schema', 'plugins', plugin_name, 'no bundled schema for this plugin', line=line)
+
+    def finish(self):
+        """
+        Resolve the references and dynamic plugin ordering collected during the pass. Returns the findings list.
+        """
+        for target, name, section, label, field, line in self.references:
+            if name not in self.names[target]:
+                self.findings.add('error', 'reference', section, label, f"{field} '{name}' is not defined", field, line)
+        self.references = []
+        # Ordering only relates plugins running on the same request, so edges and cycles are per scope
+        for scope, edges in self.ordering_edges.items():
+            for plugin_name, other, line in edges.values():
+                if not any(name == other and _covers(other_scope, scope) for name, other_scope in self.plugin_scopes):
+                    self.findings.add('warning', 'ordering', 'plugins', plugin_name, f"ordered relative to {other}, which is not configured", 'ordering', line)
+            nodes = {n for edge in edges for n in edge}
+            for cycle in strongly_connected(nodes, edges):
+                plugin_name, _, line = min((v for (a, b), v in edges.items() if a in cycle and b in cycle), key=lambda v: v[2] or 0)
+                self.findings.add('error', 'ordering', 'plugins', plugin_name, f"dynamic ordering cycle between {', '.join(cycle)}", 'ordering', line)
+        return self.findings.items
+
+STR_TAG = 'tag:yaml.org,2002:str'
+PLAIN_CONSTANTS = {'': None, '~': None, 'null': None, 'Null': None, 'NULL': None,
+                   'true': True, 'True': True, 'TRUE': True, 'false': False, 'False': False, 'FALSE': False}
+
+def _scalar(loader, event):
+    if event.tag in (None, '!') and not event.implicit[0]:
+        return event.value
+    if event.tag in (None, '!'):
+        value = event.value
+        if value in PLAIN_CONSTANTS:
+            return PLAIN_CONSTANTS[value]
+        if value.isdigit() and (value[0] != '0' or value == '0'):
+            return int(value)
+        tag = loader.resolve(ScalarNode, value, event.implicit)
+        if tag == STR_TAG:
+            return value
+    else:
+        tag = event.tag
+    # Floats, timestamps, explicit tags: let the SafeConstructor decide
+    return loader.construct_document(ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style))
+
+class _Mapping(dict):
+    """
+    Mapping built from the event stream that remembers the line it starts on, so nested entities report their own line.
+    """
+    __slots__ = ('line',)
+
+def _build(loader, event, anchors):
+    """
+    Python value for `event` and everything nested in it, read straight from the event stream (no node tree).
+    """
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(None, None, f"found undefined alias {event.anchor}", event.start_mark)
+        return anchors[event.anchor]
+    if isinstance(event, yaml.ScalarEvent):
+        value = _scalar(loader, event)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        value = []
+        while not loader.check_event(yaml.SequenceEndEvent):
+            value.append(_build(loader, loader.get_event(), anchors))
+        loader.get_event()
+    else:
+        value = _Mapping()
+        value.line = event.start_mark.line + 1
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _build(loader, loader.get_event(), anchors)
+            item = _build(loader, loader.get_event(), anchors)
+            if key == '<<' and isinstance(item, (dict, list)):
+                for merged in (item if isinstance(item, list) else [item]):
+                    for k, v in merged.items():
+                        value.setdefault(k, v)
+            else:
+                value[key if not isinstance(key, (dict, list)) else json.dumps(key, default=str)] = item
+        loader.get_event()
+    if event.anchor:
+        anchors[event.anchor] = value
+    return value
+
+def iter_entities(stream):
+    """
+    Yield (section, entity, line) for every entity of the decK file's top-level sections, and (key, value, line)
+    for other top-level keys, composing one entity at a time.
+    """
+    loader = LOADER(stream)
+    try:
+        while not loader.check_event(yaml.StreamEndEvent):
+            event = loader.get_event()
+            if not isinstance(event, yaml.MappingStartEvent):
+                continue
+            anchors = {}
+            while not loader.check_event(yaml.MappingEndEvent):
+                key = _build(loader, loader.get_event(), anchors)
+                value_event = loader.get_event()
+                line = value_event.start_mark.line + 1
+                if key in ENTITY_SECTIONS and isinstance(value_event, yaml.SequenceStartEvent):
+                    while not loader.check_event(yaml.SequenceEndEvent):
+                        item_event = loader.get_event()
+                        yield key, _build(loader, item_event, anchors), item_event.start_mark.line + 1
+                    loader.get_event()
+                else:
+                    yield key, _build(loader, value_event, anchors), line
+            loader.get_event()
+    finally:
+        loader.dispose()
+
+def validate_deck_file(path, required_tag=None):
+    """
+    Validate a decK file in one streaming pass.
+    Args:
+        path (str): decK YAML or JSON file. (MANDATORY)
+        required_tag (str): Tag every service, route and plugin must carry. (OPTIONAL)
+    Returns:
+        dict: {'file', 'summary': {'entities', 'errors', 'warnings'}, 'findings': [...]}
+    """
+    validator = KongConfigValidator(required_tag)
+    with open(path, 'rb') as f:
+        try:
+            for section, value, line in iter_entities(f):
+                if section in ENTITY_SECTIONS:
+                    validator.check(section, value, line)
+                elif section == '_format_version' and str(value) not in ('1.1', '3.0'):
+                    validator.findings.add('warning', 'structure', None, None, f"unexpected _format_version {value}", '_format_version', line)
+        except yaml.YAMLError as e:
+            mark = getattr(e, 'problem_mark', None)
+            validator.findings.add('error', 'syntax', None, None, str(e).splitlines()[0], line=mark.line + 1 if mark else None)
+    findings = validator.finish()
+    return {
+        'file': path,
+        'summary': {
+            'entities': {section: n for section, n in validator.counts.items() if n},
+            'errors': sum(1 for f in findings if f['severity'] == 'error'),
+            'warnings': sum(1 for f in findings if f['severity'] == 'warning'),
+        },
+        'findings': findings,
+    }
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for option in ('--report', '--require-tag'):
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            del args[i:i + 2]
+    if len(args) != 1:
+        print("Usage: python kong_config_validator.py <kong.yaml> [--report <findings.json>] [--require-tag <tag>]")
+        sys.exit(1)
+    result = validate_deck_file(args[0], options.get('--require-tag'))
+    if '--report' in options:
+        with open(options['--report'], 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    summary = result['summary']
+    print(f"{args[0]}: {summary['errors']} errors, {summary['warnings']} warnings", file=sys.stderr)
+    sys.exit(1 if summary['errors'] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Run the per-bundle migration chain (detect -> xml2json -> structure -> deck) for every
+unzipped Apigee API bundle in a bounded process pool, isolating failures per bundle and printing an
+aggregated summary at the end.
+- Worker count is taken from configs/config.json (other.max_threads) unless given explicitly.
+- With --from-zip the bundle zips are read in place; nothing is extracted to apigeeapiunzipped/.
+- Each bundle gets one decK file, outputs/<bundle>/kong.yaml; --workspace merges them into a single file, with
+  regex_priority assigned across all bundles and route collisions reported next to it (<file>_routes_report.json).
+- Routes of each ProxyEndpoint attach to the service of the TargetEndpoint its RouteRule names; plugins are scoped
+  to the routes of the conditional Flow that runs their step, or to the endpoint's service for Pre/PostFlow steps.
+- Plugins are minimised (plugin_optimizer) and given dynamic ordering where the Apigee step order needs it
+  (plugin_ordering_resolver) before the decK file is written.
+- Usage: python parallel_bundle_executor.py [--from-zip] [--workspace <file>] [<bundles_dir>] [<output_dir>] [<max_workers>]
+"""
+import os
+import sys
+import copy
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import build_cache
+import template_registry
+from bundle_fs import as_bundle_fs, list_bundle_sources
+from config_loaded import load_config
+from detect_apigee_type_and_tree import detect_apigee_type
+from bundle_model import as_bundle_model, endpoint_flows
+from bundle_policy_converter import convert_bundle_policies
+from deck_writer import DeckWriter, service_entity, route_entity, plugin_entity, merge_deck_files
+from plugin_optimizer import POLICY_TAG, is_optimizer_enabled, optimize_plugins
+from plugin_ordering_resolver import is_ordering_enabled, resolve_bundle_ordering
+from route_index import index_deck_files, is_blocking, write_report
+from apigee_bundle_xml2json import build_json_from_model, get_json_dir, write_json
+from extract_apigee_api_structure import get_proxy_structure, write_interim_structure
+from js_flow_consolidator import JS_TAGS
+from proxyendpoint2service import (FLOW_TAG, RESIDUAL_TAG, parse_proxy_endpoint, expression_route, get_router_flavor,
+                                   rewrite_plugin, route_rules)
+from targetendpoint2service import parse_target_endpoint
+
+def get_scripts_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_unzipped_dir():
+    return os.path.join(get_scripts_dir(), '../apigeeapiunzipped')
+
+def get_input_dir():
+    return os.path.join(get_scripts_dir(), '../inputs')
+
+def bundle_display_name(bundle):
+    name = os.path.basename(os.path.normpath(bundle))
+    return os.path.splitext(name)[0] if name.lower().endswith('.zip') else name
+
+def get_output_dir():
+    return os.path.join(get_scripts_dir(), '../outputs')
+
+def get_template_dir():
+    return os.path.join(get_scripts_dir(), '../templates')
+
+def get_max_workers():
+    """
+    Read the worker bound from configs/config.json (other.max_threads), defaulting to the CPU count.
+    """
+    config_path = os.path.join(get_scripts_dir(), '../configs/config.json')
+    try:
+        max_threads = load_config(config_path).get('other', {}).get('max_threads')
+    except (OSError, ValueError):
+        max_threads = None
+    if not max_threads or int(max_threads) < 1:
+        return os.cpu_count() or 1
+    return int(max_threads)
+
+def list_bundle_dirs(unzipped_dir):
+    bundle_dirs = []
+    for bundle_name in sorted(os.listdir(unzipped_dir)):
+        bundle_dir = os.path.join(unzipped_dir, bundle_name)
+        if os.path.isdir(bundle_dir):
+            bundle_dirs.append(bundle_dir)
+    return bundle_dirs
+
+def run_detect_step(bundle_dir):
+    return detect_apigee_type(bundle_dir)
+
+def run_xml2json_step(bundle_dir, cache_key=None, json_dir=None):
+    fs = as_bundle_fs(bundle_dir)
+    json_dir = json_dir or get_json_dir(fs)
+    cache_key = cache_key or build_cache.bundle_cache_key(fs.source)
+    # Keyed by the destination file, so the same bundle converted into another json_dir is written there too
+    json_path = os.path.join(json_dir, 'apigee_bundle.json')
+    cached = build_cache.lookup('xml2json', json_path, cache_key)
+    if cached:
+        return cached['value']
+    bundle_json = build_json_from_model(as_bundle_model(fs))
+    write_json(json_dir, bundle_json)
+    build_cache.record('xml2json', json_path, cache_key, [json_path], len(bundle_json))
+    return len(bundle_json)
+
+def run_structure_step(bundle_dir, cache_key=None):
+    fs = as_bundle_fs(bundle_dir)
+    cache_key = cache_key or build_cache.bundle_cache_key(fs.source)
+    cached = build_cache.lookup('structure', fs.source, cache_key)
+    if cached:
+        return cached['value']
+    model = as_bundle_model(fs)
+    structure = get_proxy_structure(model)
+    interim_path = write_interim_structure(fs, model.api_name, structure)
+    build_cache.record('structure', fs.source, cache_key, [interim_path], model.api_name)
+    return model.api_name
+
+def namespaced(api_name, name):
+    """
+    Service/route name prefixed with the API name, so endpoint names every bundle shares ('default',
+    'default.list') stay unique once bundles are merged into one workspace.
+    """
+    if not api_name or name == api_name or name.startswith(f"{api_name}."):
+        return name
+    return f"{api_name}.{name}"
+
+def endpoint_service(root, target_services, default_service):
+    """
+    Kong service the routes of a ProxyEndpoint attach to: the first service of the TargetEndpoint named by its
+    unconditional RouteRule, else by its first RouteRule naming a converted TargetEndpoint, else default_service.
+    A Kong route cannot pick its service per request, so the other conditional RouteRules are reported.
+    Args:
+        root (Element): ProxyEndpoint root element. (MANDATORY)
+        target_services (dict): TargetEndpoint name -> its namespaced Kong service names. (MANDATORY)
+        default_service (str): Service used when no RouteRule names a converted TargetEndpoint. (MANDATORY)
+    Returns:
+        tuple: (service name, [messages for the RouteRules that were not followed])
+    """
+    rules = [rule for rule in route_rules(root) if target_services.get(rule['target'])]
+    chosen = next((rule for rule in rules if not rule['condition']), rules[0] if rules else None)
+    if chosen is None:
+        return default_service, []
+    service = target_services[chosen['target']][0]
+    messages = [f"RouteRule '{rule['name']}' of {root.get('name')} to {rule['target']} ({rule['condition']}) "
+                f"not converted, its routes use {service}" for rule in rules if rule is not chosen and rule['condition']]
+    return service, messages
+
+def flow_scopes(endpoint, flow, target, endpoint_services, endpoint_routes, target_services):
+    """
+    Kong scopes [('service'|'route', name)] that run the steps of one Apigee flow, or the reason why none does:
+    conditional Flows run on the routes built from their condition, unconditional Flows on the endpoint's base
+    path routes, Pre/PostFlows on the endpoint's service (on its routes when other ProxyEndpoints share the
+    service) and TargetEndpoint flows (target true) on the target's services.
+    """
+    conditional = flow['kind'] == 'flow' and (flow['condition'] or '').strip()
+    if target:
+        if conditional:
+            return f"conditional flow '{flow['name']}' of TargetEndpoint {endpoint} has no Kong route"
+        return [('service', name) for name in target_services.get(endpoint, [])] or \
+            f"TargetEndpoint {endpoint} has no Kong service"
+    routes = endpoint_routes.get(endpoint, [])
+    if conditional:
+        routes = [route for route in routes if f"{FLOW_TAG}{flow['name']}" in route.get('tags', [])]
+        if not routes:
+            return f"flow '{flow['name']}' of {endpoint} has no route of its own"
+        if any(RESIDUAL_TAG in route['tags'] for route in routes):
+            return f"the route of flow '{flow['name']}' of {endpoint} matches more requests than its condition"
+        return [('route', route['name']) for route in routes]
+    if flow['kind'] == 'flow':
+        return [('route', route['name']) for route in routes
+                if not any(str(tag).startswith(FLOW_TAG) for tag in route.get('tags', []))]
+    service = endpoint_services[endpoint]
+    if list(endpoint_services.values()).count(service) > 1:
+        return [('route', route['name']) for route in routes]
+    return [('service', service)]
+
+def scope_plugins(model, plugins, policy_scopes, refused, endpoint_services):
+    """
+    Move converted plugins from the default service to the scopes that run their Apigee steps.
+    Args:
+        model (BundleModel): Parsed bundle. (MANDATORY)
+        plugins (list[dict]): Plugins from convert_bundle_policies(), tagged apigee-policy:<name>. (MANDATORY)
+        policy_scopes (dict): Policy name -> flow_scopes() of the flows stepping it. (MANDATORY)
+        refused (dict): Policy name -> reasons its steps in other flows have no Kong scope. (MANDATORY)
+        endpoint_services (dict): ProxyEndpoint name -> its service; consolidated JavaScript plugins, which guard
+            their flows themselves, go to the services of the endpoints stepping their policies. (MANDATORY)
+    Returns:
+        tuple: (scoped plugins, [{'policy', 'reason'}] for the steps left out)
+    """
+    scoped, unattached = [], {}
+    for plugin in plugins:
+        policies = [str(tag)[len(POLICY_TAG):] for tag in plugin.get('tags') or [] if str(tag).startswith(POLICY_TAG)]
+        if len(policies) == 1 and model.policy(policies[0]).tag not in JS_TAGS:
+            policy = policies[0]
+            scopes = policy_scopes.get(policy, [])
+            for reason in refused.get(policy, []):
+                unattached.setdefault((policy, reason), {'policy': policy, 'reason': reason})
+            if not scopes and not refused.get(policy):
+                # Not stepped in any flow (e.g. only used by fault rules): left on the default service
+                scoped.append(plugin)
+                continue
+        else:
+            scopes = [('service', endpoint_services[step['endpoint']]) for policy in policies
+                      for step in model.steps.get(policy, []) if step['endpoint'] in endpoint_services]
+        for field, name in dict.fromkeys(scopes):
+            entity = copy.deepcopy(plugin)
+            entity.pop('service', None)
+            entity[field] = name
+            scoped.append(entity)
+    return scoped, list(unattached.values())
+
+def run_deck_step(bundle_dir, bundle_output_dir, api_name):
+    """
+    Assemble the bundle's services, routes and plugins into a single decK file, <bundle_output_dir>/kong.yaml.
+    Service and route names are prefixed with api_name (see namespaced()). The routes of each ProxyEndpoint attach
+    to the service its RouteRule picks (endpoint_service()); plugins run where Apigee runs their steps
+    (flow_scopes()), and steps of flows without a matching Kong route are left out and reported.
+    Entities are streamed to disk as they are produced. Plugin conversion results come from the build cache and
+    go through plugin_optimizer (other.optimize_plugins) and plugin_ordering_resolver (other.plugin_ordering)
+    before they are written.
+    Returns:
+        dict: Entity count per decK section, plus plugins_per_request {'before', 'after'} (max over routes)
+        when the optimizer ran and unattached [{'policy', 'reason'}] when steps were left out.
+    """
+    model = as_bundle_model(bundle_dir)
+    output_path = os.path.join(bundle_output_dir, 'kong.yaml')
+    router_flavor = get_router_flavor()
+    expressions = router_flavor == 'expressions'
+    optimizer_stats = None
+    service_paths = {}
+    target_services = {}
+    with DeckWriter(output_path) as writer:
+        for endpoint, root in model.target_endpoints.items():
+            for service in parse_target_endpoint(root):
+                service = dict(service, name=namespaced(api_name, service['name']))
+                target_services.setdefault(endpoint, []).append(service['name'])
+                service_paths[service['name']] = service.get('path')
+                writer.add_service(service_entity(service))
+        default_service = next(iter(service_paths), api_name)
+        routes = []
+        endpoint_services, endpoint_routes = {}, {}
+        for endpoint, root in model.proxy_endpoints.items():
+            service_name, messages = endpoint_service(root, target_services, default_service)
+            for message in messages:
+                print(f"{api_name}: {message}")
+            endpoint_services[endpoint] = service_name
+            for route in parse_proxy_endpoint(root, router_flavor):
+                route = dict(route, name=namespaced(api_name, route['name']))
+                if expressions:
+                    route = expression_route(route)
+                routes.append(route_entity(route, service_name))
+                endpoint_routes.setdefault(endpoint, []).append(routes[-1])
+                writer.add_route(routes[-1])
+        policy_scopes, refused = {}, {}
+        # Proxy and target endpoints may share a name ('default'), so their flows are read per endpoint kind
+        for target, endpoints in ((False, model.proxy_endpoints), (True, model.target_endpoints)):
+            for endpoint, root in endpoints.items():
+                for flow in endpoint_flows(root, endpoint):
+                    scopes = flow_scopes(endpoint, flow, target, endpoint_services, endpoint_routes, target_services)
+                    for step in flow['steps']:
+                        if isinstance(scopes, str):
+                            refused.setdefault(step['policy'], []).append(scopes)
+                        else:
+                            policy_scopes.setdefault(step['policy'], []).extend(scopes)
+        plugins, unattached = scope_plugins(model, convert_bundle_policies(model, default_service)['plugins'],
+                                            policy_scopes, refused, endpoint_services)
+        for item in unattached:
+            print(f"{api_name}: {item['policy']} not attached: {item['reason']}")
+        plugins = [plugin_entity(plugin) for plugin in plugins]
+        if is_optimizer_enabled():
+            # Merge stacked transformers/functions and drop no-ops so each request runs fewer plugins
+            optimized, optimizer_stats = optimize_plugins({'routes': routes, 'plugins': plugins}, model.step_order())
+            plugins = optimized['plugins']
+            for conflict in optimizer_stats['conflicts']:
+                print(f"{api_name}: {conflict['plugin']} in scope {conflict['scope']}: {conflict['reason']}")
+        if is_ordering_enabled():
+            # Dynamic ordering only where Kong's priorities would run plugins out of Apigee step order
+            ordering = resolve_bundle_ordering(model, plugins)
+            for cycle in ordering['cycles']:
+                print(f"{api_name}: step order of {', '.join(cycle['plugins'])} cannot be expressed in Kong")
+        for route in routes:
+            # Flow routes that could not strip the base path forward their captured pathsuffix instead
+            plugin = rewrite_plugin(route, service_paths.get((route.get('service') or {}).get('name')), plugins)
+            if plugin is not None and all(plugin is not p for p in plugins):
+                plugins.append(plugin)
+        for plugin in plugins:
+            writer.add_plugin(plugin)
+    counts = {section: n for section, n in writer.counts.items() if n}
+    if optimizer_stats is not None:
+        counts['plugins_per_request'] = {'before': optimizer_stats['per_request']['before']['max'],
+                                         'after': optimizer_stats['per_request']['after']['max']}
+    if unattached:
+        counts['unattached'] = unattached
+    return counts
+
+def process_bundle(bundle_dir, output_dir):
+    """
+    Run the full conversion chain for one bundle. Never raises: any failure is captured in the result
+    so one broken bundle cannot take down the rest of the run.
+    Args:
+        bundle_dir (str): Unzipped Apigee API bundle directory, or the bundle zip to stream from. (MANDATORY)
+        output_dir (str): Root directory for generated Kong YAML. (MANDATORY)
+    Returns:
+        dict: Per-bundle result (bundle, status, stage, duration, details, error).
+    """
+    bundle_name = bundle_display_name(bundle_dir)
+    result = {'bundle': bundle_name, 'status': 'ok', 'stage': None, 'duration': 0.0, 'details': {}, 'error': None}
+    start = time.monotonic()
+    try:
+        bundle_output_dir = os.path.join(output_dir, bundle_name)
+        os.makedirs(bundle_output_dir, exist_ok=True)
+        result['stage'] = 'open'
+        with as_bundle_fs(bundle_dir) as fs:
+            # Zips are read in place, so their apigee_bundle.json goes to the bundle's output folder
+            json_dir = fs.source if os.path.isdir(fs.source) else bundle_output_dir
+            result['stage'] = 'detect'
+            result['details']['apigee_type'] = run_detect_step(fs)
+            cache_key = build_cache.bundle_cache_key(fs.source)
+            result['stage'] = 'xml2json'
+            result['details']['xml_entities'] = run_xml2json_step(fs, cache_key, json_dir)
+            result['stage'] = 'structure'
+            api_name = run_structure_step(fs, cache_key)
+            result['details']['api_name'] = api_name
+            result['stage'] = 'deck'
+            result['details']['deck'] = run_deck_step(fs, bundle_output_dir, api_name)
+            if fs.model is not None and fs.model.errors:
+                result['details']['parse_errors'] = fs.model.errors
+        result['stage'] = 'done'
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['details']['traceback'] = traceback.format_exc()
+    result['duration'] = time.monotonic() - start
+    return result
+
+def run_bundles_parallel(bundle_dirs, output_dir, max_workers=None):
+    """
+    Fan process_bundle out over a bounded process pool.
+    Args:
+        bundle_dirs (list[str]): Bundle directories to convert. (MANDATORY)
+        output_dir (str): Root directory for generated Kong YAML. (MANDATORY)
+        max_workers (int): Worker bound; defaults to other.max_threads. (OPTIONAL)
+    Returns:
+        list[dict]: One result per bundle, in input order.
+    """
+    max_workers = max_workers or get_max_workers()
+    # Compile templates in the parent so forked workers inherit them instead of each compiling its own
+    template_registry.precompile_all(get_template_dir())
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(max_workers, max(len(bundle_dirs), 1))) as pool:
+        futures = {pool.submit(process_bundle, bundle_dir, output_dir): bundle_dir for bundle_dir in bundle_dirs}
+        for future in as_completed(futures):
+            bundle_dir = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed or out of memory); record it against the bundle
+                result = {'bundle': bundle_display_name(bundle_dir), 'status': 'failed',
+                          'stage': 'worker', 'duration': 0.0, 'details': {}, 'error': f"{type(e).__name__}: {e}"}
+            print(f"[{result['status']}] {result['bundle']} ({result['duration']:.2f}s)")
+            results[bundle_dir] = result
+    return [results[bundle_dir] for bundle_dir in bundle_dirs]
+
+def summarize_results(results):
+    failed = [r for r in results if r['status'] != 'ok']
+    return {
+        'total': len(results),
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'failures': [{'bundle': r['bundle'], 'stage': r['stage'], 'error': r['error']} for r in failed],
+        'duration': sum(r['duration'] for r in results),
+    }
+
+def print_summary(summary):
+    print("\n___ Migration Summary ___")
+    print(f"Bundles: {summary['total']}  Succeeded: {summary['succeeded']}  Failed: {summary['failed']}")
+    print(f"Cumulative bundle time: {summary['duration']:.2f}s")
+    for failure in summary['failures']:
+        print(f"  {failure['bundle']} failed at {failure['stage']}: {failure['error']}")
+
+def main():
+    # --from-zip: read bundles straight from the zips in inputs/ (or the given directory) without extracting
+    # --workspace <file>: also merge every bundle's kong.yaml into one workspace decK file
+    from_zip = '--from-zip' in sys.argv[1:]
+    args = [a for a in sys.argv[1:] if a != '--from-zip']
+    workspace_path = None
+    if '--workspace' in args:
+        i = args.index('--workspace')
+        workspace_path = args[i + 1]
+        del args[i:i + 2]
+    bundles_dir = args[0] if len(args) > 0 else (get_input_dir() if from_zip else get_unzipped_dir())
+    output_dir = args[1] if len(args) > 1 else get_output_dir()
+    max_workers = int(args[2]) if len(args) > 2 else None
+    bundles = list_bundle_sources(bundles_dir, bundles_dir, from_zip)
+    results = run_bundles_parallel(bundles, output_dir, max_workers)
+    workspace_blocked = False
+    if workspace_path:
+        deck_files = [os.path.join(output_dir, r['bundle'], 'kong.yaml') for r in results if r['status'] == 'ok']
+        # Resolve route priorities and collisions across all bundles before they share one workspace
+        route_index = index_deck_files(deck_files)
+        findings = route_index.conflicts()
+        report_path = f"{os.path.splitext(workspace_path)[0]}_routes_report.json"
+        write_report(findings, report_path)
+        workspace_blocked = is_blocking(findings)
+        if workspace_blocked:
+            print(f"Workspace {workspace_path} not written: duplicate route paths or names, see {report_path}")
+        else:
+            merge_deck_files(deck_files, workspace_path, route_priorities=route_index.assign_priorities())
+    summary = summarize_results(results)
+    summary['workspace_blocked'] = workspace_blocked
+    print_summary(summary)
+    return summary
+
+if __name__ == "__main__":
+    summary = main()
+    sys.exit(1 if summary['failed'] or summary['workspace_blocked'] else 0)
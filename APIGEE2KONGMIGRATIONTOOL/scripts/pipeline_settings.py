@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Settings and conversion-report helpers shared by the pipeline scripts.
+- other_config(): the "other" section of configs/config.json, read once per process.
+- get_setting() / get_flag(): one "other" value; an OTHER__<NAME> environment variable overrides it.
+- user_cache_dir(): default location of the build and template caches, outside the source tree
+  ($XDG_CACHE_HOME or ~/.cache, else the system temp dir).
+- note(): record a policy setting a converter could not express exactly in Kong.
+"""
+import os
+import json
+import tempfile
+from functools import lru_cache
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+CACHE_NAME = 'apigee2kong'
+
+def get_scripts_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+@lru_cache(maxsize=None)
+def other_config():
+    config_path = os.path.join(get_scripts_dir(), '../configs/config.json')
+    try:
+        with open(config_path) as f:
+            return json.load(f).get('other', {})
+    except (OSError, ValueError):
+        return {}
+
+def get_setting(name, default=None):
+    """
+    other.<name> from configs/config.json; a non-empty OTHER__<NAME> environment variable wins (as a string).
+    """
+    value = os.environ.get(f"OTHER__{name.upper()}")
+    if value:
+        return value
+    value = other_config().get(name)
+    return default if value is None else value
+
+def get_flag(name, default=True):
+    value = get_setting(name, default)
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_VALUES
+    return bool(value)
+
+def user_cache_dir(*parts):
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    if not os.path.isabs(base):
+        base = tempfile.gettempdir()
+    return os.path.join(base, CACHE_NAME, *parts)
+
+def note(report, setting, value, reason):
+    """
+    Append {'setting', 'value', 'reason'} to a converter's report list; a None report records nothing.
+    """
+    if report is not None:
+        report.append({'setting': setting, 'value': value, 'reason': reason})
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Plugin-count optimizer over an assembled Kong (decK) config: fewer plugin instances and fewer plugins per request.
+- merge: instances of one plugin in the same scope (service/route/consumer) are folded into one when their configs
+  compose - stacked request-/response-transformers in step order, pre-/post-function chunk lists. Kong accepts one
+  instance per plugin and scope, so a scope whose instances do not all compose is left unchanged and reported.
+  Instances are merged in Apigee step order when one is given (BundleModel.step_order()), else in list order.
+- drop: disabled plugins, transformers with nothing to do, function plugins without code, exact duplicates, and
+  route plugins identical to the service plugin they would override.
+- hoist: a plugin configured identically on every route of a service moves to the service.
+- Counts: plugin entities, and plugins run per request (distinct plugin names applying to a route), before/after.
+- Config: other.optimize_plugins (on/off) in configs/config.json; OTHER__OPTIMIZE_PLUGINS overrides.
+- Usage: python plugin_optimizer.py <kong.yaml> [<output.yaml>]
+"""
+import sys
+import json
+from collections import OrderedDict, defaultdict
+from deck_writer import load_deck_file
+from yaml_emitter import emit
+from pipeline_settings import get_flag
+
+TRANSFORMERS = ('request-transformer', 'request-transformer-advanced', 'response-transformer', 'response-transformer-advanced')
+FUNCTIONS = ('pre-function', 'post-function')
+FUNCTION_PHASES = ('certificate', 'rewrite', 'access', 'header_filter', 'body_filter', 'log', 'ws_handshake',
+                   'ws_client_frame', 'ws_upstream_frame', 'ws_close')
+TRANSFORM_ACTIONS = ('remove', 'rename', 'replace', 'add', 'append')
+POLICY_TAG = 'apigee-policy:'
+
+def is_optimizer_enabled():
+    return get_flag('optimize_plugins')
+
+def _ref(value):
+    return value.get('name') if isinstance(value, dict) else value
+
+def plugin_scope(plugin):
+    return tuple(_ref(plugin.get(field)) for field in ('service', 'route', 'consumer'))
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+def _same_settings(a, b):
+    return all(_canonical(a.get(k)) == _canonical(b.get(k)) for k in ('config', 'enabled', 'protocols', 'ordering'))
+
+def is_noop(plugin):
+    """
+    True for plugins that never change a request: disabled, or a transformer/function plugin with nothing to run.
+    """
+    if plugin.get('enabled') is False:
+        return True
+    config = plugin.get('config') or {}
+    if plugin['name'] in TRANSFORMERS:
+        return not any(v for action in TRANSFORM_ACTIONS for v in (config.get(action) or {}).values())
+    if plugin['name'] in FUNCTIONS:
+        return not any(config.get(phase) for phase in FUNCTION_PHASES)
+    return False
+
+def _entry_key(entry, section):
+    name = entry.split(':', 1)[0]
+    return name.lower() if section == 'headers' else name
+
+def _by_key(entries, section):
+    return OrderedDict((_entry_key(e, section), e) for e in entries)
+
+def _section(config, action, section):
+    return list((config.get(action) or {}).get(section) or [])
+
+def _operations(config, section):
+    """
+    Entry name -> set of transformer actions the config applies to it in one section.
+    """
+    operations = defaultdict(set)
+    for action in TRANSFORM_ACTIONS:
+        for entry in _section(config, action, section):
+            operations[_entry_key(entry, section)].add(action)
+    return operations
+
+def compose_transforms(first, second):
+    """
+    One transformer config doing what `first` then `second` do, or None when they do not compose.
+    Kong applies remove, rename, replace, add, append in that order within one instance, whatever order the
+    policies ran in, so a name the two configs touch with different operations (e.g. an append and then a
+    replace) does not compose. Otherwise:
+    - removes accumulate;
+    - a later replace overrides an earlier replace, and the value an earlier add would set;
+    - a later add is a no-op for a name the earlier one added; appends accumulate.
+    """
+    if any((c.get('rename') or {}).get(section) for c in (first, second) for section in (c.get('rename') or {})):
+        return None
+    other_keys = set(first) | set(second)
+    if any(_canonical(first.get(k)) != _canonical(second.get(k)) for k in other_keys - set(TRANSFORM_ACTIONS)):
+        return None
+    merged = {k: v for k, v in first.items() if k not in TRANSFORM_ACTIONS}
+    sections = list(OrderedDict.fromkeys(s for c in (first, second) for action in TRANSFORM_ACTIONS for s in (c.get(action) or {})))
+    for action in TRANSFORM_ACTIONS:
+        if any(action in c for c in (first, second)):
+            merged[action] = {}
+    for section in sections:
+        earlier, later = _operations(first, section), _operations(second, section)
+        if any(ops != later[key] for key, ops in earlier.items() if key in later):
+            return None
+        later_replace = _by_key(_section(second, 'replace', section), section)
+        replace = _by_key(_section(first, 'replace', section), section)
+        replace.update(later_replace)
+        add = _by_key(_section(first, 'add', section), section)
+        for key in add:
+            if key in later_replace:
+                add[key] = later_replace[key]
+        for key, entry in _by_key(_section(second, 'add', section), section).items():
+            add.setdefault(key, entry)
+        values = {
+            'remove': list(OrderedDict.fromkeys(_section(first, 'remove', section) + _section(second, 'remove', section))),
+            'rename': [],
+            'replace': list(replace.values()),
+            'add': list(add.values()),
+            'append': _section(first, 'append', section) + _section(second, 'append', section),
+        }
+        for action in TRANSFORM_ACTIONS:
+            if action in merged:
+                merged[action][section] = values[action]
+    return merged
+
+def compose_functions(first, second):
+    """
+    One pre-/post-function config running the chunks of `first` then `second` per phase, or None.
+    """
+    if any(_canonical(first.get(k)) != _canonical(second.get(k)) for k in (set(first) | set(second)) - set(FUNCTION_PHASES)):
+        return None
+    merged = dict(first)
+    for phase in FUNCTION_PHASES:
+        if first.get(phase) or second.get(phase):
+            merged[phase] = list(first.get(phase) or []) + list(second.get(phase) or [])
+    return merged
+
+def merge_pair(first, second):
+    """
+    Merge two instances of one plugin in one scope, in execution order. Returns the merged plugin, or None.
+    """
+    if _same_settings(first, second):
+        merged_config = first.get('config')
+    elif any(_canonical(first.get(k)) != _canonical(second.get(k)) for k in ('enabled', 'protocols', 'ordering')):
+        return None
+    elif first['name'] in TRANSFORMERS:
+        merged_config = compose_transforms(first.get('config') or {}, second.get('config') or {})
+    elif first['name'] in FUNCTIONS:
+        merged_config = compose_functions(first.get('config') or {}, second.get('config') or {})
+    else:
+        return None
+    if merged_config is None:
+        return None
+    merged = dict(first, config=merged_config)
+    merged['tags'] = list(OrderedDict.fromkeys((first.get('tags') or []) + (second.get('tags') or [])))
+    return merged
+
+def plugins_per_request(config):
+    """
+    Number of plugins Kong runs for a request on each route: distinct names among global, service and route
+    plugins (consumer-scoped plugins only apply to some requests and are not counted).
+    Returns:
+        dict: route name -> plugin count
+    """
+    names = defaultdict(set)
+    for plugin in config.get('plugins') or []:
+        if plugin.get('enabled') is False or plugin.get('consumer'):
+            continue
+        service, route, _ = plugin_scope(plugin)
+        names[('route', route) if route else ('service', service) if service else ('global', None)].add(plugin['name'])
+    counts = {}
+    for route in config.get('routes') or []:
+        applied = names[('global', None)] | names[('service', _ref(route.get('service')))] | names[('route', route['name'])]
+        counts[route['name']] = len(applied)
+    return counts
+
+def step_position(plugin, step_order):
+    """
+    Position of the plugin's earliest source policy (apigee-policy:<name> tags) in step_order, or None.
+    """
+    positions = [step_order[str(tag)[len(POLICY_TAG):]] for tag in plugin.get('tags') or []
+                 if str(tag).startswith(POLICY_TAG) and str(tag)[len(POLICY_TAG):] in step_order]
+    return min(positions, default=None)
+
+def _merge_scopes(plugins, stats, step_order=None):
+    groups = OrderedDict()
+    for plugin in plugins:
+        groups.setdefault((plugin['name'], plugin_scope(plugin)), []).append(plugin)
+    merged = []
+    for key, instances in groups.items():
+        if step_order:
+            # Converted plugins come in policy file order; merging composes them in the order Apigee runs them
+            positions = [step_position(p, step_order) for p in instances]
+            instances = [p for _, p in sorted(zip(positions, instances), key=lambda item: (item[0] is None, item[0] or 0))]
+        current, merges, duplicates, conflict = instances[0], 0, 0, None
+        for plugin in instances[1:]:
+            if _same_settings(current, plugin):
+                duplicates += 1
+                continue
+            combined = merge_pair(current, plugin)
+            if combined is None:
+                conflict = plugin
+                break
+            merges += 1
+            current = combined
+        if conflict is not None:
+            # Kong takes one instance per plugin and scope, so keeping the leftover next to a partial merge would
+            # still be invalid: the scope is left as it came and reported instead
+            stats['conflicts'].append({'plugin': conflict['name'], 'scope': list(key[1]),
+                                       'reason': 'instances in one scope do not compose; scope left unchanged'})
+            merged.extend(groups[key])
+            continue
+        stats['merged'] += merges
+        stats['dropped'] += duplicates
+        merged.append(current)
+    return merged
+
+def _hoist(plugins, routes, stats):
+    service_routes = defaultdict(list)
+    for route in routes:
+        if _ref(route.get('service')):
+            service_routes[_ref(route.get('service'))].append(route['name'])
+    route_service = {name: service for service, names in service_routes.items() for name in names}
+    service_plugins = {(p['name'], plugin_scope(p)[0]): p for p in plugins if plugin_scope(p)[1:] == (None, None) and plugin_scope(p)[0]}
+    # Route plugins that repeat the service plugin they override do nothing extra
+    kept = []
+    for plugin in plugins:
+        _, route, consumer = plugin_scope(plugin)
+        parent = service_plugins.get((plugin['name'], route_service.get(route))) if route and not consumer else None
+        if parent is not None and _same_settings(parent, plugin):
+            stats['dropped'] += 1
+            continue
+        kept.append(plugin)
+    candidates = defaultdict(list)
+    for i, plugin in enumerate(kept):
+        _, route, consumer = plugin_scope(plugin)
+        if route and not consumer and route in route_service:
+            service = route_service[route]
+            candidates[(service, plugin['name'], _canonical([plugin.get(k) for k in ('config', 'enabled', 'protocols', 'ordering')]))].append(i)
+    replaced, removed = {}, set()
+    for (service, name, _), positions in candidates.items():
+        routes_with = {plugin_scope(kept[i])[1] for i in positions}
+        if len(service_routes[service]) < 2 or routes_with != set(service_routes[service]) or (name, service) in service_plugins:
+            continue
+        hoisted = {k: v for k, v in kept[positions[0]].items() if k != 'route'}
+        hoisted['service'] = service
+        tags = list(OrderedDict.fromkeys(t for i in positions for t in kept[i].get('tags') or []))
+        if tags:
+            hoisted['tags'] = tags
+        replaced[positions[0]] = hoisted
+        removed.update(positions[1:])
+        stats['hoisted'] += 1
+    return [replaced.get(i, plugin) for i, plugin in enumerate(kept) if i not in removed]
+
+def optimize_plugins(config, step_order=None):
+    """
+    Minimise the plugins of a decK config.
+    Args:
+        config (dict): decK config (or any dict) with 'plugins' and optionally 'routes'. (MANDATORY)
+        step_order (dict): Apigee policy name -> execution position, e.g. BundleModel.step_order(). (OPTIONAL)
+    Returns:
+        tuple: (optimized config dict, stats dict with plugins/per-request counts before and after, merged,
+                dropped, hoisted and conflicts)
+    """
+    plugins = list(config.get('plugins') or [])
+    routes = list(config.get('routes') or [])
+    stats = {'merged': 0, 'dropped': 0, 'hoisted': 0, 'conflicts': []}
+    before = plugins_per_request(config)
+    kept = [p for p in plugins if not is_noop(p)]
+    stats['dropped'] += len(plugins) - len(kept)
+    kept = _merge_scopes(kept, stats, step_order)
+    # Merging can cancel a transformer out entirely
+    merged_noops = [p for p in kept if is_noop(p)]
+    stats['dropped'] += len(merged_noops)
+    kept = _hoist([p for p in kept if not is_noop(p)], routes, stats)
+    optimized = dict(config, plugins=kept)
+    after = plugins_per_request(optimized)
+    stats['plugins'] = {'before': len(plugins), 'after': len(kept)}
+    stats['per_request'] = {
+        'before': {'max': max(before.values(), default=0), 'total': sum(before.values())},
+        'after': {'max': max(after.values(), default=0), 'total': sum(after.values())},
+    }
+    return optimized, stats
+
+def format_stats(stats):
+    before, after = stats['per_request']['before'], stats['per_request']['after']
+    return (f"plugins {stats['plugins']['before']} -> {stats['plugins']['after']} "
+            f"({stats['merged']} merged, {stats['dropped']} dropped, {stats['hoisted']} hoisted); "
+            f"per request max {before['max']} -> {after['max']}, summed over routes {before['total']} -> {after['total']}")
+
+def main():
+    if not 2 <= len(sys.argv) <= 3:
+        print("Usage: python plugin_optimizer.py <kong.yaml> [<output.yaml>]")
+        sys.exit(1)
+    input_path = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else input_path
+    optimized, stats = optimize_plugins(load_deck_file(input_path))
+    emit(optimized, output_path, 'json' if output_path.endswith('.json') else 'yaml')
+    print(f"{output_path}: {format_stats(stats)}")
+    for conflict in stats['conflicts']:
+        print(f"Conflict: {conflict['plugin']} in scope {conflict['scope']}: {conflict['reason']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Resolve Kong dynamic plugin ordering from Apigee step order.
+- Kong runs plugins by static priority (KONG_PRIORITIES); Apigee runs request steps in PreFlow, matching Flow,
+  PostFlow order (proxy endpoint, then target endpoint). Every pair of request steps that can run back to back
+  becomes an edge "plugin a before plugin b"; conditional steps and unmatched flows let earlier steps fall through.
+- Edges inside a strongly connected component are cycles (e.g. A, B, A in one flow): they cannot be expressed and
+  are reported. The rest is ordered topologically, ties broken by Kong priority.
+- ordering.before.access is emitted only on plugins whose edge the priority order gets wrong, so plugins that
+  already run in the right order keep Kong's fast static iterator. Kong only supports dynamic ordering in access.
+- Config: other.plugin_ordering (on/off) in configs/config.json; OTHER__PLUGIN_ORDERING overrides.
+- Usage: python plugin_ordering_resolver.py <unzipped_api_bundle_dir|bundle.zip> <kong.yaml> [<output.yaml>]
+"""
+import sys
+import heapq
+from collections import defaultdict
+from bundle_model import as_bundle_model, endpoint_flows
+from deck_writer import load_deck_file
+from yaml_emitter import emit
+from pipeline_settings import get_flag
+
+# Static priorities of bundled Kong (OSS and Enterprise) plugins; higher runs first
+KONG_PRIORITIES = {
+    'pre-function': 1000000, 'correlation-id': 100001, 'zipkin': 100000, 'exit-transformer': 9999,
+    'bot-detection': 2500, 'cors': 2000, 'session': 1900, 'acme': 1705, 'jwt': 1450, 'oauth2': 1400,
+    'key-auth': 1250, 'key-auth-enc': 1250, 'ldap-auth': 1200, 'ldap-auth-advanced': 1200, 'basic-auth': 1100,
+    'openid-connect': 1050, 'hmac-auth': 1030, 'jwt-signer': 1020, 'request-validator': 999, 'grpc-gateway': 998,
+    'ip-restriction': 990, 'request-size-limiting': 951, 'acl': 950, 'opa': 920, 'rate-limiting': 910,
+    'rate-limiting-advanced': 910, 'response-ratelimiting': 900, 'route-by-header': 850,
+    'request-transformer-advanced': 802, 'request-transformer': 801, 'response-transformer': 800,
+    'response-transformer-advanced': 800, 'route-transformer-advanced': 780, 'aws-lambda': 750,
+    'azure-functions': 749, 'proxy-cache': 100, 'proxy-cache-advanced': 100, 'opentelemetry': 14,
+    'prometheus': 13, 'http-log': 12, 'statsd': 11, 'datadog': 10, 'file-log': 9, 'udp-log': 8, 'tcp-log': 7,
+    'loggly': 6, 'syslog': 4, 'grpc-web': 3, 'request-termination': 2, 'post-function': -1000,
+}
+POLICY_TAG = 'apigee-policy:'
+
+def is_ordering_enabled():
+    return get_flag('plugin_ordering')
+
+def plugin_priority(name):
+    # Custom plugins (e.g. luascriptexecuter) default to 0, after every bundled request plugin
+    return KONG_PRIORITIES.get(name, 0)
+
+def policy_plugins(plugins):
+    """
+    Apigee policy name -> Kong plugin name, from the apigee-policy:<name> tags of converted plugins.
+    """
+    mapping = {}
+    for plugin in plugins:
+        for tag in plugin.get('tags') or []:
+            if str(tag).startswith(POLICY_TAG):
+                mapping.setdefault(str(tag)[len(POLICY_TAG):], plugin['name'])
+    return mapping
+
+def _walk(steps, tails, mapping, edges):
+    for step in steps:
+        plugin = mapping.get(step['policy'])
+        if step['phase'] != 'request' or plugin is None:
+            continue
+        for tail_plugin, tail_policy in tails:
+            if tail_plugin != plugin:
+                edges[(tail_plugin, plugin)].append((tail_policy, step['policy']))
+        # A conditional step may be skipped, so what ran before it can also directly precede the next step
+        current = {(plugin, step['policy'])}
+        tails = (set(tails) | current) if (step.get('condition') or '').strip() else current
+    return tails
+
+def _walk_endpoint(flows, tails, mapping, edges):
+    for kind in ('preflow', 'flow', 'postflow'):
+        stage = [flow for flow in flows if flow['kind'] == kind]
+        if not stage:
+            continue
+        if kind == 'flow':
+            # At most one conditional flow runs; none may match at all
+            outcomes = set(tails)
+            for flow in stage:
+                outcomes |= _walk(flow['steps'], tails, mapping, edges)
+            tails = outcomes
+        else:
+            for flow in stage:
+                tails = _walk(flow['steps'], tails, mapping, edges)
+    return tails
+
+def step_dependencies(model, mapping):
+    """
+    "Runs before" edges between Kong plugins from the request step order of every proxy endpoint, followed by the
+    request flows of each target endpoint.
+    Returns:
+        dict: (plugin a, plugin b) -> [(policy a, policy b)] provenance of every edge
+    """
+    edges = defaultdict(list)
+    # Flows are read from the endpoint roots: a proxy and a target endpoint often share a file name (default.xml)
+    target_flows = [endpoint_flows(root, target) for target, root in model.target_endpoints.items()]
+    for endpoint, root in model.proxy_endpoints.items():
+        tails = _walk_endpoint(endpoint_flows(root, endpoint), set(), mapping, edges)
+        for flows in target_flows:
+            _walk_endpoint(flows, tails, mapping, edges)
+    return dict(edges)
+
+def strongly_connected(nodes, edges):
+    """
+    Tarjan's SCCs of the graph; returns the components with more than one node (the cycles).
+    """
+    successors = defaultdict(list)
+    for a, b in edges:
+        successors[a].append(b)
+    index, low, stack, on_stack, cycles = {}, {}, [], set(), []
+    def visit(node):
+        index[node] = low[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for succ in successors[node]:
+            if succ not in index:
+                visit(succ)
+                low[node] = min(low[node], low[succ])
+            elif succ in on_stack:
+                low[node] = min(low[node], index[succ])
+        if low[node] == index[node]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            if len(component) > 1:
+                cycles.append(sorted(component))
+    for node in sorted(nodes):
+        if node not in index:
+            visit(node)
+    return cycles
+
+def resolve_ordering(edges, plugin_names=()):
+    """
+    Topological plugin order for the step edges, and the minimal Kong ordering that enforces it.
+    Args:
+        edges (dict|iterable): (a, b) "a runs before b" pairs, e.g. from step_dependencies(). (MANDATORY)
+        plugin_names (iterable): Further plugin names without edges to include in the order. (OPTIONAL)
+    Returns:
+        dict: {'order': [plugin names], 'ordering': {plugin: {'before': {'access': [...]}}},
+               'cycles': [{'plugins': [...], 'edges': [[a, b], ...]}]}
+    """
+    nodes = set(plugin_names) | {n for edge in edges for n in edge}
+    cycles = strongly_connected(nodes, edges)
+    in_cycle = {n: i for i, component in enumerate(cycles) for n in component}
+    dag = sorted(edge for edge in edges if edge[0] not in in_cycle or in_cycle[edge[0]] != in_cycle.get(edge[1]))
+    indegree = {n: 0 for n in nodes}
+    successors = defaultdict(list)
+    for a, b in dag:
+        successors[a].append(b)
+        indegree[b] += 1
+    for component in cycles:
+        # Order the members of a cycle among themselves by priority
+        ranked = sorted(component, key=lambda n: (-plugin_priority(n), n))
+        for a, b in zip(ranked, ranked[1:]):
+            successors[a].append(b)
+            indegree[b] += 1
+    heap = [(-plugin_priority(n), n) for n in nodes if not indegree[n]]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        _, node = heapq.heappop(heap)
+        order.append(node)
+        for succ in successors[node]:
+            indegree[succ] -= 1
+            if not indegree[succ]:
+                heapq.heappush(heap, (-plugin_priority(succ), succ))
+    ordering = {}
+    for a, b in dag:
+        # Kong already runs a first when its priority is strictly higher; ties have no guaranteed order
+        if plugin_priority(a) <= plugin_priority(b):
+            ordering.setdefault(a, {'before': {'access': []}})['before']['access'].append(b)
+    return {
+        'order': order,
+        'ordering': ordering,
+        'cycles': [{'plugins': component, 'edges': [list(e) for e in sorted(edges) if in_cycle.get(e[0]) == i == in_cycle.get(e[1])]}
+                   for i, component in enumerate(cycles)],
+    }
+
+def apply_ordering(plugins, ordering):
+    """
+    Set ordering.before.access on every instance of the plugins named in `ordering`, keeping existing entries.
+    Returns:
+        int: Number of plugin instances that received an ordering.
+    """
+    changed = 0
+    for plugin in plugins:
+        if plugin['name'] not in ordering:
+            continue
+        existing = plugin.setdefault('ordering', {}).setdefault('before', {}).setdefault('access', [])
+        existing.extend(n for n in ordering[plugin['name']]['before']['access'] if n not in existing)
+        changed += 1
+    return changed
+
+def resolve_bundle_ordering(bundle, plugins):
+    """
+    Resolve and apply dynamic ordering for one bundle's converted plugins.
+    Args:
+        bundle (str|BundleModel): Bundle directory, bundle zip, bundle filesystem or parsed model. (MANDATORY)
+        plugins (list[dict]): Kong plugins tagged apigee-policy:<name>; updated in place. (MANDATORY)
+    Returns:
+        dict: resolve_ordering() result plus 'edges' provenance and 'applied' instance count.
+    """
+    model = as_bundle_model(bundle)
+    edges = step_dependencies(model, policy_plugins(plugins))
+    result = resolve_ordering(edges, (p['name'] for p in plugins))
+    result['edges'] = {f"{a} -> {b}": policies for (a, b), policies in sorted(edges.items())}
+    result['applied'] = apply_ordering(plugins, result['ordering'])
+    return result
+
+def main():
+    if not 3 <= len(sys.argv) <= 4:
+        print("Usage: python plugin_ordering_resolver.py <unzipped_api_bundle_dir|bundle.zip> <kong.yaml> [<output.yaml>]")
+        sys.exit(1)
+    config = load_deck_file(sys.argv[2])
+    output_path = sys.argv[3] if len(sys.argv) > 3 else sys.argv[2]
+    with as_bundle_model(sys.argv[1]) as model:
+        result = resolve_bundle_ordering(model, config.get('plugins') or [])
+    emit(config, output_path, 'json' if output_path.endswith('.json') else 'yaml')
+    print(f"Plugin order: {' -> '.join(result['order'])}")
+    print(f"Dynamic ordering set on {result['applied']} plugins: {output_path}")
+    for cycle in result['cycles']:
+        print(f"Cycle between {', '.join(cycle['plugins'])}: " + '; '.join(' -> '.join(e) for e in cycle['edges']))
+    sys.exit(1 if result['cycles'] else 0)
+
+if __name__ == "__main__":
+    main()
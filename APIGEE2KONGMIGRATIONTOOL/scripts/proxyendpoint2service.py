@@ -6,21 +6,44 @@ Enterprise-grade script to convert Apigee ProxyEndpoint XML to Kong route YAML u
 """
 import sys
 import os
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+import re
+import json
+from template_registry import get_template
+from yaml_emitter import get_output_format, render_or_emit
+from bundle_model import xml_root, endpoint_flows
+from apigee_condition import (ALL_METHODS, SUFFIX_GROUP, ConditionError, compile_condition, needs_lookaround,
+                              route_paths, split_route_path)
+from pipeline_settings import get_setting
 
-def parse_proxy_endpoint(xml_path):
+# traditional_compatible and expressions run on the ATC router, whose regexes have no lookaround
+ROUTER_FLAVORS = ('traditional_compatible', 'expressions', 'traditional')
+REWRITE_TAG = 'apigee-path-rewrite'
+RESIDUAL_TAG = 'apigee-condition-residual'
+FLOW_TAG = 'apigee-flow:'
+
+def get_router_flavor(router_flavor=None):
+    router_flavor = router_flavor or get_setting('router_flavor') or ROUTER_FLAVORS[0]
+    if router_flavor not in ROUTER_FLAVORS:
+        raise ValueError(f"Unknown router flavor '{router_flavor}', expected one of {', '.join(ROUTER_FLAVORS)}")
+    return router_flavor
+
+def parse_proxy_endpoint(xml_path, router_flavor=None):
     """
     Parse Apigee ProxyEndpoint XML and extract route info for Kong.
+    The endpoint's base path(s) become a catch-all route; every conditional Flow whose <Condition> narrows the
+    request verb, path or headers becomes an extra route, lowered by apigee_condition into anchored regex paths
+    with a regex_priority reflecting how specific the match is.
+    On traditional_compatible the regexes cannot use lookaheads, so strip_path would strip the whole match: flow
+    routes keep the path (strip_path false) and capture the suffix for rewrite_plugin() to forward instead.
     Args:
-        xml_path (str): Path to Apigee ProxyEndpoint XML file. (MANDATORY)
+        xml_path (str|Element): Path to Apigee ProxyEndpoint XML file, or its already parsed root element. (MANDATORY)
+        router_flavor (str): 'traditional_compatible', 'expressions' or 'traditional'; defaults to other.router_flavor (OPTIONAL)
     Returns:
         list[dict]: List of route info dicts (MANDATORY/OPTIONAL fields as per template)
     Raises:
         Exception: If mandatory fields are missing or XML is invalid.
     """
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     # MANDATORY: Extract name
     name = root.attrib.get('name')
     if not name:
@@ -32,56 +55,191 @@ def parse_proxy_endpoint(xml_path):
             base_paths.append(preflow.text.strip())
     if not base_paths:
         raise Exception('ProxyEndpoint must have at least one BasePath (MANDATORY)')
-    # OPTIONAL: Extract allowed HTTP methods from Condition or Flows
-    methods = set()
-    for flow in root.findall('.//Flow'):
-        cond = flow.find('Condition')
-        if cond is not None and cond.text:
-            import re
-            # Example: (request.verb == "GET" or request.verb == "POST")
-            found = re.findall(r'request.verb\s*==\s*"(\w+)"', cond.text)
-            methods.update(found)
-    if not methods:
-        methods = {"GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"} # Default: all
-    # OPTIONAL: Extract path conditions (for conditional flows)
-    paths = set(base_paths)
-    for flow in root.findall('.//Flow'):
-        cond = flow.find('Condition')
-        if cond is not None and cond.text:
-            import re
-            # Example: proxy.pathsuffix MatchesPath "/foo/bar"
-            found = re.findall(r'proxy.pathsuffix\s*MatchesPath\s*"([^"]+)"', cond.text)
-            for p in found:
-                for bp in base_paths:
-                    paths.add(bp.rstrip('/') + p)
-    # MANDATORY: Service name must be provided as argument
-    return [{
+    # expression_route() turns the lookahead form into lookaround-free ATC predicates itself
+    lookaround = get_router_flavor(router_flavor) != 'traditional_compatible'
+    routes = [_route(name, base_paths, list(ALL_METHODS))]
+    # OPTIONAL: One route per alternative of each conditional flow
+    for flow in endpoint_flows(root, name):
+        if flow['kind'] != 'flow' or not (flow['condition'] or '').strip():
+            continue
+        try:
+            specs = compile_condition(flow['condition'].strip())
+        except ConditionError as e:
+            print(f"Flow '{flow['name']}' of {name}: condition not converted to a route ({e})")
+            continue
+        specs = [spec for spec in specs if spec.paths or spec.full_paths or spec.methods or spec.headers]
+        for i, spec in enumerate(specs, 1):
+            route_name = f"{name}.{flow['name']}" + (f".{i}" if len(specs) > 1 else '')
+            tags = ['apigee-migrated', f"{FLOW_TAG}{flow['name']}"]
+            if spec.residual or (not lookaround and needs_lookaround(spec)):
+                # The route matches a superset of the flow; the rest of the condition needs a plugin-level check
+                tags.append(RESIDUAL_TAG)
+            paths = route_paths(spec, base_paths, lookaround)
+            route = _route(route_name, paths, list(spec.methods or ALL_METHODS),
+                           {header: list(values) for header, values in spec.headers}, spec.regex_priority, tags)
+            if not lookaround and paths[0].startswith('~'):
+                route['strip_path'] = False
+                if spec.paths:
+                    tags.append(REWRITE_TAG)
+            routes.append(route)
+    return routes
+
+def route_rules(xml_path):
+    """
+    RouteRules of a ProxyEndpoint in Apigee evaluation order.
+    Args:
+        xml_path (str|Element): Path to Apigee ProxyEndpoint XML file, or its already parsed root element. (MANDATORY)
+    Returns:
+        list[dict]: {'name', 'target' (TargetEndpoint name or None), 'url', 'condition'}
+    """
+    rules = []
+    for rule in xml_root(xml_path).findall('RouteRule'):
+        rules.append({
+            'name': rule.get('name'),
+            'target': (rule.findtext('TargetEndpoint') or '').strip() or None,
+            'url': (rule.findtext('URL') or '').strip() or None,
+            'condition': (rule.findtext('Condition') or '').strip() or None,
+        })
+    return rules
+
+def rewrite_plugin(route, service_path=None, plugins=()):
+    """
+    request-transformer forwarding only the captured pathsuffix, appended to the service path, for a route that
+    parse_proxy_endpoint() left without strip_path. Returns None for other routes.
+    A route request-transformer overrides the service's, so an existing one is extended instead: the route's own
+    (returned, updated in place) or a route-scoped copy of the service's.
+    Args:
+        route (dict): Route dict or decK route entity. (MANDATORY)
+        service_path (str): Path of the route's service, which the rewritten upstream path must keep. (OPTIONAL)
+        plugins (list[dict]): decK plugins already configured. (OPTIONAL)
+    """
+    if REWRITE_TAG not in (route.get('tags') or []):
+        return None
+    uri = f"{(service_path or '').rstrip('/')}$(uri_captures.{SUFFIX_GROUP})"
+    service = route['service'].get('name') if isinstance(route.get('service'), dict) else route.get('service')
+    plugin = next((p for p in plugins if p['name'] == 'request-transformer' and p.get('route') == route['name']), None)
+    if plugin is None:
+        parent = next((p for p in plugins if p['name'] == 'request-transformer' and p.get('service') == service
+                       and not p.get('route') and not p.get('consumer')), None)
+        plugin = json.loads(json.dumps(parent)) if parent else {'name': 'request-transformer', 'config': {},
+                                                                 'enabled': True, 'protocols': ['http', 'https']}
+        plugin.pop('service', None)
+        plugin['route'] = route['name']
+        plugin['tags'] = list(dict.fromkeys((plugin.get('tags') or []) + ['apigee-migrated', REWRITE_TAG]))
+    plugin['config'] = dict(plugin.get('config') or {})
+    plugin['config']['replace'] = dict(plugin['config'].get('replace') or {}, uri=uri)
+    return plugin
+
+def _route(name, paths, methods, headers=None, regex_priority=0, tags=None):
+    return {
         'name': name,
         'service': None,  # To be filled in main()
-        'paths': list(paths),
-        'methods': list(methods),
+        'paths': paths,
+        'methods': methods,
+        'headers': headers or {},
         'strip_path': True,
         'preserve_host': False,
         'protocols': ["http", "https"],
         'hosts': [],
-        'regex_priority': 0,
-        'tags': ['apigee-migrated']
-    }]
+        'regex_priority': regex_priority,
+        'tags': tags or ['apigee-migrated']
+    }
+
+def _atc_regex(pattern):
+    # Raw ATC string, so regex backslashes need no escaping
+    return f'r#"{pattern}"#'
+
+def _atc_string(value):
+    return json.dumps(value)
+
+def _path_predicate(path):
+    split = split_route_path(path)
+    if split is None:
+        return f"http.path ~ {_atc_regex(path.lstrip('~'))}"
+    full, base, suffix = split
+    base = base.rstrip('/')
+    # ^= keeps strip_path stripping only the base path; the regexes (no lookaround in ATC) pin the rest
+    predicates = [f"http.path ^= {_atc_string(base or '/')}"] if base or not full else []
+    predicates += [f"http.path ~ {_atc_regex(f'^(?:{p})$')}" for p in full]
+    predicates += [f"http.path ~ {_atc_regex(f'^{re.escape(base)}(?:{p})$')}" for p in suffix]
+    return ' && '.join(predicates)
+
+def _header_predicate(name, value):
+    field = 'http.headers.' + name.lower().replace('-', '_')
+    if value.startswith('~*'):
+        return f"{field} ~ {_atc_regex('(?i)' + value[2:])}"
+    return f"{field} == {_atc_string(value)}"
+
+def _group(predicates, op):
+    if len(predicates) == 1:
+        return predicates[0]
+    return '(' + f" {op} ".join(predicates) + ')'
+
+def route_expression(route):
+    """
+    ATC expression (Kong expressions router) matching the same requests as a traditional route dict.
+    """
+    clauses = []
+    if route.get('paths'):
+        clauses.append(_group([_path_predicate(p) for p in route['paths']], '||'))
+    methods = route.get('methods') or []
+    if methods and set(methods) != set(ALL_METHODS):
+        clauses.append(_group([f'http.method == "{m}"' for m in methods], '||'))
+    for name, values in sorted((route.get('headers') or {}).items()):
+        clauses.append(_group([_header_predicate(name, v) for v in values], '||'))
+    return ' && '.join(clauses) or 'http.path ^= "/"'
+
+def route_priority(route):
+    """
+    Expressions-router priority: longer literal base paths first, then regex routes by regex_priority above the
+    plain prefix route of the same base, then verb/header restricted routes.
+    """
+    literal, regex = 0, False
+    for path in route.get('paths') or []:
+        split = split_route_path(path)
+        regex = regex or path.startswith('~')
+        literal = max(literal, len(split[1].rstrip('/')) if split else 0)
+    specific = bool(route.get('headers')) or set(route.get('methods') or ALL_METHODS) != set(ALL_METHODS)
+    regex_part = (int(route.get('regex_priority') or 0) + 1) * 2 if regex else 0
+    return (literal << 20) + min(regex_part + specific, (1 << 20) - 1)
+
+def expression_route(route):
+    """
+    Convert a traditional route dict to the expressions-router shape: expression + priority instead of
+    paths/methods/headers/hosts/regex_priority.
+    """
+    converted = {k: v for k, v in route.items() if k not in ('paths', 'methods', 'headers', 'hosts', 'regex_priority')}
+    converted['expression'] = route_expression(route)
+    converted['priority'] = route_priority(route)
+    return converted
 
-def render_kong_routes(routes, service_name, template_dir, output_path):
+def render_kong_routes(routes, service_name, template_dir, output_path, output_format=None, router_flavor=None):
     """
-    Render Kong route YAML(s) using the Jinja template and extracted info.
+    Write Kong route YAML(s), emitted directly from the route dicts (named and defaulted as the template would) or
+    rendered with the Jinja template.
     Args:
         routes (list[dict]): Route info dicts from parse_proxy_endpoint (MANDATORY)
         service_name (str): Associated Kong service name (MANDATORY)
         template_dir (str): Directory containing Jinja template (MANDATORY)
         output_path (str): Output YAML file path (MANDATORY)
+        output_format (str): 'yaml', 'json' or 'template'; defaults to other.output_format (OPTIONAL)
+        router_flavor (str): 'traditional_compatible', 'expressions' or 'traditional'; defaults to other.router_flavor (OPTIONAL)
     """
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template('kong_route.j2')
+    for route in routes:
+        route['service'] = service_name
+    expressions = get_router_flavor(router_flavor) == 'expressions'
+    if expressions:
+        routes = [expression_route(route) for route in routes]
+    template_name = 'kong_route_expressions' if expressions else 'kong_route'
+    if get_output_format(output_format) != 'template':
+        # Same entity the template renders: its name prefix and |default values
+        routes = [dict(route, name=f"route.{route['name']}") for route in routes]
+        render_or_emit(template_name, routes, output_path, template_dir, output_format, root_key='route')
+        print(f"Kong route YAML(s) written to {output_path}")
+        return
+    template = get_template(template_name, template_dir)
     with open(output_path, 'w') as f:
         for route in routes:
-            route['service'] = service_name
             rendered = template.render(**route)
             f.write(rendered + '\n---\n')
     print(f"Kong route YAML(s) written to {output_path}")
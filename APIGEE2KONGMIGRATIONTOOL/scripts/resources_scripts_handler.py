@@ -1,30 +1,34 @@
 #!/usr/bin/env python3
 """
 List all JavaScript, Java, JAR, and Python files in all resources directories of unzipped API bundles, with paths relative to APIGEE2KONGMIGRATIONTOOL.
+With --from-zip the bundle zips under inputs/ are listed in place instead of the unzipped folders.
 """
 import os
+import sys
+from bundle_fs import as_bundle_fs, list_bundle_sources
 
-def gather_resource_scripts(root_dir):
+def gather_resource_scripts(root_dir, resources_dir=''):
     script_exts = ['.js', '.java', '.jar', '.py']
+    fs = as_bundle_fs(root_dir)
     result = []
-    for dirpath, _, filenames in os.walk(root_dir):
+    for dirpath, _, filenames in fs.walk(resources_dir):
         for f in filenames:
             if any(f.lower().endswith(ext) for ext in script_exts):
-                rel_path = os.path.relpath(os.path.join(dirpath, f), root_dir)
-                result.append(rel_path)
+                rel_dir = dirpath[len(resources_dir):].strip('/')
+                result.append(f"{rel_dir}/{f}" if rel_dir else f)
     return result
 
 def main():
     apigee_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    unzipped_dir = os.path.join(apigee_root, 'apigeeapiunzipped')
-    for bundle_name in os.listdir(unzipped_dir):
-        bundle_dir = os.path.join(unzipped_dir, bundle_name)
-        resources_dir = os.path.join(bundle_dir, 'apiproxy', 'resources')
-        if os.path.isdir(resources_dir):
-            scripts = gather_resource_scripts(resources_dir)
-            print(f"Resources scripts in {bundle_name}:")
-            for s in scripts:
-                print(f"  {os.path.join('apigeeapiunzipped', bundle_name, 'apiproxy', 'resources', s)}")
+    from_zip = '--from-zip' in sys.argv[1:]
+    bundles = list_bundle_sources(os.path.join(apigee_root, 'apigeeapiunzipped'), os.path.join(apigee_root, 'inputs'), from_zip)
+    for bundle in bundles:
+        with as_bundle_fs(bundle) as fs:
+            if fs.isdir('apiproxy/resources'):
+                scripts = gather_resource_scripts(fs, 'apiproxy/resources')
+                print(f"Resources scripts in {fs.name}:")
+                for s in scripts:
+                    print(f"  {os.path.relpath(fs.location('apiproxy/resources/' + s), apigee_root)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Global index over the routes of all migrated proxies, to find route collisions before Kong has to resolve them.
+- Every route path goes into one trie keyed by path segment: prefix paths by their segments, regex paths by the
+  literal prefix of the regex (e.g. ~^/orders(?=/items$) sits under /orders).
+- One walk over the trie reports, per node:
+  duplicate  - the same path, headers and an overlapping verb on more than one route;
+  ambiguous  - regex paths of different bundles with the same regex_priority, verb and headers at the same prefix;
+  shadowed   - a route under a catch-all regex (~^/orders(?=(?:/.*)?$)) that Kong evaluates first.
+  Route names used by more than one bundle are reported as duplicate_name. Duplicates of either kind block a
+  workspace merge (is_blocking()); decK would reject the names or let one route silently win.
+  Buckets are keyed by verb, so the cost is linear in the total path length rather than pairwise.
+- assign_priorities() ranks every regex route by literal depth, then literal length, then its own
+  regex_priority, then name, giving a stable, collision-free regex_priority across the workspace.
+- Usage: python route_index.py <kong.yaml> [<kong.yaml> ...] [--report <routes_report.json>]
+"""
+import os
+import re
+import sys
+import json
+from collections import namedtuple, defaultdict
+from apigee_condition import ALL_METHODS
+from deck_writer import load_deck_file
+
+REGEX_META = set('.^$*+?()[]{}|\\')
+FINDING_KINDS = ('duplicate', 'duplicate_name', 'ambiguous', 'shadowed')
+BLOCKING_KINDS = ('duplicate', 'duplicate_name')
+CATCH_ALL_RE = re.compile(r'\(\?=(?:\(\?:/\.\*\)\?|/?\.\*)\$\)|(?:\(\?:/\.\*\)\?|/?\.\*)\$?')
+
+# route: (source, name) key; kind: 'prefix' | 'regex'; literal: literal path prefix used as the trie position
+Entry = namedtuple('Entry', 'route path kind literal methods headers priority catch_all')
+
+class _Node:
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+
+def literal_prefix(path):
+    """
+    Split a Kong route path into (literal_prefix, regex_rest, is_regex).
+    """
+    if not path.startswith('~'):
+        return path, '', False
+    pattern = path[1:]
+    if not pattern.startswith('^'):
+        # Unanchored regexes can match anywhere in the path
+        return '', pattern, True
+    literal, i = [], 1
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal.append(pattern[i + 1])
+            i += 2
+        elif c in REGEX_META:
+            break
+        else:
+            literal.append(c)
+            i += 1
+    return ''.join(literal), pattern[i:], True
+
+def _segments(literal):
+    return [s for s in literal.split('/') if s]
+
+def _headers_key(headers):
+    return tuple(sorted((name.lower(), tuple(values)) for name, values in (headers or {}).items()))
+
+class RouteIndex:
+    """
+    Path trie over decK route entities from any number of bundles.
+    """
+    def __init__(self):
+        self.root = _Node()
+        self.routes = {}
+        self.names = defaultdict(list)
+
+    def add_route(self, route, source=None):
+        self.names[route['name']].append((source, route['name']))
+        if route.get('expression') and not route.get('paths'):
+            # Expressions-router routes are ordered by their own priority, not by regex_priority
+            return
+        key = (source, route['name'])
+        self.routes[key] = route
+        methods = frozenset(m.upper() for m in route.get('methods') or ALL_METHODS)
+        headers = _headers_key(route.get('headers'))
+        priority = int(route.get('regex_priority') or 0)
+        for path in route.get('paths') or ['/']:
+            literal, rest, is_regex = literal_prefix(path)
+            node = self.root
+            for segment in _segments(literal):
+                node = node.children.setdefault(segment, _Node())
+            node.entries.append(Entry(key, path, 'regex' if is_regex else 'prefix', literal, methods, headers,
+                                      priority, is_regex and bool(CATCH_ALL_RE.fullmatch(rest))))
+
+    def add_deck_file(self, path):
+        for route in load_deck_file(path).get('routes') or []:
+            self.add_route(route, path)
+
+    def _walk(self, node=None, covering=None, depth=0):
+        node = node or self.root
+        covering = dict(covering or {})
+        # Kong evaluates regex paths first, highest regex_priority first; header-less catch-alls cover every verb
+        for entry in node.entries:
+            if entry.catch_all and not entry.headers:
+                for method in entry.methods:
+                    if method not in covering or covering[method].priority < entry.priority:
+                        covering[method] = entry
+        yield node, covering, depth
+        for segment in sorted(node.children):
+            yield from self._walk(node.children[segment], covering, depth + 1)
+
+    def conflicts(self):
+        """
+        Returns:
+            list[dict]: {'kind', 'path', 'routes', 'methods'} findings, sorted for stable reports.
+        """
+        findings = defaultdict(set)
+        for node, covering, _ in self._walk():
+            same_path = defaultdict(set)
+            same_priority = defaultdict(set)
+            for entry in node.entries:
+                for method in entry.methods:
+                    same_path[(entry.path, entry.headers, method)].add(entry.route)
+                    if entry.kind == 'regex':
+                        same_priority[(entry.priority, entry.headers, method)].add((entry.path, entry.route))
+                    shadow = covering.get(method)
+                    if shadow is None or shadow.route == entry.route:
+                        continue
+                    if entry.kind == 'prefix' or shadow.priority > entry.priority:
+                        findings[('shadowed', entry.path, (shadow.route, entry.route))].add(method)
+            for (path, _, method), routes in same_path.items():
+                if len(routes) > 1:
+                    findings[('duplicate', path, tuple(sorted(routes, key=str)))].add(method)
+            for (_, _, method), entries in same_priority.items():
+                # Flows of one bundle are disjoint by construction; only cross-bundle ties are reported
+                if len({path for path, _ in entries}) > 1 and len({route[0] for _, route in entries}) > 1:
+                    paths = ' | '.join(sorted({path for path, _ in entries}))
+                    findings[('ambiguous', paths, tuple(sorted({route for _, route in entries}, key=str)))].add(method)
+        for name, routes in self.names.items():
+            if len(routes) > 1:
+                findings[('duplicate_name', name, tuple(sorted(routes, key=str)))] = set()
+        return [
+            {'kind': kind, 'path': path, 'routes': [_route_label(r) for r in routes],
+             'methods': [m for m in ALL_METHODS if m in methods] + sorted(methods - set(ALL_METHODS))}
+            for (kind, path, routes), methods in sorted(findings.items(), key=lambda item: str(item[0]))
+        ]
+
+    def assign_priorities(self):
+        """
+        Deterministic regex_priority per route: routes with regex paths are ranked 1..n by (literal depth,
+        literal length, current regex_priority, name); prefix-only routes keep 0.
+        Returns:
+            dict: (source, route name) -> regex_priority
+        """
+        rank_keys = {}
+        for node, _, depth in self._walk():
+            for entry in node.entries:
+                if entry.kind != 'regex':
+                    continue
+                key = (depth, len(entry.literal), entry.priority)
+                rank_keys[entry.route] = max(rank_keys.get(entry.route, key), key)
+        ordered = sorted(rank_keys, key=lambda route: (rank_keys[route], str(route[1]), str(route[0])))
+        priorities = {route: 0 for route in self.routes}
+        priorities.update({route: rank for rank, route in enumerate(ordered, 1)})
+        return priorities
+
+def is_blocking(findings):
+    """
+    True when findings contain duplicate route paths or names, which must not be merged into one workspace.
+    """
+    return any(f['kind'] in BLOCKING_KINDS for f in findings)
+
+def _route_label(route_key):
+    source, name = route_key
+    return f"{source}:{name}" if source else name
+
+def index_deck_files(paths):
+    index = RouteIndex()
+    for path in paths:
+        index.add_deck_file(path)
+    return index
+
+def write_report(findings, output_path, priorities=None):
+    report = {
+        'summary': {kind: sum(1 for f in findings if f['kind'] == kind) for kind in FINDING_KINDS},
+        'conflicts': findings,
+    }
+    if priorities is not None:
+        report['regex_priorities'] = {_route_label(route): p for route, p in sorted(priorities.items(), key=str) if p}
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Route report written to {output_path}: " + ', '.join(f"{n} {k}" for k, n in report['summary'].items()))
+
+def main():
+    args = sys.argv[1:]
+    report_path = None
+    if '--report' in args:
+        i = args.index('--report')
+        report_path = args[i + 1]
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python route_index.py <kong.yaml> [<kong.yaml> ...] [--report <routes_report.json>]")
+        sys.exit(1)
+    index = index_deck_files(args)
+    findings = index.conflicts()
+    write_report(findings, report_path or os.path.join(os.getcwd(), 'routes_report.json'), index.assign_priorities())
+    sys.exit(1 if is_blocking(findings) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware stage scheduler for the migration pipeline.
+- Each stage declares the artifacts it consumes (inputs) and produces (outputs); dependencies are derived from them.
+- Independent stages run concurrently; a stage whose inputs resolve to nothing is skipped instead of run.
+- Stage modules are imported lazily and only once; dash/underscore twins (config-loaded vs config_loaded) collapse to one stage.
+- Bundle stages share one parsed BundleModel per bundle for the whole run instead of each re-reading its XML.
+- Usage: python stage_scheduler.py [<max_workers>]
+"""
+import os
+import sys
+import glob
+import time
+import importlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bundle_model import as_bundle_model
+
+def get_tool_root():
+    return os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def _glob(*parts):
+    return sorted(glob.glob(os.path.join(get_tool_root(), *parts)))
+
+def _bundle_dirs():
+    return [d for d in _glob('apigeeapiunzipped', '*') if os.path.isdir(d)]
+
+# Artifact name -> resolver returning the concrete paths currently present on disk
+ARTIFACT_RESOLVERS = {
+    'config': lambda: _glob('configs', 'config.json'),
+    'input_zips': lambda: _glob('inputs', '*.zip'),
+    'unzipped_bundles': _bundle_dirs,
+    'bundle_json': lambda: _glob('apigeeapiunzipped', '*', 'apigee_bundle.json'),
+    'interim_structure': lambda: _glob('interims', '*_filesystem.json'),
+    'kong_config': lambda: _glob('outputs', '*', 'kong.yaml'),
+}
+
+def canonical_module_name(name):
+    """
+    Dash-named scripts are copies of their underscore twins; both resolve to the importable underscore module.
+    """
+    return name.replace('-', '_')
+
+_MODULE_CACHE = {}
+
+def import_stage_module(name):
+    module_name = canonical_module_name(name)
+    if module_name not in _MODULE_CACHE:
+        _MODULE_CACHE[module_name] = importlib.import_module(module_name)
+    return _MODULE_CACHE[module_name]
+
+_BUNDLE_MODELS = {}
+_BUNDLE_MODELS_LOCK = threading.Lock()
+
+def bundle_model(bundle_dir):
+    """
+    The BundleModel of a bundle directory, parsed once per run and shared by every bundle stage.
+    """
+    with _BUNDLE_MODELS_LOCK:
+        if bundle_dir not in _BUNDLE_MODELS:
+            _BUNDLE_MODELS[bundle_dir] = as_bundle_model(bundle_dir)
+        return _BUNDLE_MODELS[bundle_dir]
+
+def stage(name, module, inputs, outputs, run):
+    """
+    Declare a stage.
+    Args:
+        name (str): Unique stage name. (MANDATORY)
+        module (str): Script module the stage runs. (MANDATORY)
+        inputs (list[str]): Artifact names the stage consumes. (MANDATORY)
+        outputs (list[str]): Artifact names the stage produces. (MANDATORY)
+        run (callable): run(module, resolved_inputs) where resolved_inputs maps artifact -> paths. (MANDATORY)
+    """
+    return {'name': name, 'module': module, 'inputs': list(inputs), 'outputs': list(outputs), 'run': run}
+
+def dedupe_stages(stages):
+    seen = {}
+    unique = []
+    for s in stages:
+        key = canonical_module_name(s['name'])
+        if key in seen:
+            print(f"Skipping duplicate stage {s['name']} (twin of {seen[key]})")
+            continue
+        seen[key] = s['name']
+        unique.append(s)
+    return unique
+
+def stage_dependencies(stages):
+    """
+    Derive stage -> set(upstream stages) from declared artifacts. Raises ValueError on cycles.
+    """
+    producers = {}
+    for s in stages:
+        for artifact in s['outputs']:
+            producers.setdefault(artifact, set()).add(s['name'])
+    deps = {}
+    for s in stages:
+        deps[s['name']] = set()
+        for artifact in s['inputs']:
+            deps[s['name']].update(p for p in producers.get(artifact, ()) if p != s['name'])
+    # Kahn's algorithm only to detect cycles; execution order is decided dynamically
+    remaining = {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Stage graph has a cycle between: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(ready)
+    return deps
+
+def resolve_inputs(s, resolvers):
+    return {artifact: resolvers[artifact]() if artifact in resolvers else [] for artifact in s['inputs']}
+
+def _run_stage(s, resolved):
+    start = time.monotonic()
+    module = import_stage_module(s['module'])
+    s['run'](module, resolved)
+    return time.monotonic() - start
+
+def run_stages(stages, max_workers=None, resolvers=None):
+    """
+    Execute the stage graph, running every stage as soon as its upstream stages have finished.
+    Args:
+        stages (list[dict]): Stages declared with stage(). (MANDATORY)
+        max_workers (int): Concurrent stage bound. (OPTIONAL)
+        resolvers (dict): Artifact resolvers; defaults to ARTIFACT_RESOLVERS. (OPTIONAL)
+    Returns:
+        dict: stage name -> {'status': ok|skipped|failed, 'duration', 'reason'}
+    """
+    resolvers = ARTIFACT_RESOLVERS if resolvers is None else resolvers
+    # Bundles may have been re-extracted since the last run
+    _BUNDLE_MODELS.clear()
+    stages = dedupe_stages(stages)
+    deps = stage_dependencies(stages)
+    by_name = {s['name']: s for s in stages}
+    pending = [s['name'] for s in stages]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n in pending if deps[n] <= results.keys()]:
+                pending.remove(name)
+                s = by_name[name]
+                failed_upstream = sorted(d for d in deps[name] if results[d]['status'] == 'failed')
+                if failed_upstream:
+                    results[name] = {'status': 'skipped', 'duration': 0.0, 'reason': f"upstream failed: {', '.join(failed_upstream)}"}
+                    continue
+                resolved = resolve_inputs(s, resolvers)
+                missing = [artifact for artifact, paths in resolved.items() if not paths]
+                if missing:
+                    results[name] = {'status': 'skipped', 'duration': 0.0, 'reason': f"no input: {', '.join(missing)}"}
+                    continue
+                print(f"Running stage {name}...")
+                running[pool.submit(_run_stage, s, resolved)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = {'status': 'ok', 'duration': future.result(), 'reason': None}
+                except Exception as e:
+                    traceback.print_exc()
+                    results[name] = {'status': 'failed', 'duration': 0.0, 'reason': f"{type(e).__name__}: {e}"}
+    return {s['name']: results[s['name']] for s in stages}
+
+def print_stage_report(results):
+    print("\n___ Stage Report ___")
+    for name, result in results.items():
+        line = f"{result['status']:>8}  {name}"
+        if result['status'] == 'ok':
+            line += f" ({result['duration']:.2f}s)"
+        elif result['reason']:
+            line += f" - {result['reason']}"
+        print(line)
+
+# ___ Default migration stage graph ___
+
+def _run_config(module, inputs):
+    module.config_loaded()
+
+def _run_list_zips(module, inputs):
+    module.print_zip_files(inputs['input_zips'])
+
+def _run_unzip(module, inputs):
+    module.unzip_apigee_zipfiles()
+
+def _run_detect(module, inputs):
+    for bundle_dir in inputs['unzipped_bundles']:
+        apigee_type = module.detect_apigee_type(bundle_model(bundle_dir).fs)
+        print(f"Detected Apigee API Proxy Type for {os.path.basename(bundle_dir)}: {apigee_type}")
+
+def _run_xml2json(module, inputs):
+    for bundle_dir in inputs['unzipped_bundles']:
+        module.run_xml2json_step(bundle_model(bundle_dir).fs)
+
+def _run_structure(module, inputs):
+    for bundle_dir in inputs['unzipped_bundles']:
+        module.run_structure_step(bundle_model(bundle_dir).fs)
+
+def _run_main(module, inputs):
+    module.main()
+
+def _bundle_output_dir(module, bundle_dir):
+    path = os.path.join(module.get_output_dir(), os.path.basename(os.path.normpath(bundle_dir)))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _run_deck(module, inputs):
+    for bundle_dir in inputs['unzipped_bundles']:
+        model = bundle_model(bundle_dir)
+        module.run_deck_step(model, _bundle_output_dir(module, bundle_dir), model.api_name)
+
+def _run_verify(module, inputs):
+    for path in inputs['kong_config']:
+        module.verify_kong_output(path)
+
+STAGES = [
+    stage('config_loaded', 'config_loaded', [], ['config'], _run_config),
+    stage('list_apigee_zipfiles', 'list_apigee_zipfiles', ['input_zips'], [], _run_list_zips),
+    stage('unzip_apigee_zipfiles', 'unzip_apigee_zipfiles', ['input_zips'], ['unzipped_bundles'], _run_unzip),
+    stage('detect_apigee_type_and_tree', 'detect_apigee_type_and_tree', ['unzipped_bundles'], [], _run_detect),
+    # xml2json and structure extraction go through the executor's steps so they share the build cache
+    stage('apigee_bundle_xml2json', 'parallel_bundle_executor', ['unzipped_bundles'], ['bundle_json'], _run_xml2json),
+    stage('extract_apigee_api_structure', 'parallel_bundle_executor', ['unzipped_bundles'], ['interim_structure'], _run_structure),
+    stage('resources_files_handler', 'resources_files_handler', ['unzipped_bundles'], [], _run_main),
+    stage('resources_scripts_handler', 'resources_scripts_handler', ['unzipped_bundles'], [], _run_main),
+    # Services, routes and plugins are converted inside the deck step, straight into kong.yaml. Duplicate plugins
+    # are merged there too (plugin_optimizer); duplicate_plugin_handler only has a standalone example main, so it
+    # is not a stage
+    stage('kong_deck_file', 'parallel_bundle_executor', ['unzipped_bundles'], ['kong_config'], _run_deck),
+    stage('verify_kong_output', 'verify_kong_output', ['kong_config'], [], _run_verify),
+]
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    results = run_stages(STAGES, max_workers=max_workers)
+    print_stage_report(results)
+    return results
+
+if __name__ == "__main__":
+    main()
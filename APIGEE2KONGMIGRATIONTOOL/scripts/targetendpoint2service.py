@@ -6,21 +6,21 @@ Enterprise-grade script to convert Apigee TargetEndpoint XML to Kong service YAM
 """
 import sys
 import os
-import xml.etree.ElementTree as ET
-from jinja2 import Environment, FileSystemLoader
+from template_registry import get_template
+from yaml_emitter import get_output_format, render_or_emit
+from bundle_model import xml_root
 
 def parse_target_endpoint(xml_path):
     """
     Parse Apigee TargetEndpoint XML and extract relevant info for Kong service.
     Args:
-        xml_path (str): Path to Apigee TargetEndpoint XML file. (MANDATORY)
+        xml_path (str|Element): Path to Apigee TargetEndpoint XML file, or its already parsed root element. (MANDATORY)
     Returns:
         dict: Extracted service info (MANDATORY/OPTIONAL fields as per template)
     Raises:
         Exception: If mandatory fields are missing or XML is invalid.
     """
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = xml_root(xml_path)
     name = root.attrib.get('name')
     if not name:
         raise Exception('TargetEndpoint must have a name attribute (MANDATORY)')
@@ -79,16 +79,23 @@ def parse_target_endpoint(xml_path):
         })
     return services
 
-def render_kong_service(service_info, template_dir, output_path):
+def render_kong_service(service_info, template_dir, output_path, output_format=None):
     """
-    Render the Kong service YAML using the Jinja template and extracted info.
+    Write the Kong service YAML, emitted directly from the service dicts (named and defaulted as the template
+    would) or rendered with the Jinja template.
     Args:
         service_info (dict): Service info from parse_target_endpoint (MANDATORY)
         template_dir (str): Directory containing Jinja template (MANDATORY)
         output_path (str): Output YAML file path (MANDATORY)
+        output_format (str): 'yaml', 'json' or 'template'; defaults to other.output_format (OPTIONAL)
     """
-    env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True)
-    template = env.get_template('kong_service.j2')
+    if get_output_format(output_format) != 'template':
+        # Same entity the template renders: its name prefix and |default values
+        services = [dict(service, name=f"service.{service['name']}") for service in service_info]
+        render_or_emit('kong_service', services, output_path, template_dir, output_format, root_key='service')
+        print(f"Kong service YAML(s) written to {output_path}")
+        return
+    template = get_template('kong_service', template_dir)
     with open(output_path, 'w') as f:
         for idx, service in enumerate(service_info):
             rendered = template.render(**service)
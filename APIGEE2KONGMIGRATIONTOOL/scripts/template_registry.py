@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Process-wide registry of the compiled Jinja templates under templates/.
+- One Environment per template directory; each .j2 is compiled once and then served from memory.
+- auto_reload is off, so rendering never stats the template files again.
+- On-disk bytecode cache (other.template_cache_dir in configs/config.json, OTHER__TEMPLATE_CACHE_DIR overrides;
+  empty means ~/.cache/apigee2kong/templates, "off" disables it) lets later runs and pool workers skip compilation.
+- template_defaults() / apply_defaults() give the plain YAML/JSON output path the same |default(...) fallbacks
+  the templates render with.
+- Usage: python template_registry.py [<template_dir>]   (precompiles every template and reports the count)
+"""
+import os
+import sys
+import copy
+import threading
+from functools import lru_cache
+import yaml
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, TemplateNotFound, nodes
+from pipeline_settings import get_setting, user_cache_dir
+
+_ENVIRONMENTS = {}
+_LOCK = threading.Lock()
+
+def get_scripts_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_template_dir():
+    return os.path.join(get_scripts_dir(), '../templates')
+
+def get_bytecode_cache_dir():
+    cache_dir = get_setting('template_cache_dir')
+    if not cache_dir:
+        return user_cache_dir('templates')
+    if str(cache_dir).lower() == 'off':
+        return None
+    return os.path.normpath(os.path.join(get_scripts_dir(), os.path.expanduser(cache_dir)))
+
+def get_environment(template_dir=None):
+    """
+    Shared Environment for template_dir (defaults to templates/), created on first use.
+    """
+    template_dir = os.path.abspath(template_dir or get_template_dir())
+    env = _ENVIRONMENTS.get(template_dir)
+    if env is not None:
+        return env
+    with _LOCK:
+        if template_dir not in _ENVIRONMENTS:
+            bytecode_cache = None
+            cache_dir = get_bytecode_cache_dir()
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+            _ENVIRONMENTS[template_dir] = Environment(
+                loader=FileSystemLoader(template_dir),
+                trim_blocks=True,
+                lstrip_blocks=True,
+                auto_reload=False,
+                cache_size=-1,
+                bytecode_cache=bytecode_cache,
+            )
+        return _ENVIRONMENTS[template_dir]
+
+def template_name(plugin_name):
+    return plugin_name if plugin_name.endswith('.j2') else f'{plugin_name}.j2'
+
+def get_template(plugin_name, template_dir=None):
+    return get_environment(template_dir).get_template(template_name(plugin_name))
+
+def precompile_all(template_dir=None):
+    """
+    Compile every .j2 in template_dir up front (e.g. before forking workers). Returns the number compiled.
+    """
+    env = get_environment(template_dir)
+    names = env.list_templates(filter_func=lambda name: name.endswith('.j2'))
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+def render(plugin_name, context, template_dir=None):
+    """
+    Render a template from the registry.
+    Args:
+        plugin_name (str): Template name, with or without the .j2 suffix (e.g. 'cors', 'kong_route'). (MANDATORY)
+        context (dict): Template variables. (MANDATORY)
+        template_dir (str): Template directory; defaults to templates/. (OPTIONAL)
+    Returns:
+        str: Rendered text.
+    """
+    return get_template(plugin_name, template_dir).render(**context)
+
+def _variable_path(node):
+    """
+    ['config', 'method'] for config.method; None for anything but a plain variable/attribute chain.
+    """
+    parts = []
+    while isinstance(node, nodes.Getattr):
+        parts.append(node.attr)
+        node = node.node
+    if not isinstance(node, nodes.Name):
+        return None
+    parts.append(node.name)
+    return parts[::-1]
+
+@lru_cache(maxsize=None)
+def _template_defaults(plugin_name, template_dir):
+    env = get_environment(template_dir)
+    try:
+        source = env.loader.get_source(env, template_name(plugin_name))[0]
+    except TemplateNotFound:
+        return {}
+    defaults = {}
+    for node in env.parse(source).find_all(nodes.Filter):
+        path = _variable_path(node.node) if node.name == 'default' and node.args else None
+        if not path:
+            continue
+        try:
+            value = node.args[0].as_const()
+        except nodes.Impossible:
+            continue
+        if isinstance(value, str):
+            # The template writes the default into YAML unquoted: '' and 'null' read back as null
+            value = yaml.safe_load(value) if value.strip() else None
+        if value is None:
+            continue
+        target = defaults
+        for part in path[:-1]:
+            target = target.setdefault(part, {})
+            if not isinstance(target, dict):
+                break
+        else:
+            target.setdefault(path[-1], value)
+    return defaults
+
+def template_defaults(plugin_name, template_dir=None):
+    """
+    Values a template falls back to through |default(...), as a nested dict (e.g. {'config': {'method': 'POST'}}).
+    Fallbacks that render as YAML null are left out; an unknown template has no defaults.
+    """
+    return _template_defaults(plugin_name, os.path.abspath(template_dir or get_template_dir()))
+
+def apply_defaults(plugin_name, context, template_dir=None):
+    """
+    Copy of context with the template's defaults filled in wherever context leaves a key out.
+    """
+    return _merge_missing(context, template_defaults(plugin_name, template_dir))
+
+def _merge_missing(context, defaults):
+    merged = dict(context)
+    for key, value in defaults.items():
+        if key not in merged:
+            merged[key] = copy.deepcopy(value)
+        elif isinstance(value, dict) and isinstance(merged[key], dict):
+            merged[key] = _merge_missing(merged[key], value)
+    return merged
+
+def clear():
+    with _LOCK:
+        _ENVIRONMENTS.clear()
+    _template_defaults.cache_clear()
+
+if __name__ == "__main__":
+    template_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"Precompiled {precompile_all(template_dir)} templates from {os.path.abspath(template_dir or get_template_dir())}")
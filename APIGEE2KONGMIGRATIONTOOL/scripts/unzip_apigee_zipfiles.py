@@ -5,6 +5,7 @@ Unzip all zip files in APIGEE2KONGMIGRATIONTOOL/inputs to APIGEE2KONGMIGRATIONTO
 
 import os
 import zipfile
+import build_cache
 
 def get_input_dir():
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), '../inputs')
@@ -13,10 +14,15 @@ def get_output_dir():
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), '../apigeeapiunzipped')
 
 def unzip_file(zip_path, dest_folder):
+    """
+    Extract zip_path into dest_folder and return the paths of the extracted files.
+    """
     os.makedirs(dest_folder, exist_ok=True)
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(dest_folder)
+        members = [info.filename for info in zip_ref.infolist() if not info.is_dir()]
     print(f"Unzipped {os.path.basename(zip_path)} to {dest_folder}")
+    return [os.path.join(dest_folder, *member.split('/')) for member in members]
 
 def unzip_all_zip_files(input_dir, output_dir):
     for file in os.listdir(input_dir):
@@ -24,7 +30,13 @@ def unzip_all_zip_files(input_dir, output_dir):
             zip_path = os.path.join(input_dir, file)
             folder_name = os.path.splitext(file)[0]
             dest_folder = os.path.join(output_dir, folder_name)
-            unzip_file(zip_path, dest_folder)
+            # Skip archives whose content is unchanged since they were last extracted, as long as every extracted
+            # file is still there unedited (the entry records each file's digest); files added next to them do not count
+            cache_key = build_cache.make_key('unzip', build_cache.file_sha256(zip_path))
+            if build_cache.lookup('unzip', dest_folder, cache_key):
+                print(f"Unchanged {file}, reusing {dest_folder}")
+                continue
+            build_cache.record('unzip', dest_folder, cache_key, unzip_file(zip_path, dest_folder))
 
 def unzip_apigee_zipfiles():
     input_dir = get_input_dir()
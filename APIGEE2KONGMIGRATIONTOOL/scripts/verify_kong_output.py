@@ -1,39 +1,86 @@
 #!/usr/bin/env python3
 """
 Verify possible ordering of Kong API plugins in the output YAML/JSON, and ensure each service, route, and plugin has a tag with the Apigee API name.
+- With the source bundle, the dynamic ordering plugin_ordering_resolver derives from the Apigee step order is
+  checked too; without it only duplicates and the consistency of configured ordering are checked.
+- Estate mode (several files, directories or globs, or --report): every file goes through kong_config_validator
+  in a process pool; findings and per-file timings are merged into one JSON or HTML report, and the exit code is
+  non-zero when any file has errors, so CI can gate all outputs in one call.
+- Usage: python verify_kong_output.py <output.yaml|output.json> [<unzipped_api_bundle_dir|bundle.zip>]
+         python verify_kong_output.py <file|dir|glob> [...] [--pattern kong.yaml] [--workers N]
+                                      [--report <report.json|report.html>] [--require-tag <tag>]
 """
 import os
-import yaml
+import sys
 import json
+import glob
+import html
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from yaml_emitter import load
+from plugin_ordering_resolver import resolve_bundle_ordering, strongly_connected
+from kong_config_validator import validate_deck_file
+from pipeline_settings import get_setting
+
+DEFAULT_PATTERN = 'kong.yaml'
+
+def get_max_workers():
+    return int(get_setting('max_threads') or os.cpu_count() or 1)
 
 def load_output_file(output_path):
-    with open(output_path) as f:
-        if output_path.endswith('.yaml') or output_path.endswith('.yml'):
-            return yaml.safe_load(f)
+    # libyaml-backed loader when available
+    return load(output_path)
+
+def _scoped_plugins(kong_config):
+    """
+    (scope label, plugins) for plugins nested under services/routes and for decK's top-level plugins list.
+    """
+    scopes = {}
+    for kind in ('services', 'routes'):
+        for entity in kong_config.get(kind, []) or []:
+            scopes.setdefault(f"{kind[:-1]}:{entity.get('name')}", []).extend(entity.get('plugins', []) or [])
+    for plugin in kong_config.get('plugins', []) or []:
+        for field in ('route', 'service'):
+            if plugin.get(field):
+                ref = plugin[field]
+                scopes.setdefault(f"{field}:{ref.get('name') if isinstance(ref, dict) else ref}", []).append(plugin)
+                break
         else:
-            return json.load(f)
+            scopes.setdefault('global', []).append(plugin)
+    return scopes.items()
 
-def verify_plugin_ordering(kong_config):
+def verify_plugin_ordering(kong_config, required_ordering=None):
+    """
+    Check plugin ordering: no duplicate plugin per scope, configured ordering.before/after.access naming plugins of
+    the same scope and free of cycles, and every ordering plugin_ordering_resolver requires for the bundle present.
+    Args:
+        kong_config (dict): Loaded Kong/decK config. (MANDATORY)
+        required_ordering (dict): resolve_ordering()['ordering'] for the source bundle. (OPTIONAL)
+    Returns:
+        tuple: (ordering_ok, list of plugins missing a required ordering)
+    """
     ordering_ok = True
     missing_ordering = []
-    for service in kong_config.get('services', []):
-        plugins = service.get('plugins', [])
+    for scope, plugins in _scoped_plugins(kong_config):
         plugin_names = [p['name'] for p in plugins]
         if len(plugin_names) != len(set(plugin_names)):
-            print(f"Duplicate plugin detected in service {service.get('name')}")
+            print(f"Duplicate plugin detected in {scope}")
             ordering_ok = False
+        edges = set()
         for p in plugins:
-            if not p.get('after') and not p.get('before'):
-                missing_ordering.append(f"plugin:{p.get('name')} in service:{service.get('name')}")
-    for route in kong_config.get('routes', []):
-        plugins = route.get('plugins', [])
-        plugin_names = [p['name'] for p in plugins]
-        if len(plugin_names) != len(set(plugin_names)):
-            print(f"Duplicate plugin detected in route {route.get('name')}")
+            for direction in ('before', 'after'):
+                for other in ((p.get('ordering') or {}).get(direction) or {}).get('access', []):
+                    if other not in plugin_names:
+                        print(f"plugin:{p['name']} in {scope} is ordered {direction} {other}, which is not configured there")
+                    edges.add((p['name'], other) if direction == 'before' else (other, p['name']))
+            required = (required_ordering or {}).get(p['name'], {}).get('before', {}).get('access', [])
+            configured = ((p.get('ordering') or {}).get('before') or {}).get('access', [])
+            if any(other in plugin_names and other not in configured for other in required):
+                missing_ordering.append(f"plugin:{p.get('name')} in {scope}")
+        for cycle in strongly_connected({n for edge in edges for n in edge}, edges):
+            print(f"Plugin ordering cycle in {scope}: {', '.join(cycle)}")
             ordering_ok = False
-        for p in plugins:
-            if not p.get('after') and not p.get('before'):
-                missing_ordering.append(f"plugin:{p.get('name')} in route:{route.get('name')}")
     return ordering_ok, missing_ordering
 
 def verify_apigee_tag(kong_config):
@@ -52,15 +99,25 @@ def verify_apigee_tag(kong_config):
                 missing_tags.append(f"plugin:{plugin.get('name')} in route:{route.get('name')}")
     return missing_tags
 
-def verify_kong_output(output_path):
+def bundle_ordering(bundle, kong_config):
+    """
+    Ordering the Apigee step order of `bundle` needs, resolved on copies of the configured plugins.
+    """
+    plugins = [{k: v for k, v in p.items() if k != 'ordering'} for _, scoped in _scoped_plugins(kong_config) for p in scoped]
+    result = resolve_bundle_ordering(bundle, plugins)
+    for cycle in result['cycles']:
+        print(f"Apigee step order cannot be expressed, cycle between: {', '.join(cycle['plugins'])}")
+    return result['ordering']
+
+def verify_kong_output(output_path, bundle=None):
     kong_config = load_output_file(output_path)
     print(f"Verifying plugin ordering and Apigee tags in {output_path}...")
-    ordering_ok, missing_ordering = verify_plugin_ordering(kong_config)
+    ordering_ok, missing_ordering = verify_plugin_ordering(kong_config, bundle_ordering(bundle, kong_config) if bundle else None)
     missing_tags = verify_apigee_tag(kong_config)
     if ordering_ok:
         print("No duplicate plugins detected in any service or route.")
     else:
-        print("Duplicate plugins found. See above.")
+        print("Duplicate plugins or ordering problems found. See above.")
     if not missing_tags:
         print("All services, routes, and plugins have apigee_api_name tags.")
     else:
@@ -68,21 +125,132 @@ def verify_kong_output(output_path):
         for tag in missing_tags:
             print(f"  {tag}")
     if not missing_ordering:
-        print("All plugins have 'after' or 'before' ordering configured.")
+        print("All plugins that Kong's priority order would misplace have ordering configured.")
     else:
-        print("Missing 'after'/'before' ordering for:")
+        print("Missing ordering.before.access required by the Apigee step order for:")
         for tag in missing_ordering:
             print(f"  {tag}")
     return ordering_ok and not missing_tags and not missing_ordering
 
+def collect_files(targets, pattern=DEFAULT_PATTERN):
+    """
+    Expand files, directories (searched recursively for `pattern`) and glob patterns into a sorted file list.
+    """
+    files = set()
+    for target in targets:
+        if os.path.isdir(target):
+            files.update(glob.glob(os.path.join(target, '**', pattern), recursive=True))
+        elif os.path.isfile(target):
+            files.add(target)
+        else:
+            files.update(p for p in glob.glob(target, recursive=True) if os.path.isfile(p))
+    return sorted(files)
+
+def verify_file(path, required_tag=None):
+    """
+    Validate one decK file. Never raises: unreadable files are reported with status 'error'.
+    Returns:
+        dict: {'file', 'status' (passed|failed|error), 'duration', 'summary', 'findings'}
+    """
+    start = time.monotonic()
+    try:
+        result = validate_deck_file(path, required_tag)
+        status = 'failed' if result['summary']['errors'] else 'passed'
+        summary, findings = result['summary'], result['findings']
+    except Exception as e:
+        status, summary = 'error', {'entities': {}, 'errors': 1, 'warnings': 0}
+        findings = [{'severity': 'error', 'check': 'io', 'section': None, 'entity': None, 'field': None, 'line': None,
+                     'message': f"{type(e).__name__}: {e}"}]
+    return {'file': path, 'status': status, 'duration': round(time.monotonic() - start, 4), 'summary': summary, 'findings': findings}
+
+def verify_files(paths, max_workers=None, required_tag=None):
+    """
+    Validate many decK files in a bounded process pool.
+    Returns:
+        dict: {'summary': {files, passed, failed, errors, warnings, duration, wall_time}, 'files': [verify_file() results]}
+    """
+    start = time.monotonic()
+    max_workers = min(max_workers or get_max_workers(), max(len(paths), 1))
+    if max_workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(verify_file, paths, [required_tag] * len(paths), chunksize=max(1, len(paths) // (max_workers * 8))))
+    else:
+        results = [verify_file(path, required_tag) for path in paths]
+    summary = {
+        'files': len(results),
+        'passed': sum(1 for r in results if r['status'] == 'passed'),
+        'failed': sum(1 for r in results if r['status'] != 'passed'),
+        'errors': sum(r['summary']['errors'] for r in results),
+        'warnings': sum(r['summary']['warnings'] for r in results),
+        'duration': round(sum(r['duration'] for r in results), 4),
+        'wall_time': round(time.monotonic() - start, 4),
+    }
+    return {'summary': summary, 'files': results}
+
+def render_html_report(report):
+    summary = report['summary']
+    rows = []
+    for result in sorted(report['files'], key=lambda r: (r['status'] == 'passed', -r['duration'])):
+        findings = ''.join(
+            f"<li class=\"{f['severity']}\">{html.escape(f['severity'])} [{html.escape(f['check'])}] "
+            f"{html.escape(str(f['entity'] or ''))} {html.escape(str(f['field'] or ''))}"
+            f"{' line ' + str(f['line']) if f['line'] else ''}: {html.escape(f['message'])}</li>"
+            for f in result['findings'])
+        rows.append(f"<tr class=\"{result['status']}\"><td>{html.escape(result['file'])}</td><td>{result['status']}</td>"
+                    f"<td>{result['duration']:.3f}s</td><td>{result['summary']['errors']}</td><td>{result['summary']['warnings']}</td>"
+                    f"<td><ul>{findings}</ul></td></tr>")
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Kong output verification</title>
+<style>body{{font-family:sans-serif}} table{{border-collapse:collapse}} td,th{{border:1px solid #ccc;padding:4px;vertical-align:top}}
+tr.failed,tr.error{{background:#fde8e8}} li.warning{{color:#8a6d00}} li.error{{color:#b00020}}</style></head>
+<body><h1>Kong output verification</h1>
+<p>{summary['files']} files: {summary['passed']} passed, {summary['failed']} failed; {summary['errors']} errors,
+{summary['warnings']} warnings; {summary['duration']:.2f}s validation time, {summary['wall_time']:.2f}s wall time.</p>
+<table><tr><th>File</th><th>Status</th><th>Time</th><th>Errors</th><th>Warnings</th><th>Findings</th></tr>
+{chr(10).join(rows)}
+</table></body></html>
+"""
+
+def write_report(report, output_path):
+    with open(output_path, 'w') as f:
+        if output_path.endswith(('.html', '.htm')):
+            f.write(render_html_report(report))
+        else:
+            json.dump(report, f, indent=2)
+    print(f"Verification report written to {output_path}")
+
+def _is_bundle(path):
+    return path.endswith('.zip') or os.path.isdir(os.path.join(path, 'apiproxy'))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Verify Kong output files.')
+    parser.add_argument('targets', nargs='+', help='Output files, directories or glob patterns')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN, help='File name pattern searched in directories')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: other.max_threads)')
+    parser.add_argument('--report', help='Aggregated report path; .html for HTML, anything else for JSON')
+    parser.add_argument('--require-tag', help='Tag every service, route and plugin must carry')
+    return parser.parse_args(argv)
+
 def main():
-    # Example usage: pass output file path as argument
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python verify_kong_output.py <output.yaml|output.json>")
-        sys.exit(1)
-    output_path = sys.argv[1]
-    verify_kong_output(output_path)
+    argv = sys.argv[1:]
+    # Single output file, optionally with its source bundle: the interactive report
+    if argv and not any(a.startswith('--') for a in argv) and os.path.isfile(argv[0]) and (
+            len(argv) == 1 or (len(argv) == 2 and _is_bundle(argv[1]))):
+        return verify_kong_output(argv[0], argv[1] if len(argv) > 1 else None)
+    args = parse_args(argv)
+    paths = collect_files(args.targets, args.pattern)
+    if not paths:
+        print(f"No files matching {args.pattern} found in {', '.join(args.targets)}")
+        sys.exit(2)
+    report = verify_files(paths, args.workers, args.require_tag)
+    if args.report:
+        write_report(report, args.report)
+    for result in report['files']:
+        if result['status'] != 'passed':
+            print(f"[{result['status']}] {result['file']}: {result['summary']['errors']} errors ({result['duration']:.2f}s)")
+    summary = report['summary']
+    print(f"{summary['files']} files verified in {summary['wall_time']:.2f}s: {summary['passed']} passed, {summary['failed']} failed")
+    sys.exit(1 if summary['failed'] else 0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compact node type for the JSON view of Apigee XML (tag / attrib / text / children).
+- __slots__ instead of a per-element OrderedDict; tag names and attribute keys are interned.
+- Leaves share one read-only empty attrib mapping and one empty children tuple.
+- Reads like the old dicts (node['tag'], node.get('children'), dict(node)) and serialises to the same JSON
+  through XmlNodeEncoder.
+"""
+import sys
+import json
+from types import MappingProxyType
+from collections import OrderedDict
+from collections.abc import Mapping
+
+EMPTY_ATTRIB = MappingProxyType({})
+EMPTY_CHILDREN = ()
+
+class XmlNode:
+    __slots__ = ('tag', 'attrib', 'text', 'children')
+    KEYS = ('tag', 'attrib', 'text', 'children')
+
+    def __init__(self, tag, attrib=None, text='', children=None):
+        self.tag = sys.intern(tag)
+        self.attrib = {sys.intern(k): v for k, v in attrib.items()} if attrib else EMPTY_ATTRIB
+        self.text = text
+        self.children = tuple(children) if children else EMPTY_CHILDREN
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def keys(self):
+        return self.KEYS
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.KEYS]
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def to_dict(self):
+        d = OrderedDict()
+        d['tag'] = self.tag
+        d['attrib'] = dict(self.attrib)
+        d['text'] = self.text
+        d['children'] = [child.to_dict() for child in self.children]
+        return d
+
+    def __eq__(self, other):
+        if isinstance(other, XmlNode):
+            return (self.tag, dict(self.attrib), self.text, self.children) == (other.tag, dict(other.attrib), other.text, other.children)
+        if isinstance(other, Mapping):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # The shared read-only EMPTY_ATTRIB cannot be pickled; rebuild through __init__ (re-interning tags too)
+        return (XmlNode, (self.tag, dict(self.attrib) or None, self.text, self.children))
+
+    def __repr__(self):
+        return f"XmlNode({self.tag!r}, attrib={dict(self.attrib)!r}, text={self.text!r}, children={len(self.children)})"
+
+def _text(elem):
+    return elem.text.strip() if elem.text and elem.text.strip() else ''
+
+def node_from_element(elem):
+    """
+    Convert an ElementTree element (recursively) to XmlNode.
+    """
+    return XmlNode(elem.tag, elem.attrib, _text(elem), [node_from_element(child) for child in elem])
+
+def node_object_hook(pairs):
+    """
+    object_pairs_hook for json/msgpack loads: objects shaped like a node become XmlNode, the rest OrderedDict,
+    so a reloaded apigee_bundle.json has the same types as the one that was written.
+    """
+    if tuple(key for key, _ in pairs) == XmlNode.KEYS:
+        values = dict(pairs)
+        return XmlNode(values['tag'], values['attrib'], values['text'], values['children'])
+    return OrderedDict(pairs)
+
+class XmlNodeEncoder(json.JSONEncoder):
+    """
+    JSON encoder producing exactly what json.dump produced for the former xml_to_dict OrderedDicts.
+    """
+    def default(self, o):
+        if isinstance(o, XmlNode):
+            return {'tag': o.tag, 'attrib': dict(o.attrib), 'text': o.text, 'children': list(o.children)}
+        if isinstance(o, MappingProxyType):
+            return dict(o)
+        return super().default(o)
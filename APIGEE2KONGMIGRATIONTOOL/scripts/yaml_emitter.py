@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Direct dict-to-YAML/JSON emission for converter output, bypassing the Jinja templates.
+- YAML goes through libyaml (yaml.CSafeDumper / CSafeLoader) when PyYAML was built with it, else the pure-Python classes.
+- Output format comes from other.output_format in configs/config.json (OTHER__OUTPUT_FORMAT overrides):
+  'yaml' and 'json' serialise plain dicts; 'template' (default, what the per-policy CLIs always wrote) renders the
+  Jinja templates.
+- The plain formats fill in the template's |default(...) values, so they carry the same settings as template output.
+"""
+import json
+import yaml
+from pipeline_settings import get_setting
+from template_registry import apply_defaults, render
+
+DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+OUTPUT_FORMATS = ('yaml', 'json', 'template')
+
+def get_output_format(output_format=None):
+    output_format = (output_format or get_setting('output_format') or 'template').lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+    return output_format
+
+def dump_yaml(data, stream=None):
+    return yaml.dump(data, stream, Dumper=DUMPER, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+def dump_yaml_all(documents, stream=None):
+    return yaml.dump_all(documents, stream, Dumper=DUMPER, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+def emit(documents, output_path, output_format=None):
+    """
+    Write one or more documents to output_path.
+    Args:
+        documents (dict|list[dict]): A single document, or several (YAML '---' stream / JSON array). (MANDATORY)
+        output_path (str): Destination file. (MANDATORY)
+        output_format (str): 'yaml' or 'json'; defaults to the configured format. (OPTIONAL)
+    """
+    output_format = get_output_format(output_format)
+    with open(output_path, 'w') as f:
+        if output_format == 'json':
+            json.dump(documents, f, indent=2)
+            f.write('\n')
+        elif isinstance(documents, list):
+            dump_yaml_all(documents, f)
+        else:
+            dump_yaml(documents, f)
+
+def render_or_emit(template_name, documents, output_path, template_dir=None, output_format=None, root_key=None):
+    """
+    Emit documents as plain YAML/JSON, or render them through the Jinja template when the format is 'template'.
+    Args:
+        template_name (str): Template used in 'template' mode, e.g. 'cors' or 'kong_route'. (MANDATORY)
+        documents (dict|list[dict]): Template context(s); each is one entity. (MANDATORY)
+        output_path (str): Destination file. (MANDATORY)
+        root_key (str): Wraps each entity as {root_key: entity}, matching the templates' layout. (OPTIONAL)
+    """
+    output_format = get_output_format(output_format)
+    many = isinstance(documents, list)
+    contexts = documents if many else [documents]
+    if output_format == 'template':
+        rendered = [render(template_name, context, template_dir) for context in contexts]
+        with open(output_path, 'w') as f:
+            f.write('\n---\n'.join(rendered))
+        return
+    contexts = [apply_defaults(template_name, context, template_dir) for context in contexts]
+    wrapped = [{root_key: context} if root_key else context for context in contexts]
+    emit(wrapped if many else wrapped[0], output_path, output_format)
+
+def load(path):
+    """
+    Load a YAML (libyaml-accelerated) or JSON file.
+    """
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            return yaml.load(f, Loader=LOADER)
+        return json.load(f)
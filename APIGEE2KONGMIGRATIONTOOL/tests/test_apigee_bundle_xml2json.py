@@ -0,0 +1,26 @@
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import apigee_bundle_xml2json as xml2json
+
+FILES = {
+    'apiproxy/apiproxy.xml': '<APIProxy name="orders"><Name>orders</Name></APIProxy>',
+    'apiproxy/resources/wsdl/orders.wsdl.xml': '<definitions name="orders">' + '<message name="m"><part name="p" type="xsd:string"/></message>' * 200 + '</definitions>',
+    'apiproxy/policies/Broken.xml': '<Quota name="Broken">',
+}
+
+def test_ndjson_stream_matches_json_document(tmp_path):
+    bundle = tmp_path / 'orders'
+    for rel, content in FILES.items():
+        path = bundle / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    expected = xml2json.parse_members_and_build_json(str(bundle), xml2json.collect_xml_members(str(bundle)))
+    # A tiny threshold forces the iterparse path for every file
+    records = xml2json.iter_member_records(str(bundle), large_file_bytes=16)
+    assert xml2json.write_ndjson(str(bundle), records) == 3
+    streamed = {r['path']: r['entity'] for r in xml2json.read_ndjson(str(bundle / 'apigee_bundle.ndjson'))}
+    assert streamed.keys() == expected.keys()
+    assert streamed['apiproxy/resources/wsdl/orders.wsdl.xml'] == expected['apiproxy/resources/wsdl/orders.wsdl.xml']
+    assert 'error' in streamed['apiproxy/policies/Broken.xml']
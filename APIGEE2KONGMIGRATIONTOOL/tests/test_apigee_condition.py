@@ -0,0 +1,92 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from apigee_condition import ConditionError, compile_condition, condition_to_lua, route_paths
+from proxyendpoint2service import parse_proxy_endpoint
+
+def test_or_of_verbs_lowers_to_one_route_per_alternative():
+    specs = compile_condition('(proxy.pathsuffix MatchesPath "/items/*") and (request.verb = "GET" or request.verb == "post")')
+    assert [spec.methods for spec in specs] == [('GET',), ('POST',)]
+    assert route_paths(specs[0], ['/v1']) == ['~^/v1(?=/items/[^/]*$)']
+    assert specs[0].regex_priority == 5 and not specs[0].residual
+
+def test_negation_startswith_regex_and_headers():
+    spec, = compile_condition('!(request.verb == "GET") and proxy.pathsuffix =| "/a" and response.status.code > 200')
+    assert 'GET' not in spec.methods and route_paths(spec, ['/v1/']) == ['~^/v1(?=/a.*$)']
+    assert spec.residual == ('response.status.code > 200',)
+    spec, = compile_condition('request.header.X-Version == "2" && proxy.pathsuffix JavaRegex "/orders/\\d+"')
+    assert spec.headers == (('x-version', ('2',)),)
+    assert route_paths(spec, ['/']) == ['~^(?=(?:/orders/\\d+)$)']
+
+def test_contains_on_headers_and_paths():
+    spec, = compile_condition('(request.header.User-Agent Contains "Mobile")')
+    assert spec.headers == (('user-agent', ('~*^.*Mobile.*$',)),) and not spec.residual
+    spec, = compile_condition('proxy.pathsuffix contains "/v2." and request.verb = "GET"')
+    assert route_paths(spec, ['/api']) == ['~^/api(?=.*/v2\\..*$)'] and spec.methods == ('GET',)
+
+def test_lua_equality_compares_literals_as_strings():
+    assert condition_to_lua('request.header.bypass = "true"') == '(tostring(kong.request.get_header("bypass")) == "true")'
+    assert condition_to_lua('request.queryparam.n != 1') == '(tostring(kong.request.get_query_arg("n")) ~= "1")'
+    assert condition_to_lua('request.header.x = null') == '(kong.request.get_header("x") == nil)'
+
+def test_contradictions_and_syntax_errors():
+    assert compile_condition('request.verb == "GET" and request.verb == "POST"') == ()
+    with pytest.raises(ConditionError):
+        compile_condition('(request.verb == "GET"')
+
+def test_parse_proxy_endpoint_adds_flow_routes():
+    root = ET.fromstring('''<ProxyEndpoint name="default">
+  <Flows>
+    <Flow name="get-item"><Condition>(proxy.pathsuffix MatchesPath "/items/*") and (request.verb = "GET")</Condition></Flow>
+    <Flow name="by-status"><Condition>response.status.code == 200</Condition></Flow>
+  </Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>''')
+    routes = parse_proxy_endpoint(root, router_flavor='traditional')
+    assert [r['name'] for r in routes] == ['default', 'default.get-item']
+    assert routes[0]['paths'] == ['/orders'] and len(routes[0]['methods']) == 7
+    assert routes[1]['paths'] == ['~^/orders(?=/items/[^/]*$)'] and routes[1]['methods'] == ['GET']
+    assert routes[1]['regex_priority'] == 5 and 'apigee-flow:get-item' in routes[1]['tags']
+
+def test_flow_route_paths_per_router_flavor():
+    from proxyendpoint2service import expression_route, rewrite_plugin
+    root = ET.fromstring('''<ProxyEndpoint name="default">
+  <Flows><Flow name="get-item"><Condition>(proxy.pathsuffix MatchesPath "/items/*") and (request.verb = "GET")</Condition></Flow></Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>''')
+    traditional = parse_proxy_endpoint(root, router_flavor='traditional')[1]
+    assert traditional['paths'] == ['~^/orders(?=/items/[^/]*$)'] and traditional['strip_path'] is True
+    assert rewrite_plugin(traditional, '/v1') is None
+    # ATC regexes have no lookaround: match in place, keep the path and forward the captured suffix
+    compatible = parse_proxy_endpoint(root, router_flavor='traditional_compatible')[1]
+    assert compatible['paths'] == ['~^/orders(?P<pathsuffix>/items/[^/]*)$'] and compatible['strip_path'] is False
+    compatible['service'] = 'orders'
+    service_transformer = {'name': 'request-transformer', 'service': 'orders', 'config': {'add': {'headers': ['x-a:1']}}}
+    plugin = rewrite_plugin(compatible, '/v1/', [service_transformer])
+    assert plugin['route'] == 'default.get-item' and 'service' not in plugin
+    assert plugin['config'] == {'add': {'headers': ['x-a:1']}, 'replace': {'uri': '/v1$(uri_captures.pathsuffix)'}}
+    expression = expression_route(parse_proxy_endpoint(root, router_flavor='expressions')[1])['expression']
+    assert '(?=' not in expression and 'http.path ~ r#"^/orders(?:/items/[^/]*)$"#' in expression
+    assert expression_route(compatible)['expression'] == expression
+
+def test_expressions_router_output(tmp_path):
+    import yaml
+    from proxyendpoint2service import render_kong_routes
+    root = ET.fromstring('''<ProxyEndpoint name="default">
+  <Flows><Flow name="get-item"><Condition>proxy.pathsuffix MatchesPath "/items/*" and request.verb = "GET" and request.header.X-Version == "2"</Condition></Flow></Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>''')
+    template_dir = os.path.join(os.path.dirname(__file__), '../templates')
+    documents = {}
+    for fmt in ('yaml', 'template'):
+        path = str(tmp_path / f'{fmt}.yaml')
+        render_kong_routes(parse_proxy_endpoint(root), 'orders', template_dir, path, output_format=fmt, router_flavor='expressions')
+        documents[fmt] = [d['route'] for d in yaml.safe_load_all(open(path)) if d]
+    base, item = documents['yaml']
+    assert base['expression'] == 'http.path ^= "/orders"' and 'paths' not in base
+    assert item['expression'] == ('http.path ^= "/orders" && http.path ~ r#"^/orders(?:/items/[^/]*)$"#'
+                                  ' && http.method == "GET" && http.headers.x_version == "2"')
+    assert item['priority'] > base['priority']
+    assert [r['expression'] for r in documents['template']] == [base['expression'], item['expression']]
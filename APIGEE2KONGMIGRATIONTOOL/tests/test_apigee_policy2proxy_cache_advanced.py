@@ -0,0 +1,61 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from apigee_policy2proxy_cache_advanced import parse_responsecache_policy, SUCCESS_CACHEABLE_CODES
+
+POLICY = '''<ResponseCache name="RC-Products">
+  <CacheKey>
+    <Prefix>products</Prefix>
+    <KeyFragment ref="request.uri" type="string"/>
+    <KeyFragment ref="request.header.X-Tenant"/>
+    <KeyFragment ref="client.ip"/>
+  </CacheKey>
+  <CacheResource>products-cache</CacheResource>
+  <ExcludeErrorResponse>true</ExcludeErrorResponse>
+  <ExpirySettings><TimeoutInSec ref="flow.ttl">600</TimeoutInSec></ExpirySettings>
+  <SkipCacheLookup>request.header.bypass-cache = "true"</SkipCacheLookup>
+  <UseAcceptHeader>true</UseAcceptHeader>
+  <UseResponseCacheHeaders>true</UseResponseCacheHeaders>
+</ResponseCache>'''
+
+def test_responsecache_maps_key_expiry_and_scope():
+    report = []
+    config = parse_responsecache_policy(ET.fromstring(POLICY), report, strategy='memory')
+    assert config['cache_ttl'] == 600 and config['cache_control'] is True
+    assert config['response_code'] == SUCCESS_CACHEABLE_CODES
+    assert config['vary_headers'][:2] == ['x-tenant', 'accept'] and config['vary_query_params'] == []
+    assert config['memory'] == {'dictionary_name': 'kong_db_cache'}
+    settings = {item['setting']: item for item in report}
+    assert settings['CacheKey/KeyFragment']['value'] == 'client.ip'
+    assert 'CacheResource' in settings and 'ExpirySettings/TimeoutInSec' in settings
+    assert 'SkipCacheLookup' not in settings
+
+def test_skip_conditions_become_a_pre_function_guard():
+    policy = ET.fromstring('''<ResponseCache name="RC">
+  <SkipCacheLookup>request.header.bypass-cache = "true"</SkipCacheLookup>
+  <SkipCachePopulation>request.verb != "GET"</SkipCachePopulation>
+</ResponseCache>''')
+    report, companions = [], []
+    config = parse_responsecache_policy(policy, report, strategy='memory', companions=companions)
+    assert config['cache_control'] is True
+    assert companions == [{'name': 'pre-function', 'config': {'access': [
+        'if (tostring(kong.request.get_header("bypass-cache")) == "true") then '
+        'kong.service.request.set_header("Cache-Control", "no-cache") end\n'
+        'if (tostring(kong.request.get_method()) ~= "GET") then '
+        'kong.service.request.set_header("Cache-Control", "no-store") end']}}]
+    assert {item['setting'] for item in report} >= {'UseResponseCacheHeaders', 'SkipCachePopulation'}
+
+def test_query_params_expiry_date_and_redis():
+    policy = ET.fromstring('''<ResponseCache name="RC">
+  <CacheKey><KeyFragment ref="request.queryparam.page"/></CacheKey>
+  <CacheLookupTimeoutInSeconds>2</CacheLookupTimeoutInSeconds>
+  <ExpirySettings><ExpiryDate>01-02-2030</ExpiryDate></ExpirySettings>
+</ResponseCache>''')
+    report = []
+    config = parse_responsecache_policy(policy, report, strategy='redis')
+    # A fixed date is not turned into a TTL that depends on when the conversion ran
+    assert config['vary_query_params'] == ['page'] and config['cache_ttl'] == 300
+    assert config['strategy'] == 'redis' and config['redis'] == {'host': '127.0.0.1', 'port': 6379, 'timeout': 2000}
+    assert [item['setting'] for item in report] == ['ExpirySettings/ExpiryDate']
+    assert report[0]['reason'].startswith('NOT CONVERTED')
@@ -0,0 +1,39 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from apigee_policy2rate_limiting import parse_spikearrest_quota_policy
+from apigee_policy2rate_limiting_advanced import parse_quota_policy
+
+def test_spikearrest_rates_identifier_and_weight():
+    report = []
+    config = parse_spikearrest_quota_policy(ET.fromstring('''<SpikeArrest name="SA">
+  <Rate>100pm</Rate>
+  <Identifier ref="request.header.X-Client"/>
+  <MessageWeight ref="request.header.weight"/>
+</SpikeArrest>'''), report)
+    assert config == {'minute': 100, 'limit_by': 'header', 'header_name': 'X-Client', 'policy': 'local'}
+    assert [item['setting'] for item in report] == ['MessageWeight']
+    config = parse_spikearrest_quota_policy(ET.fromstring(
+        '<SpikeArrest><Rate>30ps</Rate><UseEffectiveCount>true</UseEffectiveCount></SpikeArrest>'), strategy='redis')
+    assert config['second'] == 30 and config['limit_by'] == 'service'
+    assert config['policy'] == 'redis' and config['redis']['port'] == 6379
+
+def test_distributed_quota_shares_counters():
+    policy = ET.fromstring('''<Quota name="Q" type="rollingwindow">
+  <Allow count="1000"/><Interval>2</Interval><TimeUnit>hour</TimeUnit>
+  <Identifier ref="client_id"/>
+  <Distributed>true</Distributed><Synchronous>false</Synchronous>
+</Quota>''')
+    config = parse_quota_policy(policy, strategy='cluster')
+    assert config['limit'] == [1000] and config['window_size'] == [7200] and config['window_type'] == 'sliding'
+    assert config['identifier'] == 'consumer' and config['strategy'] == 'cluster' and config['sync_rate'] == 10
+    policy.find('Synchronous').text = 'true'
+    assert parse_quota_policy(policy, strategy='cluster')['sync_rate'] == 0
+    policy.find('Distributed').text = 'false'
+    config = parse_quota_policy(policy, strategy='cluster')
+    assert config['strategy'] == 'local' and config['sync_rate'] == -1
+    # rate-limiting has one-unit windows only: 1000 per 2 hours becomes 500 per hour
+    report = []
+    config = parse_spikearrest_quota_policy(policy, report)
+    assert config['hour'] == 500 and config['policy'] == 'local' and report[0]['setting'] == 'Interval'
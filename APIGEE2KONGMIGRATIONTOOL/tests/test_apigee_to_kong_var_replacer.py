@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+import apigee_to_kong_var_replacer
+from apigee_to_kong_var_replacer import MANIFEST_NAME, apigee_to_kong_lua, build_variable_trie, process_directory, resolve_variable
+
+def test_pdk_targets_use_accessors():
+    assert apigee_to_kong_lua('local s = context.getVariable("response.status.code")') == 'local s = kong.response.get_status()'
+    assert apigee_to_kong_lua('context.setVariable("response.status.code", 404)') == 'kong.response.set_status(404)'
+    assert apigee_to_kong_lua('local b = context.getVariable("request.content")') == 'local b = kong.request.get_raw_body()'
+    assert apigee_to_kong_lua('context.setVariable("request.content", b)') == 'kong.service.request.set_raw_body(b)'
+    assert apigee_to_kong_lua('local ip = context.getVariable("client.ip")') == 'local ip = kong.client.get_ip()'
+
+def test_non_pdk_targets_read_and_write_shared_context():
+    for name in ('request.uri', 'apiproxy.name', 'response.content', 'target.url'):
+        assert apigee_to_kong_lua(f'x = context.getVariable("{name}")') == f'x = kong.ctx.shared["{name}"]'
+        assert apigee_to_kong_lua(f'context.setVariable("{name}", x)') == f'kong.ctx.shared["{name}"] = x'
+
+def test_strings_and_comments_are_skipped():
+    source = 'x = "context.getVariable(1)" -- request.content()\n--[[ print(x) ]] y = [[throw(e)]] .. \'print(z)\''
+    assert apigee_to_kong_lua(source) == source
+
+def test_comparison_is_not_an_assignment():
+    source = 'if response.content == nil then response.content = "a" end'
+    assert apigee_to_kong_lua(source) == 'if response.content == nil then kong.response.set_raw_body("a") end'
+    assert apigee_to_kong_lua('response.content = f(function() return 1 end) -- done\nlocal y = 1') == \
+        'kong.response.set_raw_body(f(function() return 1 end)) -- done\nlocal y = 1'
+
+def test_assignment_inside_unmatched_closer_is_kept():
+    for source in ('foo(response.content = x)', 'x = (response.content = 1)'):
+        assert apigee_to_kong_lua(source) == source
+
+def test_methods_of_other_objects_are_kept():
+    source = 'obj.print(x); mycontext.getVariable("a"); foo:throw(e); my_request.content()'
+    assert apigee_to_kong_lua(source) == source
+    assert apigee_to_kong_lua('print(x)') == 'kong.log.inspect(x)'
+
+def test_nested_arguments_are_balanced():
+    assert apigee_to_kong_lua('context.setVariable("my.var", f(a, {1, 2}, t["k"]))') == \
+        'kong.ctx.shared["my.var"] = f(a, {1, 2}, t["k"])'
+    assert apigee_to_kong_lua('context.setVariable("v", g("a,b"))') == 'kong.ctx.shared["v"] = g("a,b")'
+    assert apigee_to_kong_lua('local h = request.headers["X-" .. names[i]]') == \
+        'local h = kong.request.get_header("X-" .. names[i])'
+    assert apigee_to_kong_lua('context.setVariable("x", context.getVariable("request.header.Accept"))') == \
+        'kong.ctx.shared["x"] = kong.request.get_header("Accept")'
+    # Unclosed argument lists are left as written
+    assert apigee_to_kong_lua('context.getVariable("a", (') == 'context.getVariable("a", ('
+
+def test_trie_resolves_longest_prefix():
+    trie = build_variable_trie({'a': 'T0', 'a.b': 'T1', 'a.b.c.d': 'T2'})
+    assert resolve_variable(trie, 'a.b') == ('T1', '')
+    assert resolve_variable(trie, 'a.b.c') == ('T1', 'c')
+    assert resolve_variable(trie, 'a.b.c.d.e') == ('T2', 'e')
+    assert resolve_variable(trie, 'a.x') == ('T0', 'x')
+    assert resolve_variable(trie, 'z.q') == (None, 'z.q')
+
+def test_directory_mode_mirrors_tree_and_isolates_errors(tmp_path):
+    src = tmp_path / 'src'
+    (src / 'sub').mkdir(parents=True)
+    (src / 'a.lua').write_text('print(x)\n')
+    (src / 'sub' / 'b.lua').write_text('local s = context.getVariable("response.status.code")\n')
+    (src / 'sub' / 'b_kong.lua').write_text('print(old)\n')
+    (src / 'bad.lua').write_bytes(b'\xff\xfe print(x)')
+    (src / 'notes.txt').write_text('print(x)\n')
+    out = tmp_path / 'out'
+    summary = process_directory(str(src), str(out), workers=2)
+    assert summary['converted'] == 2 and summary['unchanged'] == 0
+    assert [rel for rel, _ in summary['failed']] == ['bad.lua']
+    assert (out / 'a.lua').read_text() == 'kong.log.inspect(x)\n'
+    assert (out / 'sub' / 'b.lua').read_text() == 'local s = kong.response.get_status()\n'
+    assert not (out / 'sub' / 'b_kong.lua').exists() and not (out / 'notes.txt').exists()
+    summary = process_directory(str(src), str(out), workers=1)
+    assert summary['converted'] == 0 and summary['unchanged'] == 2 and len(summary['failed']) == 1
+
+def test_directory_manifest_records_converted_and_failed_files(tmp_path, monkeypatch):
+    src, out = tmp_path / 'src', tmp_path / 'out'
+    src.mkdir()
+    (src / 'ok.lua').write_text('print(x)\n')
+    (src / 'boom.lua').write_text('print(boom)\n')
+    (src / 'binary.lua').write_bytes(b'\xff\xfe')
+    rewrite = apigee_to_kong_var_replacer.apigee_to_kong_lua
+    def failing(code, trie=None):
+        if 'boom' in code:
+            raise TypeError('rewrite failed')
+        return rewrite(code, trie)
+    monkeypatch.setattr(apigee_to_kong_var_replacer, 'apigee_to_kong_lua', failing)
+    summary = process_directory(str(src), str(out), workers=1)
+    assert summary['converted'] == 1
+    assert [rel for rel, _ in summary['failed']] == ['binary.lua', 'boom.lua']
+    manifest = json.loads((out / MANIFEST_NAME).read_text())
+    assert sorted(manifest['files']) == ['ok.lua']
+    assert manifest['failed']['boom.lua'] == 'TypeError: rewrite failed'
+    assert manifest['failed']['binary.lua'].startswith('UnicodeDecodeError')
+    # A second run skips the converted file, retries the failed ones and leaves the output as it was
+    first = (out / 'ok.lua').read_text()
+    summary = process_directory(str(src), str(out), workers=1)
+    assert summary['converted'] == 0 and summary['unchanged'] == 1 and len(summary['failed']) == 2
+    assert (out / 'ok.lua').read_text() == first
+    assert json.loads((out / MANIFEST_NAME).read_text()) == manifest
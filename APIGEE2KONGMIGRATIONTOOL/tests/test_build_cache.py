@@ -0,0 +1,51 @@
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import build_cache
+
+def test_entry_reused_until_input_or_output_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    policy = tmp_path / 'Spike-1.xml'
+    policy.write_text('<SpikeArrest name="Spike-1"><Rate>10ps</Rate></SpikeArrest>')
+    output = tmp_path / 'Spike-1.yaml'
+    output.write_text('plugin: {}\n')
+    key = build_cache.make_key('policy', build_cache.file_sha256(str(policy)))
+    build_cache.record('policy', str(output), key, [str(output)], {'converted': True})
+    assert build_cache.lookup('policy', str(output), key)['value'] == {'converted': True}
+    policy.write_text('<SpikeArrest name="Spike-1"><Rate>20ps</Rate></SpikeArrest>')
+    changed_key = build_cache.make_key('policy', build_cache.file_sha256(str(policy)))
+    assert build_cache.lookup('policy', str(output), changed_key) is None
+    output.write_text('plugin: {edited: true}\n')
+    assert build_cache.lookup('policy', str(output), key) is None
+
+def test_default_cache_dirs_are_outside_the_source_tree(tmp_path, monkeypatch):
+    import template_registry
+    monkeypatch.delenv('OTHER__BUILD_CACHE_DIR', raising=False)
+    monkeypatch.delenv('OTHER__TEMPLATE_CACHE_DIR', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert build_cache.get_cache_dir() == str(tmp_path / 'apigee2kong' / 'build')
+    assert template_registry.get_bytecode_cache_dir() == str(tmp_path / 'apigee2kong' / 'templates')
+    monkeypatch.setenv('OTHER__TEMPLATE_CACHE_DIR', 'off')
+    assert template_registry.get_bytecode_cache_dir() is None
+
+def test_unzip_reextracts_edited_or_deleted_files(tmp_path, monkeypatch, capsys):
+    import zipfile
+    from unzip_apigee_zipfiles import unzip_all_zip_files
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    inputs, unzipped = tmp_path / 'inputs', tmp_path / 'unzipped'
+    inputs.mkdir()
+    with zipfile.ZipFile(str(inputs / 'orders.zip'), 'w') as z:
+        z.writestr('apiproxy/orders.xml', '<APIProxy name="orders"/>')
+        z.writestr('apiproxy/policies/Q.xml', '<Quota name="Q"/>')
+    unzip_all_zip_files(str(inputs), str(unzipped))
+    proxy = unzipped / 'orders' / 'apiproxy' / 'orders.xml'
+    policy = unzipped / 'orders' / 'apiproxy' / 'policies' / 'Q.xml'
+    (unzipped / 'orders' / 'apigee_bundle.json').write_text('{}')
+    proxy.write_text('edited')
+    policy.unlink()
+    unzip_all_zip_files(str(inputs), str(unzipped))
+    assert proxy.read_text() == '<APIProxy name="orders"/>' and policy.exists()
+    # Intact tree: reused, files the pipeline wrote next to it do not count
+    unzip_all_zip_files(str(inputs), str(unzipped))
+    assert 'Unchanged orders.zip' in capsys.readouterr().out
@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import pickle
+import xml.etree.ElementTree as ET
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import bundle_json_sidecar
+from bundle_json_sidecar import load_bundle_json, read_sidecar, sidecar_path, write_sidecar
+from apigee_bundle_xml2json import write_json
+from xml_node import node_from_element
+
+XML = '<Quota name="Q-1"><Allow count="10"/><Interval>1</Interval><Distributed/></Quota>'
+
+def _bundle_json():
+    return {'policies/Q-1.xml': node_from_element(ET.fromstring(XML))}
+
+def test_write_json_writes_sidecar_that_loader_prefers(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUNDLE_SIDECAR', 'true')
+    write_json(str(tmp_path), _bundle_json())
+    json_path = str(tmp_path / 'apigee_bundle.json')
+    assert os.path.exists(sidecar_path(json_path))
+    header, _ = read_sidecar(json_path)
+    assert header['version'] == bundle_json_sidecar.SIDECAR_VERSION
+
+    loaded = load_bundle_json(json_path)
+    assert loaded['policies/Q-1.xml'] == json.load(open(json_path))['policies/Q-1.xml']
+    # Served from the sidecar: no JSON decode
+    monkeypatch.setattr(bundle_json_sidecar.json, 'load', lambda *a, **k: (_ for _ in ()).throw(AssertionError('decoded JSON')))
+    load_bundle_json(json_path)
+
+def test_stale_sidecar_is_ignored_and_refreshed(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUNDLE_SIDECAR', 'true')
+    write_json(str(tmp_path), _bundle_json())
+    json_path = str(tmp_path / 'apigee_bundle.json')
+    with open(json_path, 'w') as f:
+        json.dump({'edited.xml': {'error': 'changed'}}, f)
+    assert load_bundle_json(json_path) == {'edited.xml': {'error': 'changed'}}
+    header, cached = read_sidecar(json_path)
+    assert cached == {'edited.xml': {'error': 'changed'}}
+
+def test_pickle_sidecar_round_trips_xml_nodes(tmp_path):
+    json_path = str(tmp_path / 'apigee_bundle.json')
+    bundle_json = _bundle_json()
+    with open(json_path, 'w') as f:
+        f.write('{}')
+    write_sidecar(json_path, bundle_json, fmt='pickle')
+    header, cached = read_sidecar(json_path, fmt='pickle')
+    assert header['format'] == 'pickle' and cached == bundle_json
+    assert pickle.loads(pickle.dumps(bundle_json['policies/Q-1.xml'])).children[2].attrib == {}
+
+def test_json_fallback_returns_xml_nodes_like_the_sidecar(tmp_path, monkeypatch):
+    from xml_node import XmlNode
+    monkeypatch.setenv('OTHER__BUNDLE_SIDECAR', 'false')
+    write_json(str(tmp_path), _bundle_json())
+    loaded = load_bundle_json(str(tmp_path / 'apigee_bundle.json'))
+    node = loaded['policies/Q-1.xml']
+    assert isinstance(node, XmlNode) and isinstance(node.children[0], XmlNode)
+    assert node == _bundle_json()['policies/Q-1.xml']
+
+def test_stale_pickle_is_never_unpickled(tmp_path, monkeypatch):
+    json_path = str(tmp_path / 'apigee_bundle.json')
+    with open(json_path, 'w') as f:
+        f.write('{}')
+    write_sidecar(json_path, _bundle_json(), fmt='pickle')
+    with open(json_path, 'w') as f:
+        f.write('{"other": 1}')
+    monkeypatch.setattr(bundle_json_sidecar.pickle, 'load', lambda *a, **k: (_ for _ in ()).throw(AssertionError('unpickled')))
+    assert read_sidecar(json_path, fmt='pickle') is None
+    assert sorted(os.listdir(str(tmp_path))) == ['apigee_bundle.json', 'apigee_bundle.pickle']
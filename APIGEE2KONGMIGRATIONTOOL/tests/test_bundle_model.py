@@ -0,0 +1,54 @@
+
+import os
+import sys
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from bundle_model import BundleModel, as_bundle_model
+from bundle_fs import as_bundle_fs
+from apigee_policy2cors import parse_cors_policy
+
+FILES = {
+    'apiproxy/apiproxy.xml': '<APIProxy name="orders"><Name>orders</Name></APIProxy>',
+    'apiproxy/proxies/default.xml': '''<ProxyEndpoint name="default">
+  <PreFlow><Request><Step><Name>CORS-1</Name></Step></Request></PreFlow>
+  <Flows><Flow name="list"><Condition>request.verb == "GET"</Condition>
+    <Response><Step><Name>Quota-1</Name><Condition>response.status.code == 200</Condition></Step></Response></Flow></Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>''',
+    'apiproxy/policies/CORS-1.xml': '<CORS name="CORS-1"><AllowedOrigins><Origin>https://shop.example.com</Origin></AllowedOrigins></CORS>',
+    'apiproxy/policies/Quota-1.xml': '<Quota name="Quota-1"><Allow count="10"/></Quota>',
+    'apiproxy/policies/Broken.xml': '<Quota name="Broken">',
+}
+
+def write_bundle(root):
+    for rel, content in FILES.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+    return root
+
+def test_bundle_model_indexes_policies_endpoints_and_steps(tmp_path):
+    model = BundleModel(write_bundle(str(tmp_path / 'orders')))
+    assert model.api_name == 'orders'
+    assert list(model.policies) == ['CORS-1', 'Quota-1']
+    assert model.policies_by_tag == {'CORS': ['CORS-1'], 'Quota': ['Quota-1']}
+    assert list(model.proxy_endpoints) == ['default']
+    assert [f['kind'] for f in model.flows['default']] == ['preflow', 'flow']
+    assert model.steps['Quota-1'][0]['phase'] == 'response'
+    assert model.steps['Quota-1'][0]['condition'] == 'response.status.code == 200'
+    assert list(model.errors) == ['apiproxy/policies/Broken.xml']
+    assert model.step_order() == {'CORS-1': 0, 'Quota-1': 1}
+    # Converters take the already parsed element
+    assert parse_cors_policy(model.policy('CORS-1'))['origins'] == ['https://shop.example.com']
+
+def test_model_is_shared_per_bundle_fs(tmp_path):
+    fs = as_bundle_fs(write_bundle(str(tmp_path / 'orders')))
+    assert as_bundle_model(fs) is as_bundle_model(fs)
+
+def test_duplicate_policy_names_are_rejected(tmp_path):
+    root = write_bundle(str(tmp_path / 'orders'))
+    with open(os.path.join(root, 'apiproxy/policies/CORS-copy.xml'), 'w') as f:
+        f.write('<CORS name="CORS-1"><AllowedOrigins><Origin>*</Origin></AllowedOrigins></CORS>')
+    with pytest.raises(ValueError, match="Duplicate policy name 'CORS-1'"):
+        BundleModel(root)
@@ -0,0 +1,78 @@
+
+import os
+import sys
+import yaml
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from bundle_policy_converter import convert_bundle_policies, resolve_plugin
+
+FILES = {
+    'apiproxy/proxies/default.xml': '''<ProxyEndpoint name="default">
+  <PreFlow><Request><Step><Name>CORS-1</Name></Step></Request>
+    <Response><Step><Name>AM-SetHeader</Name></Step></Response></PreFlow>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>''',
+    'apiproxy/policies/CORS-1.xml': '<CORS name="CORS-1"><AllowedOrigins><Origin>https://shop.example.com</Origin></AllowedOrigins></CORS>',
+    'apiproxy/policies/AM-SetHeader.xml': '<AssignMessage name="AM-SetHeader"><Set><Headers><Header name="x-a">1</Header></Headers></Set></AssignMessage>',
+    'apiproxy/policies/KVM-1.xml': '<KeyValueMapOperations name="KVM-1"/>',
+}
+
+def test_resolve_plugin_prefers_flow_side():
+    assert resolve_plugin('CORS') == 'cors'
+    assert resolve_plugin('AssignMessage', ['request']) == 'request-transformer'
+    assert resolve_plugin('AssignMessage', ['response']) == 'response-transformer'
+    assert resolve_plugin('MessageValidation') == 'request-validator'
+    assert resolve_plugin('KeyValueMapOperations') is None
+
+def test_convert_bundle_policies_single_output(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    bundle = tmp_path / 'orders'
+    for rel, content in FILES.items():
+        path = bundle / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    output_path = str(tmp_path / 'kong_plugins.yaml')
+    for _ in range(2):  # second pass is served from the build cache
+        result = convert_bundle_policies(str(bundle), 'orders-svc', output_path)
+        by_policy = {p['tags'][-1]: p for p in result['plugins']}
+        assert set(by_policy) == {'apigee-policy:CORS-1', 'apigee-policy:AM-SetHeader'}
+        assert by_policy['apigee-policy:CORS-1']['name'] == 'cors'
+        assert by_policy['apigee-policy:CORS-1']['config']['origins'] == ['https://shop.example.com']
+        assert by_policy['apigee-policy:AM-SetHeader']['name'] == 'response-transformer'
+        assert by_policy['apigee-policy:CORS-1']['service'] == 'orders-svc'
+        assert result['unconverted'] == [{'policy': 'KVM-1', 'tag': 'KeyValueMapOperations', 'reason': 'no converter for KeyValueMapOperations'}]
+    with open(output_path) as f:
+        assert len(yaml.safe_load(f)['plugins']) == 2
+
+def test_failed_conversions_are_not_cached(tmp_path, monkeypatch):
+    import bundle_policy_converter
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    bundle = tmp_path / 'orders'
+    for rel in ('apiproxy/proxies/default.xml', 'apiproxy/policies/CORS-1.xml'):
+        path = bundle / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(FILES[rel])
+    original = bundle_policy_converter.convert_policy
+    def failing(*args, **kwargs):
+        raise RuntimeError('converter bug')
+    monkeypatch.setattr(bundle_policy_converter, 'convert_policy', failing)
+    result = convert_bundle_policies(str(bundle), 'orders-svc')
+    assert result['unconverted'][0]['reason'] == 'RuntimeError: converter bug'
+    monkeypatch.setattr(bundle_policy_converter, 'convert_policy', original)
+    result = convert_bundle_policies(str(bundle), 'orders-svc')
+    assert [p['name'] for p in result['plugins']] == ['cors'] and result['unconverted'] == []
+
+def test_response_cache_skip_condition_adds_a_guard_plugin(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    bundle = tmp_path / 'orders'
+    files = {'apiproxy/proxies/default.xml': FILES['apiproxy/proxies/default.xml'].replace('CORS-1', 'RC-1'),
+             'apiproxy/policies/RC-1.xml': '''<ResponseCache name="RC-1"><ExpirySettings><TimeoutInSec>60</TimeoutInSec>
+  </ExpirySettings><SkipCacheLookup>request.header.x-nocache = "true"</SkipCacheLookup></ResponseCache>'''}
+    for rel, content in files.items():
+        path = bundle / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    result = convert_bundle_policies(str(bundle), 'orders-svc')
+    cache, guard = result['plugins']
+    assert cache['name'] == 'proxy-cache-advanced' and cache['config']['cache_control'] is True
+    assert guard['name'] == 'pre-function' and guard['tags'][-1] == 'apigee-policy:RC-1'
+    assert 'no-cache' in guard['config']['access'][0] and guard['service'] == 'orders-svc'
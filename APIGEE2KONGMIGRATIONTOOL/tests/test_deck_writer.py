@@ -0,0 +1,42 @@
+
+import os
+import sys
+import yaml
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from deck_writer import DeckWriter, merge_deck_files, route_entity
+
+def test_streamed_sections_form_one_deck_file(tmp_path):
+    path = str(tmp_path / 'orders' / 'kong.yaml')
+    with DeckWriter(path) as writer:
+        writer.add_plugin({'name': 'cors', 'service': 'orders', 'config': {'origins': ['*']}})
+        writer.add_service({'name': 'orders', 'host': 'orders.internal', 'port': 8443})
+        writer.add_route(route_entity({'name': 'default', 'paths': ['/orders'], 'methods': [], 'strip_path': False}, 'orders'))
+    assert os.listdir(tmp_path / 'orders') == ['kong.yaml']
+    with open(path) as f:
+        text = f.read()
+    assert text.startswith('_format_version: "3.0"\n')
+    config = yaml.safe_load(text)
+    assert [s['name'] for s in config['services']] == ['orders']
+    assert config['routes'][0] == {'name': 'default', 'service': {'name': 'orders'}, 'paths': ['/orders'], 'strip_path': False, 'preserve_host': False}
+    assert config['plugins'][0]['config'] == {'origins': ['*']}
+
+def test_merge_and_abort(tmp_path):
+    paths = []
+    for name in ('a', 'b'):
+        path = str(tmp_path / name / 'kong.yaml')
+        with DeckWriter(path) as writer:
+            writer.add_service({'name': name, 'host': f'{name}.internal'})
+        paths.append(path)
+    counts = merge_deck_files(paths, str(tmp_path / 'workspace.yaml'), workspace='migrated')
+    assert counts['services'] == 2
+    with open(tmp_path / 'workspace.yaml') as f:
+        merged = yaml.safe_load(f)
+    assert merged['_workspace'] == 'migrated' and [s['name'] for s in merged['services']] == ['a', 'b']
+    try:
+        with DeckWriter(str(tmp_path / 'broken.yaml')) as writer:
+            writer.add_service({'name': 'x'})
+            raise RuntimeError('conversion failed')
+    except RuntimeError:
+        pass
+    assert not os.path.exists(tmp_path / 'broken.yaml')
+    assert not [f for f in os.listdir(tmp_path) if f.startswith('.deck-')]
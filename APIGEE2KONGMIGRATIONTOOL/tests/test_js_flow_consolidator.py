@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from js_flow_consolidator import consolidate_js_flows
+from bundle_policy_converter import convert_bundle_policies
+
+FILES = {
+    'apiproxy/apiproxy.xml': '<APIProxy name="orders"><Name>orders</Name></APIProxy>',
+    'apiproxy/proxies/default.xml': '''<ProxyEndpoint name="default">
+  <PreFlow>
+    <Request><Step><Name>JS-A</Name></Step><Step><Name>JS-B</Name><Condition>request.header.x-debug = "1"</Condition></Step>
+      <Step><Name>Quota-1</Name></Step></Request>
+    <Response><Step><Name>JS-D</Name></Step></Response>
+  </PreFlow>
+  <Flows><Flow name="list"><Condition>proxy.pathsuffix MatchesPath "/items" and request.verb = "GET"</Condition>
+    <Request><Step><Name>JS-C</Name></Step></Request></Flow></Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>''',
+    'apiproxy/policies/JS-A.xml': '<Javascript name="JS-A"><ResourceURL>jsc://a.js</ResourceURL></Javascript>',
+    'apiproxy/policies/JS-B.xml': '<Javascript name="JS-B"><ResourceURL>jsc://b.js</ResourceURL></Javascript>',
+    'apiproxy/policies/JS-C.xml': '<Javascript name="JS-C"><ResourceURL>jsc://c.js</ResourceURL></Javascript>',
+    'apiproxy/policies/JS-D.xml': '<Javascript name="JS-D"><ResourceURL>jsc://d.js</ResourceURL></Javascript>',
+    'apiproxy/policies/Quota-1.xml': '<Quota name="Quota-1"><Allow count="10"/></Quota>',
+    'apiproxy/resources/jsc/a_kong.lua': 'kong.service.request.set_header("x-a", "1")\n',
+    'apiproxy/resources/jsc/b.lua': 'kong.log.inspect("b")\n',
+    'apiproxy/resources/jsc/d_kong.lua': 'kong.response.set_raw_body("done")\n',
+}
+
+def write_bundle(root):
+    for rel, content in FILES.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+    return root
+
+def test_consecutive_js_steps_share_one_chunk_per_phase(tmp_path):
+    result = consolidate_js_flows(write_bundle(str(tmp_path / 'orders')), 'orders')
+    pre, post = result['plugins']
+    assert pre['name'] == 'pre-function' and list(pre['config']) == ['access']
+    chunk, = pre['config']['access']
+    assert chunk.index('set_header("x-a", "1")') < chunk.index('kong.log.inspect("b")')
+    assert 'if (tostring(kong.request.get_header("x-debug")) == "1") then step() end' in chunk
+    assert post['name'] == 'post-function' and sorted(post['config']) == ['access', 'body_filter']
+    flow_chunk, = post['config']['access']
+    assert 'then flow = "list"' in flow_chunk and 'if flow == "list" then step() end' in flow_chunk
+    assert result['policies'] == ['JS-A', 'JS-B', 'JS-C', 'JS-D']
+    assert result['unconverted'] == [{'policy': 'JS-C', 'tag': 'Javascript', 'reason': 'no converted Lua script'}]
+
+def test_batch_converter_uses_consolidated_plugins(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    result = convert_bundle_policies(write_bundle(str(tmp_path / 'orders')), 'orders')
+    names = [p['name'] for p in result['plugins']]
+    assert names.count('pre-function') == 1 and names.count('post-function') == 1
+    assert [item['policy'] for item in result['unconverted']] == ['JS-C']
@@ -0,0 +1,102 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from kong_config_validator import validate_deck_file
+from apigee_policy2rate_limiting_advanced import parse_quota_policy
+from deck_writer import DeckWriter
+
+DECK = '''_format_version: "3.0"
+services:
+- name: orders
+  host: orders.internal
+  tags: [apigee-migrated]
+  routes:
+  - name: orders.list
+    paths: [/orders]
+    tags: [apigee-migrated]
+    plugins:
+    - name: cors
+      config: {origins: ["*"], methods: [GET, FETCH]}
+      tags: [apigee-migrated]
+- name: orders
+  host: other.internal
+  tags: [apigee-migrated]
+routes:
+- name: payments
+  service: {name: payments}
+  paths: [/payments]
+plugins:
+- name: rate-limiting
+  service: orders
+  config: &limits {minute: 10, limit_by: header}
+  tags: [apigee-migrated]
+- name: rate-limiting
+  service: orders
+  config: *limits
+  tags: [apigee-migrated]
+'''
+
+def test_findings_in_one_pass(tmp_path):
+    path = tmp_path / 'kong.yaml'
+    path.write_text(DECK)
+    result = validate_deck_file(str(path), required_tag='apigee-migrated')
+    assert result['summary']['entities'] == {'services': 2, 'routes': 2, 'plugins': 3}
+    found = {(f['check'], f['entity'], f['field'], f['line']) for f in result['findings']}
+    assert ('schema', 'cors', 'config.methods[1]', 11) in found
+    assert ('unique-name', 'orders', None, 14) in found
+    assert ('reference', 'payments', 'service', 18) in found
+    assert ('tags', 'payments', 'tags', 18) in found
+    assert ('schema', 'rate-limiting', 'config.header_name', 22) in found
+    assert ('unique-name', 'rate-limiting', None, 26) in found
+    assert result['summary']['warnings'] == 1 and result['summary']['errors'] == 6
+
+def test_converted_plugins_pass(tmp_path):
+    quota = ET.fromstring('<Quota name="Q"><Allow count="5"/><Distributed>true</Distributed></Quota>')
+    path = str(tmp_path / 'kong.yaml')
+    with DeckWriter(path) as writer:
+        writer.add_service({'name': 'orders', 'host': 'orders.internal', 'tags': ['apigee-migrated']})
+        writer.add_plugin({'name': 'rate-limiting-advanced', 'service': 'orders', 'tags': ['apigee-migrated'],
+                           'config': parse_quota_policy(quota, strategy='redis')})
+    result = validate_deck_file(path)
+    assert result['findings'] == []
+
+def test_ordering_cycle_and_dangling_reference(tmp_path):
+    path = tmp_path / 'kong.yaml'
+    path.write_text('''_format_version: "3.0"
+plugins:
+- name: acl
+  config: {allow: [a]}
+  ordering: {before: {access: [cors]}}
+- name: cors
+  ordering: {before: {access: [acl, jwt]}}
+''')
+    result = validate_deck_file(str(path))
+    ordering = [(f['severity'], f['entity']) for f in result['findings'] if f['check'] == 'ordering']
+    assert ('warning', 'cors') in ordering
+    assert sum(1 for severity, _ in ordering if severity == 'error') == 1
+
+def test_ordering_is_checked_per_scope(tmp_path):
+    path = tmp_path / 'kong.yaml'
+    path.write_text('''_format_version: "3.0"
+plugins:
+- name: acl
+  service: a
+  config: {allow: [x]}
+  ordering: {before: {access: [cors]}}
+- name: cors
+  service: a
+- name: cors
+  service: b
+  ordering: {before: {access: [acl]}}
+- name: acl
+  service: b
+  config: {allow: [x]}
+- name: cors
+  service: c
+  ordering: {before: {access: [acl]}}
+- name: acl
+  config: {allow: [x]}
+''')
+    result = validate_deck_file(str(path))
+    assert [f for f in result['findings'] if f['check'] == 'ordering'] == []
@@ -0,0 +1,134 @@
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import parallel_bundle_executor
+
+APIPROXY_XML = '<APIProxy name="orders"><Name>orders</Name></APIProxy>'
+PROXY_XML = '''<ProxyEndpoint name="default">
+  <PreFlow><Request><Step><Name>CORS-1</Name></Step></Request></PreFlow>
+  <Flows><Flow name="list"><Condition>(proxy.pathsuffix MatchesPath "/items") and (request.verb == "GET")</Condition></Flow></Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>'''
+BROKEN_PROXY_XML = '<ProxyEndpoint name="default"><HTTPProxyConnection/></ProxyEndpoint>'
+TARGET_XML = '<TargetEndpoint name="default"><HTTPTargetConnection><URL>https://orders.internal:8443/v1</URL></HTTPTargetConnection></TargetEndpoint>'
+CORS_XML = '<CORS name="CORS-1"><AllowedOrigins><Origin>https://shop.example.com</Origin></AllowedOrigins></CORS>'
+
+def write_bundle(root, name, proxy_xml):
+    files = {
+        'apiproxy/apiproxy.xml': APIPROXY_XML,
+        'apiproxy/proxies/default.xml': proxy_xml,
+        'apiproxy/targets/default.xml': TARGET_XML,
+        'apiproxy/policies/CORS-1.xml': CORS_XML,
+    }
+    for rel, content in files.items():
+        path = os.path.join(root, name, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+    return os.path.join(root, name)
+
+def test_parallel_run_isolates_failures(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('OTHER__TEMPLATE_CACHE_DIR', str(tmp_path / 'templates_cache'))
+    unzipped = tmp_path / 'apigeeapiunzipped'
+    good = write_bundle(str(unzipped), 'orders', PROXY_XML)
+    bad = write_bundle(str(unzipped), 'broken', BROKEN_PROXY_XML)
+    output_dir = str(tmp_path / 'outputs')
+    results = parallel_bundle_executor.run_bundles_parallel([good, bad], output_dir, max_workers=2)
+    summary = parallel_bundle_executor.summarize_results(results)
+    assert summary['total'] == 2 and summary['succeeded'] == 1 and summary['failed'] == 1
+    assert summary['failures'][0]['bundle'] == 'broken'
+    assert summary['failures'][0]['stage'] == 'deck'
+    assert os.path.exists(os.path.join(good, 'apigee_bundle.json'))
+    # Services, routes and plugins only go to kong.yaml
+    assert os.listdir(os.path.join(output_dir, 'orders')) == ['kong.yaml']
+    # Base path route plus one route for the conditional 'list' flow, whose upstream path a route
+    # request-transformer rewrites on the default traditional_compatible router
+    assert results[0]['details']['deck'] == {'services': 1, 'routes': 2, 'plugins': 2,
+                                             'plugins_per_request': {'before': 1, 'after': 1}}
+
+def test_bundle_streamed_from_zip(tmp_path, monkeypatch):
+    import zipfile
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('OTHER__TEMPLATE_CACHE_DIR', str(tmp_path / 'templates_cache'))
+    bundle_dir = write_bundle(str(tmp_path / 'src'), 'orders', PROXY_XML)
+    zip_path = str(tmp_path / 'orders.zip')
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for dirpath, _, filenames in os.walk(bundle_dir):
+            for f in filenames:
+                path = os.path.join(dirpath, f)
+                zf.write(path, os.path.join('orders', os.path.relpath(path, bundle_dir)))
+    output_dir = str(tmp_path / 'outputs')
+    result = parallel_bundle_executor.process_bundle(zip_path, output_dir)
+    assert result['status'] == 'ok', result['error']
+    assert result['bundle'] == 'orders'
+    assert result['details']['deck']['plugins'] == 2
+    assert os.path.exists(os.path.join(output_dir, 'orders', 'apigee_bundle.json'))
+    assert os.path.exists(os.path.join(output_dir, 'orders', 'kong.yaml'))
+
+def test_xml2json_cache_hit_still_writes_new_destination(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    bundle_dir = write_bundle(str(tmp_path / 'src'), 'orders', PROXY_XML)
+    first, second = str(tmp_path / 'json1'), str(tmp_path / 'json2')
+    os.makedirs(first)
+    os.makedirs(second)
+    parallel_bundle_executor.run_xml2json_step(bundle_dir, json_dir=first)
+    parallel_bundle_executor.run_xml2json_step(bundle_dir, json_dir=second)
+    assert os.path.exists(os.path.join(first, 'apigee_bundle.json'))
+    assert os.path.exists(os.path.join(second, 'apigee_bundle.json'))
+
+def test_deck_names_are_namespaced_by_api(tmp_path, monkeypatch):
+    import yaml
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('OTHER__ROUTER_FLAVOR', 'traditional_compatible')
+    bundle_dir = write_bundle(str(tmp_path / 'src'), 'orders', PROXY_XML)
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    parallel_bundle_executor.run_deck_step(bundle_dir, output_dir, 'orders')
+    with open(os.path.join(output_dir, 'kong.yaml')) as f:
+        config = yaml.safe_load(f)
+    assert [s['name'] for s in config['services']] == ['orders.default']
+    assert [r['name'] for r in config['routes']] == ['orders.default', 'orders.default.list']
+    assert {r['service']['name'] for r in config['routes']} == {'orders.default'}
+    assert [(p['name'], p.get('service'), p.get('route')) for p in config['plugins']] == [
+        ('cors', 'orders.default', None), ('request-transformer', None, 'orders.default.list')]
+    assert config['plugins'][1]['config']['replace']['uri'] == '/v1$(uri_captures.pathsuffix)'
+
+
+def test_route_rules_and_flows_pick_the_plugin_scope(tmp_path, monkeypatch):
+    import yaml
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('OTHER__ROUTER_FLAVOR', 'traditional')
+    proxy_xml = '''<ProxyEndpoint name="default">
+  <PreFlow><Request><Step><Name>CORS-1</Name></Step></Request></PreFlow>
+  <Flows>
+    <Flow name="customers"><Condition>(proxy.pathsuffix MatchesPath "/customers/**")</Condition>
+      <Request><Step><Name>RF-error</Name></Step></Request></Flow>
+    <Flow name="debug"><Condition>(request.queryparam.debug = "true")</Condition>
+      <Request><Step><Name>RF-debug</Name></Step></Request></Flow>
+  </Flows>
+  <HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection>
+  <RouteRule name="beta"><TargetEndpoint>default</TargetEndpoint><Condition>request.header.beta = "1"</Condition></RouteRule>
+  <RouteRule name="main"><TargetEndpoint>legacy</TargetEndpoint></RouteRule>
+</ProxyEndpoint>'''
+    bundle_dir = write_bundle(str(tmp_path / 'src'), 'orders', proxy_xml)
+    files = {
+        'apiproxy/targets/legacy.xml': TARGET_XML.replace('"default"', '"legacy"').replace('orders.internal', 'legacy.internal'),
+        'apiproxy/policies/RF-error.xml': '<RaiseFault name="RF-error"/>',
+        'apiproxy/policies/RF-debug.xml': '<RaiseFault name="RF-debug"/>',
+    }
+    for rel, content in files.items():
+        with open(os.path.join(bundle_dir, rel), 'w') as f:
+            f.write(content)
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    counts = parallel_bundle_executor.run_deck_step(bundle_dir, output_dir, 'orders')
+    with open(os.path.join(output_dir, 'kong.yaml')) as f:
+        config = yaml.safe_load(f)
+    # The unconditional RouteRule picks the service, even though another target comes first
+    assert {r['service']['name'] for r in config['routes']} == {'orders.legacy'}
+    assert [(p['name'], p.get('service'), p.get('route')) for p in config['plugins']] == [
+        ('cors', 'orders.legacy', None), ('request-termination', None, 'orders.default.customers')]
+    # A flow with no route of its own cannot run its steps in Kong
+    assert counts['unattached'] == [{'policy': 'RF-debug', 'reason': "flow 'debug' of default has no route of its own"}]
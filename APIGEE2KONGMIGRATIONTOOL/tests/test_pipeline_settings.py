@@ -0,0 +1,18 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from pipeline_settings import get_flag, get_setting, note, other_config
+
+def test_environment_overrides_config(monkeypatch):
+    assert get_setting('max_threads') == other_config()['max_threads']
+    monkeypatch.setenv('OTHER__MAX_THREADS', '2')
+    assert get_setting('max_threads') == '2'
+    monkeypatch.setenv('OTHER__PLUGIN_ORDERING', 'off')
+    assert get_flag('plugin_ordering') is False
+    assert get_setting('no_such_setting', 'fallback') == 'fallback'
+
+def test_note_only_records_with_a_report():
+    report = []
+    note(report, 'Rate', '10pz', 'unrecognised rate')
+    note(None, 'Rate', '10pz', 'ignored')
+    assert report == [{'setting': 'Rate', 'value': '10pz', 'reason': 'unrecognised rate'}]
@@ -0,0 +1,66 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from plugin_optimizer import compose_transforms, optimize_plugins
+from duplicate_plugin_handler import merge_plugin_configs
+
+def _transformer(policy, **actions):
+    return {'name': 'request-transformer', 'service': 'svc', 'enabled': True, 'protocols': ['http', 'https'],
+            'config': {action: {'headers': actions.get(action, [])} for action in ('remove', 'replace', 'add', 'append')},
+            'tags': ['apigee-migrated', f"apigee-policy:{policy}"]}
+
+def test_stacked_assignmessages_merge_in_step_order():
+    first = _transformer('AM-1', replace=['x-a:1'], add=['x-a:1', 'x-b:1'], append=['x-c:1'])
+    second = _transformer('AM-2', remove=['x-d'], replace=['x-a:2'], add=['x-a:2'], append=['x-c:2'])
+    noop = _transformer('AM-3')
+    cors = {'name': 'cors', 'service': 'svc', 'config': {'origins': ['*']}}
+    config = {'routes': [{'name': 'r1', 'service': {'name': 'svc'}}], 'plugins': [first, cors, second, noop]}
+    optimized, stats = optimize_plugins(config)
+    assert [p['name'] for p in optimized['plugins']] == ['request-transformer', 'cors']
+    merged = optimized['plugins'][0]
+    assert merged['config']['remove']['headers'] == ['x-d']
+    assert merged['config']['replace']['headers'] == ['x-a:2'] and merged['config']['add']['headers'] == ['x-a:2', 'x-b:1']
+    assert merged['config']['append']['headers'] == ['x-c:1', 'x-c:2']
+    assert merged['tags'] == ['apigee-migrated', 'apigee-policy:AM-1', 'apigee-policy:AM-2']
+    assert stats['merged'] == 1 and stats['dropped'] == 1
+    assert stats['plugins'] == {'before': 4, 'after': 2}
+    assert stats['per_request']['before']['max'] == 2 and stats['per_request']['after']['max'] == 2
+
+def test_merge_follows_step_order_not_policy_file_order():
+    # Policy files sort A-Set before Z-Set, but the flow runs Z-Set first
+    a_set = _transformer('A-Set', replace=['x:second'], add=['x:second'])
+    z_set = _transformer('Z-Set', replace=['x:first'], add=['x:first'])
+    optimized, _ = optimize_plugins({'plugins': [a_set, z_set]}, step_order={'Z-Set': 0, 'A-Set': 1})
+    assert optimized['plugins'][0]['config']['replace']['headers'] == ['x:second']
+
+def test_same_name_in_different_operations_does_not_compose():
+    # Kong would replace before it appends, the reverse of the step order
+    assert compose_transforms({'append': {'headers': ['x:1']}}, {'replace': {'headers': ['x:2']}}) is None
+    assert compose_transforms({'add': {'headers': ['x:1']}}, {'remove': {'headers': ['X']}}) is None
+    optimized, stats = optimize_plugins({'plugins': [_transformer('AM-1', append=['x:1']), _transformer('AM-2', replace=['x:2'])]})
+    assert len(optimized['plugins']) == 2 and stats['conflicts'][0]['plugin'] == 'request-transformer'
+
+def test_scope_with_a_conflict_is_left_unchanged():
+    plugins = [_transformer('AM-1', add=['x-a:1']), _transformer('AM-2', add=['x-b:1']), _transformer('AM-3', replace=['x-a:2'])]
+    optimized, stats = optimize_plugins({'plugins': plugins})
+    assert optimized['plugins'] == plugins
+    assert stats['merged'] == 0 and len(stats['conflicts']) == 1
+
+def test_later_add_keeps_earlier_value():
+    merged = compose_transforms({'add': {'headers': ['x:1']}}, {'add': {'headers': ['X:2', 'y:2']}})
+    assert merged['add']['headers'] == ['x:1', 'y:2']
+
+def test_identical_route_plugins_hoisted_to_service():
+    routes = [{'name': name, 'service': {'name': 'svc'}} for name in ('r1', 'r2')]
+    acl = {'name': 'acl', 'config': {'allow': ['gold']}}
+    plugins = [dict(acl, route=name) for name in ('r1', 'r2')] + [{'name': 'cors', 'route': 'r1', 'config': {}}]
+    optimized, stats = optimize_plugins({'routes': routes, 'plugins': plugins})
+    assert optimized['plugins'] == [{'name': 'acl', 'config': {'allow': ['gold']}, 'service': 'svc'},
+                                    {'name': 'cors', 'route': 'r1', 'config': {}}]
+    assert stats['hoisted'] == 1
+
+def test_merge_plugin_configs_keeps_order_and_inputs():
+    first = {'origins': ['b', 'a'], 'headers': {'x': 1}}
+    merged = merge_plugin_configs(first, {'origins': ['c', 'a'], 'headers': {'y': 2}})
+    assert merged == {'origins': ['b', 'a', 'c'], 'headers': {'x': 1, 'y': 2}}
+    assert first == {'origins': ['b', 'a'], 'headers': {'x': 1}}
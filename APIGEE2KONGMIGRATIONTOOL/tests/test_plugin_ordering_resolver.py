@@ -0,0 +1,41 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from plugin_ordering_resolver import resolve_bundle_ordering, resolve_ordering
+from verify_kong_output import verify_plugin_ordering
+
+PROXY = '''<ProxyEndpoint name="default">
+  <PreFlow><Request>
+    <Step><Name>AM-Tenant</Name></Step>
+    <Step><Name>VerifyKey</Name></Step>
+  </Request></PreFlow>
+  <Flows><Flow name="orders"><Condition>proxy.pathsuffix MatchesPath "/orders"</Condition>
+    <Request><Step><Name>Quota-1</Name></Step><Step><Name>CORS-1</Name></Step></Request></Flow></Flows>
+  <HTTPProxyConnection><BasePath>/v1</BasePath></HTTPProxyConnection>
+</ProxyEndpoint>'''
+
+def _plugin(name, policy):
+    return {'name': name, 'service': 'svc', 'tags': ['apigee-migrated', f"apigee-policy:{policy}"]}
+
+def test_ordering_only_where_priority_differs(tmp_path):
+    bundle = tmp_path / 'orders'
+    (bundle / 'apiproxy/proxies').mkdir(parents=True)
+    (bundle / 'apiproxy/proxies/default.xml').write_text(PROXY)
+    plugins = [_plugin('request-transformer', 'AM-Tenant'), _plugin('key-auth', 'VerifyKey'),
+               _plugin('rate-limiting-advanced', 'Quota-1'), _plugin('cors', 'CORS-1')]
+    result = resolve_bundle_ordering(str(bundle), plugins)
+    # key-auth (1250) -> rate-limiting-advanced (910) already holds; the other two edges need ordering
+    assert result['ordering'] == {'request-transformer': {'before': {'access': ['key-auth']}},
+                                  'rate-limiting-advanced': {'before': {'access': ['cors']}}}
+    assert result['order'] == ['request-transformer', 'key-auth', 'rate-limiting-advanced', 'cors']
+    assert result['applied'] == 2 and 'ordering' not in plugins[1]
+    assert verify_plugin_ordering({'plugins': plugins}, result['ordering']) == (True, [])
+    del plugins[0]['ordering']
+    assert verify_plugin_ordering({'plugins': plugins}, result['ordering']) == (True, ['plugin:request-transformer in service:svc'])
+
+def test_cycles_are_reported_not_ordered():
+    result = resolve_ordering({('acl', 'request-transformer'): [], ('request-transformer', 'acl'): [], ('acl', 'cors'): []})
+    assert result['cycles'] == [{'plugins': ['acl', 'request-transformer'],
+                                 'edges': [['acl', 'request-transformer'], ['request-transformer', 'acl']]}]
+    assert result['ordering'] == {'acl': {'before': {'access': ['cors']}}}
+    assert result['order'] == ['acl', 'cors', 'request-transformer']
@@ -0,0 +1,53 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from route_index import RouteIndex, is_blocking, literal_prefix
+from deck_writer import DeckWriter, load_deck_file, merge_deck_files
+
+def test_literal_prefix_of_generated_regex_paths():
+    assert literal_prefix('~^/orders(?=/items/[^/]*$)') == ('/orders', '(?=/items/[^/]*$)', True)
+    assert literal_prefix('~^/v1\\-beta(?=/x$)')[0] == '/v1-beta'
+    assert literal_prefix('/orders') == ('/orders', '', False)
+
+def test_duplicates_shadowing_and_ambiguity():
+    index = RouteIndex()
+    index.add_route({'name': 'default', 'paths': ['/orders']}, 'a/kong.yaml')
+    index.add_route({'name': 'default', 'paths': ['/orders'], 'methods': ['GET']}, 'b/kong.yaml')
+    index.add_route({'name': 'all', 'paths': ['~^/orders(?=(?:/.*)?$)'], 'methods': ['GET'], 'regex_priority': 9}, 'c/kong.yaml')
+    index.add_route({'name': 'item', 'paths': ['~^/orders(?=/items/[^/]*$)'], 'regex_priority': 5}, 'a/kong.yaml')
+    index.add_route({'name': 'list', 'paths': ['~^/orders(?=/list$)'], 'regex_priority': 5}, 'b/kong.yaml')
+    findings = {(f['kind'], tuple(f['routes'])): f['methods'] for f in index.conflicts()}
+    assert findings[('duplicate', ('a/kong.yaml:default', 'b/kong.yaml:default'))] == ['GET']
+    assert findings[('shadowed', ('c/kong.yaml:all', 'a/kong.yaml:item'))] == ['GET']
+    assert findings[('shadowed', ('c/kong.yaml:all', 'b/kong.yaml:default'))] == ['GET']
+    assert findings[('ambiguous', ('a/kong.yaml:item', 'b/kong.yaml:list'))] == ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS', 'HEAD']
+
+def test_assigned_priorities_are_deterministic_and_merged(tmp_path):
+    paths = []
+    for bundle, routes in (('b', [{'name': 'deep', 'paths': ['~^/orders/v2(?=/x$)'], 'regex_priority': 2}]),
+                           ('a', [{'name': 'base', 'paths': ['/orders']},
+                                  {'name': 'shallow', 'paths': ['~^/orders(?=/x$)'], 'regex_priority': 7}])):
+        path = str(tmp_path / bundle / 'kong.yaml')
+        with DeckWriter(path) as writer:
+            for route in routes:
+                writer.add_route(route)
+        paths.append(path)
+    index = RouteIndex()
+    for path in reversed(paths):
+        index.add_deck_file(path)
+    priorities = index.assign_priorities()
+    assert priorities[(paths[1], 'base')] == 0
+    assert priorities[(paths[1], 'shallow')] == 1 and priorities[(paths[0], 'deep')] == 2
+    merge_deck_files(paths, str(tmp_path / 'workspace.yaml'), route_priorities=priorities)
+    merged = {r['name']: r['regex_priority'] for r in load_deck_file(str(tmp_path / 'workspace.yaml'))['routes'] if 'regex_priority' in r}
+    assert merged == {'deep': 2, 'base': 0, 'shallow': 1}
+
+def test_duplicate_names_block_the_merge():
+    index = RouteIndex()
+    index.add_route({'name': 'orders.default', 'paths': ['/orders']}, 'a/kong.yaml')
+    index.add_route({'name': 'orders.default', 'paths': ['/orders-v2']}, 'b/kong.yaml')
+    findings = index.conflicts()
+    assert [(f['kind'], f['path'], f['routes']) for f in findings] == [
+        ('duplicate_name', 'orders.default', ['a/kong.yaml:orders.default', 'b/kong.yaml:orders.default'])]
+    assert is_blocking(findings)
+    assert not is_blocking([{'kind': 'shadowed'}, {'kind': 'ambiguous'}])
@@ -0,0 +1,83 @@
+
+import os
+import sys
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import stage_scheduler
+from stage_scheduler import stage
+
+def test_scheduler_orders_skips_and_dedupes():
+    calls = []
+    lock = threading.Lock()
+    produced = {'a': [], 'b': []}
+    resolvers = {
+        'source': lambda: ['in.zip'],
+        'a': lambda: produced['a'],
+        'b': lambda: produced['b'],
+        'never': lambda: [],
+    }
+
+    def recorder(name, output=None):
+        def run(module, inputs):
+            with lock:
+                calls.append(name)
+            if output:
+                produced[output].append(name)
+        return run
+
+    stages = [
+        stage('config_loaded', 'config_loaded', ['source'], ['a'], recorder('config_loaded', 'a')),
+        stage('config-loaded', 'config-loaded', ['source'], ['a'], recorder('config-loaded', 'a')),
+        stage('left', 'config_loaded', ['a'], ['b'], recorder('left', 'b')),
+        stage('right', 'config_loaded', ['a'], [], recorder('right')),
+        stage('final', 'config_loaded', ['b'], [], recorder('final')),
+        stage('orphan', 'config_loaded', ['never'], [], recorder('orphan')),
+    ]
+    results = stage_scheduler.run_stages(stages, max_workers=2, resolvers=resolvers)
+    assert 'config-loaded' not in results and 'config-loaded' not in calls
+    assert calls[0] == 'config_loaded' and calls[-1] == 'final'
+    assert set(calls) == {'config_loaded', 'left', 'right', 'final'}
+    assert results['orphan']['status'] == 'skipped'
+
+def test_scheduler_rejects_cycles():
+    stages = [
+        stage('one', 'config_loaded', ['y'], ['x'], None),
+        stage('two', 'config_loaded', ['x'], ['y'], None),
+    ]
+    try:
+        stage_scheduler.stage_dependencies(stages)
+    except ValueError as e:
+        assert 'cycle' in str(e)
+    else:
+        assert False, 'cycle not detected'
+
+def test_default_graph_only_consumes_produced_artifacts():
+    produced = {'input_zips'}
+    for s in stage_scheduler.STAGES:
+        assert set(s['inputs']) <= produced, s['name']
+        produced.update(s['outputs'])
+    assert 'duplicate_plugin_handler' not in {s['name'] for s in stage_scheduler.STAGES}
+
+def test_bundle_stages_share_one_parse(tmp_path, monkeypatch):
+    import bundle_model
+    import parallel_bundle_executor
+    monkeypatch.setenv('OTHER__BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(parallel_bundle_executor, 'get_output_dir', lambda: str(tmp_path / 'outputs'))
+    bundle = tmp_path / 'apigeeapiunzipped' / 'orders'
+    (bundle / 'apiproxy' / 'proxies').mkdir(parents=True)
+    (bundle / 'apiproxy' / 'apiproxy.xml').write_text('<APIProxy name="orders"><Name>orders</Name></APIProxy>')
+    (bundle / 'apiproxy' / 'proxies' / 'default.xml').write_text(
+        '<ProxyEndpoint name="default"><HTTPProxyConnection><BasePath>/orders</BasePath></HTTPProxyConnection></ProxyEndpoint>')
+    bundle_dir = str(bundle)
+    parses = []
+    init = bundle_model.BundleModel.__init__
+    def counting_init(self, bundle):
+        parses.append(bundle)
+        init(self, bundle)
+    monkeypatch.setattr(bundle_model.BundleModel, '__init__', counting_init)
+    stage_scheduler._BUNDLE_MODELS.clear()
+    inputs = {'unzipped_bundles': [bundle_dir]}
+    for run in (stage_scheduler._run_xml2json, stage_scheduler._run_structure, stage_scheduler._run_deck):
+        run(parallel_bundle_executor, inputs)
+    assert len(parses) == 1
+    assert os.path.exists(os.path.join(str(tmp_path / 'outputs'), 'orders', 'kong.yaml'))
@@ -0,0 +1,18 @@
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import template_registry
+
+def test_templates_compiled_once_and_shared(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__TEMPLATE_CACHE_DIR', str(tmp_path / 'bytecode'))
+    template_dir = tmp_path / 'templates'
+    template_dir.mkdir()
+    (template_dir / 'cors.j2').write_text("name: {{ name }}\n{% if enabled %}\nenabled: true\n{% endif %}\n")
+    (template_dir / 'notes.txt').write_text('not a template')
+    assert template_registry.precompile_all(str(template_dir)) == 1
+    first = template_registry.get_template('cors', str(template_dir))
+    assert template_registry.get_template('cors.j2', str(template_dir)) is first
+    assert template_registry.render('cors', {'name': 'cors', 'enabled': True}, str(template_dir)) == "name: cors\nenabled: true\n"
+    assert os.listdir(tmp_path / 'bytecode')
+    template_registry.clear()
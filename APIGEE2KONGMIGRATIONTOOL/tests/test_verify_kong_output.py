@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import verify_kong_output
+from verify_kong_output import collect_files, verify_files
+
+GOOD = '''_format_version: "3.0"
+services:
+- name: orders
+  host: orders.internal
+  plugins:
+  - name: cors
+    config: {origins: ["*"]}
+'''
+BAD = GOOD.replace('origins: ["*"]', 'origins: "*"')
+
+def write_estate(root):
+    for name, content in (('orders', GOOD), ('payments', BAD), ('users', GOOD)):
+        os.makedirs(root / name)
+        (root / name / 'kong.yaml').write_text(content)
+    (root / 'users' / 'notes.txt').write_text('not a kong file')
+
+def test_estate_report(tmp_path):
+    write_estate(tmp_path)
+    paths = collect_files([str(tmp_path)])
+    assert [os.path.basename(os.path.dirname(p)) for p in paths] == ['orders', 'payments', 'users']
+    report = verify_files(paths + [str(tmp_path / 'missing.yaml')], max_workers=2)
+    assert [r['status'] for r in report['files']] == ['passed', 'failed', 'passed', 'error']
+    assert report['summary']['files'] == 4 and report['summary']['passed'] == 2 and report['summary']['failed'] == 2
+    assert all(r['duration'] >= 0 for r in report['files'])
+
+def test_main_exit_code_and_reports(tmp_path, monkeypatch):
+    write_estate(tmp_path)
+    for report_name in ('report.json', 'report.html'):
+        monkeypatch.setattr(sys, 'argv', ['verify_kong_output.py', str(tmp_path / '*' / 'kong.yaml'),
+                                          '--workers', '1', '--report', str(tmp_path / report_name)])
+        with pytest.raises(SystemExit) as exit_info:
+            verify_kong_output.main()
+        assert exit_info.value.code == 1
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['summary']['failed'] == 1
+    assert 'payments' in (tmp_path / 'report.html').read_text()
+    monkeypatch.setattr(sys, 'argv', ['verify_kong_output.py', str(tmp_path / 'orders'), '--workers', '1'])
+    with pytest.raises(SystemExit) as exit_info:
+        verify_kong_output.main()
+    assert exit_info.value.code == 0
@@ -0,0 +1,24 @@
+
+import os
+import sys
+import json
+import xml.etree.ElementTree as ET
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from xml_node import XmlNode, XmlNodeEncoder, node_from_element, EMPTY_ATTRIB, EMPTY_CHILDREN
+from apigee_bundle_xml2json import xml_to_dict
+
+XML = '<Quota name="Q-1"><Allow count="10"/><Interval>1</Interval><TimeUnit> minute </TimeUnit><Distributed/></Quota>'
+
+def test_node_serialises_like_xml_to_dict():
+    root = ET.fromstring(XML)
+    node = node_from_element(root)
+    assert json.dumps(node, indent=2, cls=XmlNodeEncoder) == json.dumps(xml_to_dict(root), indent=2)
+    assert node == xml_to_dict(root)
+    assert node['children'][2]['text'] == 'minute' and node.get('missing') is None
+
+def test_leaves_share_sentinels_and_interned_tags():
+    node = node_from_element(ET.fromstring(XML))
+    distributed = node.children[3]
+    assert distributed.attrib is EMPTY_ATTRIB and distributed.children is EMPTY_CHILDREN
+    assert node.children[1].tag is XmlNode('Interval').tag
+    assert not hasattr(node, '__dict__')
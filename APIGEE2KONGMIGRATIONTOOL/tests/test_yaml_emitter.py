@@ -0,0 +1,57 @@
+
+import os
+import sys
+import json
+import yaml
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+import yaml_emitter
+from proxyendpoint2service import render_kong_routes
+from apigee_policy2cors import render_plugin
+
+TEMPLATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../templates'))
+ROUTE = {'name': 'default', 'paths': ['/orders/{id}'], 'methods': ['GET'], 'strip_path': True,
+         'preserve_host': False, 'protocols': ['http', 'https'], 'hosts': [], 'regex_priority': 0, 'tags': ['a"b']}
+
+def test_dict_emission_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__OUTPUT_FORMAT', 'yaml')
+    path = str(tmp_path / 'routes.yaml')
+    render_kong_routes([dict(ROUTE), dict(ROUTE, name='second')], 'orders', TEMPLATE_DIR, path)
+    with open(path) as f:
+        docs = list(yaml.safe_load_all(f))
+    assert [d['route']['name'] for d in docs] == ['route.default', 'route.second']
+    # Values the string templates would have to quote by hand survive intact
+    assert docs[0]['route']['tags'] == ['a"b'] and docs[0]['route']['service'] == 'orders'
+
+def test_json_and_template_formats(tmp_path, monkeypatch):
+    config = {'origins': ['*'], 'methods': [], 'headers': [], 'exposed_headers': [], 'credentials': False, 'max_age': 0}
+    json_path = str(tmp_path / 'cors.json')
+    render_plugin('cors', config, 'orders', TEMPLATE_DIR, json_path, output_format='json')
+    with open(json_path) as f:
+        assert json.load(f)['plugin']['config']['origins'] == ['*']
+    monkeypatch.setenv('OTHER__OUTPUT_FORMAT', 'template')
+    template_path = str(tmp_path / 'cors.yaml')
+    render_plugin('cors', config, 'orders', TEMPLATE_DIR, template_path)
+    assert yaml_emitter.load(template_path)['plugin']['service'] == 'orders'
+
+def test_dict_emission_keeps_template_defaults(tmp_path, monkeypatch):
+    monkeypatch.setenv('OTHER__OUTPUT_FORMAT', 'yaml')
+    path = str(tmp_path / 'http_log.yaml')
+    plugin = {'name': 'http_log', 'config': {'http_endpoint': 'https://logs.example.com', 'timeout': 5000}}
+    yaml_emitter.render_or_emit('http_log', plugin, path, TEMPLATE_DIR, root_key='plugin')
+    config = yaml_emitter.load(path)['plugin']['config']
+    assert config == {'http_endpoint': 'https://logs.example.com', 'timeout': 5000, 'method': 'POST', 'keepalive': 60000}
+
+def test_service_emission_matches_template(tmp_path):
+    from targetendpoint2service import render_kong_service
+    service = {'name': 'orders', 'url': 'https://orders.internal/v1', 'host': 'orders.internal', 'tags': ['apigee-migrated']}
+    documents = {}
+    for fmt in ('yaml', 'template'):
+        path = str(tmp_path / f'{fmt}.yaml')
+        render_kong_service([dict(service)], TEMPLATE_DIR, path, output_format=fmt)
+        documents[fmt] = yaml_emitter.load(path)['service']
+    assert documents['yaml'] == documents['template']
+    assert documents['yaml']['name'] == 'service.orders' and documents['yaml']['retries'] == 5
+
+def test_template_is_the_default_format(monkeypatch):
+    monkeypatch.delenv('OTHER__OUTPUT_FORMAT', raising=False)
+    assert yaml_emitter.get_output_format() == 'template'
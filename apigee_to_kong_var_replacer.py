@@ -1,47 +1,290 @@
 import re
 import sys
 import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-# Mapping: Apigee pattern (as regex) -> Kong replacement (with group references)
-PATTERNS = [
+# Lua string literals and comments: copied verbatim, never rewritten
+SKIP = (
+    r'--\[(?P<lc>=*)\[.*?\](?P=lc)\]'       # --[[ long comment ]]
+    r'|--[^\n]*'                             # -- line comment
+    r'|\[(?P<ls>=*)\[.*?\](?P=ls)\]'         # [[ long string ]]
+    r'|"(?:[^"\\\n]|\\.)*"'                  # "string"
+    r"|'(?:[^'\\\n]|\\.)*'"                  # 'string'
+)
+QUOTED = r'"(?:[^"\\\n]|\\.)*"|' r"'(?:[^'\\\n]|\\.)*'"
+NAME = r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*'
+VALUE = QUOTED + r'|' + NAME + r'|-?\d+(?:\.\d+)?'
+
+# Mapping: Apigee construct (name, regex up to its arguments, argument count) -> Kong replacement
+# ({0}, {1} are the converted arguments; flow variables are resolved through variablesmapper.json instead)
+CONSTRUCTS = [
     # 1. context.getVariable('X') or context.getVariable("X") or context.getVariable(X)
-    (r'context\.getVariable\s*\(\s*([\'"])(.*?)\1\s*\)', r'kong.request.get_query_arg("\2")'), # literal string
-    (r'context\.getVariable\s*\(\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\)', r'kong.request.get_query_arg(\1)'), # variable
+    ('get', r'context\.getVariable\s*\(', 1, None),
+    # 2. context.setVariable('X', value) or context.setVariable(X, value)
+    ('set', r'context\.setVariable\s*\(', 2, None),
+    # 3. request.headers['X'] or request.headers[X]
+    ('reqh', r'request\.headers\s*\[', 1, 'kong.request.get_header({0})'),
+    # 4. response.headers['X'] or response.headers[X]
+    ('resh', r'response\.headers\s*\[', 1, 'kong.response.get_header({0})'),
+    # 5. request.content()
+    ('body', r'request\.content\s*\(\s*\)', 0, 'kong.request.get_raw_body()'),
+    # 6. response.content = value (rest of the statement)
+    ('setbody', r'response\.content\s*=(?!=)\s*', 0, 'kong.response.set_raw_body({0})'),
+    # 7. print(
+    ('print', r'print\s*\(', 0, 'kong.log.inspect('),
+    # 8. throw(
+    ('throw', r'throw\s*\(', 0, 'error('),
+]
+REPLACEMENTS = {name: replacement for name, _, _, replacement in CONSTRUCTS}
+ARITY = {name: arity for name, _, arity, _ in CONSTRUCTS if arity}
+CLOSERS = {'get': ')', 'set': ')', 'reqh': ']', 'resh': ']'}
+# Every construct starts with one of these words; sources without any are returned untouched
+KEYWORDS = ('context', 'request', 'response', 'print', 'throw')
 
-    # 2. context.setVariable('X', value) or context.setVariable("X", value) or context.setVariable(X, value)
-    (r'context\.setVariable\s*\(\s*([\'"])(.*?)\1\s*,\s*([^)]+)\)', r'kong.service.request.set_header("\2", \3)'), # literal string
-    (r'context\.setVariable\s*\(\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*,\s*([^)]+)\)', r'kong.service.request.set_header(\1, \2)'), # variable
+def _fast_form(name, head, arity):
+    # The common case, plain names and values as arguments, matched in full by the tokenizer itself
+    args = [rf'\s*(?P<{name}_0>{QUOTED}|{NAME})\s*'] + [rf',\s*(?P<{name}_1>{VALUE})\s*'][:arity - 1]
+    return rf'(?P<{name}_fast>{head}{"".join(args)}\{CLOSERS[name]})'
 
-    # 3. request.headers['X'] or request.headers["X"] or request.headers[X]
-    (r'request\.headers\s*\[\s*([\'"])(.*?)\1\s*\]', r'kong.request.get_header("\2")'), # literal string
-    (r'request\.headers\s*\[\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\]', r'kong.request.get_header(\1)'), # variable
+FAST_FORMS = {f'{name}_fast': (name, [f'{name}_{i}' for i in range(arity)]) for name, arity in ARITY.items()}
 
-    # 4. response.headers['X'] or response.headers["X"] or response.headers[X]
-    (r'response\.headers\s*\[\s*([\'"])(.*?)\1\s*\]', r'kong.response.get_header("\2")'), # literal string
-    (r'response\.headers\s*\[\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\]', r'kong.response.get_header(\1)'), # variable
+# Everything else, consumed in bulk: punctuation runs, strings and comments, .. and ::, member accesses
+# (obj.print( is not a construct) and identifiers that do not start one (mycontext.getVariable( is not either)
+PLAIN = (
+    r'(?:[^-\["\'A-Za-z_.:]+'
+    r'|' + SKIP +
+    r'|\.\.+|::'
+    r'|[.:]\s*(?:[A-Za-z_]\w*)?'
+    r'|(?!' + '|'.join(head for _, head, _, _ in CONSTRUCTS) + r')[A-Za-z_]\w*'
+    r'|-(?!-)|\[(?!=*\[))*'
+)
+# One precompiled pattern: each match is a plain run followed by a construct, a stray character (unterminated
+# quote or long bracket) or the end, so the source is rewritten in a single left-to-right scan
+TOKEN = re.compile(
+    PLAIN + r'(?:'
+    + '|'.join(_fast_form(name, head, arity) for name, head, arity, _ in CONSTRUCTS if arity) + '|'
+    + '|'.join(f'(?P<{name}>{head})' for name, head, _, _ in CONSTRUCTS)
+    + r'|(?P<other>.)|(?P<end>\Z))',
+    re.DOTALL)
 
-    # 5. request.content()
-    (r'request\.content\s*\(\s*\)', r'kong.request.get_raw_body()'),
+# Tokens that matter while scanning the arguments of a construct
+ARG_TOKEN = re.compile(r'[^-\["\'()\[\]{},;\nA-Za-z_]*(?:(?P<skip>' + SKIP + r')|(?P<punct>[()\[\]{},;\n])'
+                       r'|(?P<word>[A-Za-z_]\w*)|(?P<other>.)|\Z)', re.DOTALL)
+# Keywords that cannot occur inside an expression: a statement without ';' ends before them (... = "a" end)
+STATEMENT_KEYWORDS = {'end', 'else', 'elseif', 'until', 'then', 'do', 'local', 'return', 'break', 'goto',
+                      'if', 'for', 'while', 'repeat'}
+OPENERS = {'(': ')', '[': ']', '{': '}'}
+QUOTED_LITERAL = re.compile(QUOTED)
 
-    # 6. response.content = value
-    (r'response\.content\s*=\s*([^\n]+)', r'kong.response.set_raw_body(\1)'),
+# Flow variables: mappers/variablesmapper.json maps Apigee names (apiproxy.name, request.header, ...) to Kong
+# targets. Targets the PDK can read or write become accessor calls, prefix entries take the rest of the name
+# (request.header.Accept -> kong.request.get_header("Accept")). Every other target (kong.request.uri,
+# kong.service.name, ...) has no PDK accessor, so it is read and written in kong.ctx.shared under its Apigee name,
+# like unmapped or computed names, where the flow's other steps find them.
+DEFAULT_MAPPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'APIGEE2KONGMIGRATIONTOOL', 'mappers', 'variablesmapper.json')
+PDK_GETTERS = {
+    'kong.request.scheme': 'kong.request.get_scheme()',
+    'kong.request.host': 'kong.request.get_host()',
+    'kong.request.port': 'kong.request.get_port()',
+    'kong.request.method': 'kong.request.get_method()',
+    'kong.request.path': 'kong.request.get_path()',
+    'kong.request.query': 'kong.request.get_query()',
+    'kong.request.headers': 'kong.request.get_headers()',
+    'kong.request.body': 'kong.request.get_raw_body()',
+    'kong.response.status': 'kong.response.get_status()',
+    'kong.response.headers': 'kong.response.get_headers()',
+    'kong.client.ip': 'kong.client.get_ip()',
+    'kong.client.port': 'kong.client.get_port()',
+}
+PDK_SETTERS = {
+    'kong.request.scheme': 'kong.service.request.set_scheme({0})',
+    'kong.request.method': 'kong.service.request.set_method({0})',
+    'kong.request.path': 'kong.service.request.set_path({0})',
+    'kong.request.query': 'kong.service.request.set_query({0})',
+    'kong.request.body': 'kong.service.request.set_raw_body({0})',
+    'kong.response.status': 'kong.response.set_status({0})',
+}
+COLLECTION_GETTERS = {
+    'kong.request.headers': 'kong.request.get_header({0})',
+    'kong.request.query': 'kong.request.get_query_arg({0})',
+    'kong.response.headers': 'kong.response.get_header({0})',
+}
+COLLECTION_SETTERS = {
+    'kong.request.headers': 'kong.service.request.set_header({0}, {1})',
+    'kong.response.headers': 'kong.response.set_header({0}, {1})',
+}
+SHARED = 'kong.ctx.shared[{0}]'
 
-    # 7. print(
-    (r'\bprint\s*\(', r'kong.log.inspect('),
+def build_variable_trie(mapping):
+    """
+    Trie over the dot-separated segments of the Apigee variable names; the None key of a node holds its target.
+    Lookups cost one dict step per segment of the looked-up name, however large the mapper grows.
+    """
+    root = {}
+    for name, target in mapping.items():
+        node = root
+        for segment in name.split('.'):
+            node = node.setdefault(segment, {})
+        node[None] = target
+    return root
 
-    # 8. throw(
-    (r'\bthrow\s*\(', r'error('),
-]
+def resolve_variable(trie, name):
+    """
+    Longest mapped prefix of a variable name: (Kong target, remaining name) or (None, name) when nothing matches.
+    """
+    segments = name.split('.')
+    node, target, used = trie, None, 0
+    for i, segment in enumerate(segments):
+        node = node.get(segment)
+        if node is None:
+            break
+        if None in node:
+            target, used = node[None], i + 1
+    return target, '.'.join(segments[used:])
+
+@lru_cache(maxsize=None)
+def load_variable_mapper(mapper_path=DEFAULT_MAPPER):
+    """
+    Variable trie and content digest of a variables mapper, loaded once per process.
+    """
+    with open(mapper_path, 'rb') as f:
+        data = f.read()
+    return build_variable_trie(json.loads(data).get('apigee_variables', {})), hashlib.sha256(data).hexdigest()
+
+def lua_string(text):
+    return f'"{text}"' if '"' not in text else f"'{text}'"
+
+def literal_name(arg):
+    # The variable name of a converted argument, or None when it is computed at runtime
+    return arg[1:-1] if arg[:1] in ('"', "'") and QUOTED_LITERAL.fullmatch(arg) else None
 
-def apigee_to_kong_lua(lua_code):
-    for pat, repl in PATTERNS:
-        lua_code = re.sub(pat, repl, lua_code)
-    return lua_code
+def variable_read(arg, trie):
+    name = literal_name(arg)
+    target, rest = resolve_variable(trie, name) if name is not None else (None, '')
+    if target is not None and rest and target in COLLECTION_GETTERS:
+        return COLLECTION_GETTERS[target].format(lua_string(rest))
+    if target is not None and not rest and target in PDK_GETTERS:
+        return PDK_GETTERS[target]
+    return SHARED.format(arg)
 
-def process_file(input_file, output_file=None):
+def variable_write(arg, value, trie):
+    name = literal_name(arg)
+    target, rest = resolve_variable(trie, name) if name is not None else (None, '')
+    if target is not None and rest and target in COLLECTION_SETTERS:
+        return COLLECTION_SETTERS[target].format(lua_string(rest), value)
+    if target is not None and not rest and target in PDK_SETTERS:
+        return PDK_SETTERS[target].format(value)
+    return f"{SHARED.format(arg)} = {value}"
+
+def render(kind, args, trie):
+    if kind == 'get':
+        return variable_read(args[0], trie)
+    if kind == 'set':
+        return variable_write(args[0], args[1], trie)
+    return REPLACEMENTS[kind].format(*args)
+
+def scan_args(code, pos, closer):
+    """
+    Split the balanced argument list starting at `pos` on top-level commas, skipping strings and comments.
+    `closer` is ')' or ']' for a call or index, or '\n' for the rest of a statement (ended by ';', a comment or a
+    block keyword too).
+    Returns (argument spans, end index of the argument list) or None when the list is not closed.
+    """
+    stack, args, start = [], [], pos
+    while True:
+        m = ARG_TOKEN.match(code, pos)
+        if m.lastgroup is None:
+            if closer != '\n' or stack:
+                return None
+            end = len(code)
+            break
+        pos = m.end()
+        char = m.group('punct')
+        if char is None:
+            if closer == '\n' and not stack and (m.group('skip') or '').startswith('--'):
+                end = m.start('skip')
+                break
+            if closer == '\n' and not stack and m.group('word') in STATEMENT_KEYWORDS:
+                end = m.start('word')
+                break
+        elif char in OPENERS:
+            stack.append(OPENERS[char])
+        elif stack:
+            if char == stack[-1]:
+                stack.pop()
+            elif char in ')]}':
+                return None
+        elif char == ',' and closer != '\n':
+            args.append((start, m.start('punct')))
+            start = pos
+        elif char == closer or (closer == '\n' and char == ';'):
+            end = m.start('punct')
+            break
+        elif char in ')]}':
+            return None
+    args.append((start, end))
+    return args, end
+
+def quote_name(text):
+    # Names are emitted double quoted unless that would break the literal
+    if text[0] in '\'"' and '"' not in text[1:-1]:
+        return f'"{text[1:-1]}"'
+    return text
+
+def convert_arg(text, trie):
+    text = text.strip()
+    if QUOTED_LITERAL.fullmatch(text):
+        return quote_name(text)
+    return apigee_to_kong_lua(text, trie)
+
+def apigee_to_kong_lua(lua_code, trie=None):
+    if not any(word in lua_code for word in KEYWORDS):
+        return lua_code
+    trie = load_variable_mapper()[0] if trie is None else trie
+    out, pos, match = [], 0, TOKEN.match
+    while True:
+        m = match(lua_code, pos)
+        kind = m.lastgroup
+        if kind == 'end':
+            out.append(lua_code[pos:])
+            return ''.join(out)
+        out.append(lua_code[pos:m.start(kind)])
+        pos = m.end()
+        if kind == 'other':
+            out.append(m.group(kind))
+        elif kind in FAST_FORMS:
+            kind, groups = FAST_FORMS[kind]
+            out.append(render(kind, [quote_name(m.group(group)) for group in groups], trie))
+        elif kind in ARITY:
+            scanned = scan_args(lua_code, pos, CLOSERS[kind])
+            if scanned and len(scanned[0]) == ARITY[kind] and lua_code[slice(*scanned[0][-1])].strip():
+                spans, end = scanned
+                out.append(render(kind, [convert_arg(lua_code[a:b], trie) for a, b in spans], trie))
+                pos = end + 1
+            else:
+                # Not a form we understand: keep it and carry on inside the arguments
+                out.append(m.group(kind))
+        elif kind == 'setbody':
+            scanned = scan_args(lua_code, pos, '\n')
+            value = lua_code[scanned[0][0][0]:scanned[1]] if scanned else ''
+            stripped = value.rstrip()
+            if stripped:
+                end = scanned[1]
+                out.append(REPLACEMENTS[kind].format(apigee_to_kong_lua(stripped, trie)) + value[len(stripped):])
+                pos = end
+            else:
+                out.append(m.group(kind))
+        else:
+            out.append(REPLACEMENTS[kind])
+
+def process_file(input_file, output_file=None, mapper_path=DEFAULT_MAPPER):
     with open(input_file, "r", encoding="utf-8") as f:
         lua_code = f.read()
-    converted = apigee_to_kong_lua(lua_code)
+    converted = apigee_to_kong_lua(lua_code, load_variable_mapper(mapper_path)[0])
     if not output_file:
         base, ext = os.path.splitext(input_file)
         output_file = f"{base}_kong{ext}"
@@ -49,10 +292,99 @@ def process_file(input_file, output_file=None):
         f.write(converted)
     print(f"Converted file written to: {output_file}")
 
+# Directory mode: converted files go to a mirrored tree; the manifest there records the content hash of every
+# converted input, so unchanged inputs are skipped on the next run, and the error of every file that failed.
+# Bump RULES_VERSION when the rewrite changes; a changed variables mapper invalidates the manifest too.
+RULES_VERSION = '5'
+MANIFEST_NAME = '.kong_replacer_manifest.json'
+DEFAULT_EXTENSIONS = ('.lua',)
+
+def discover_files(input_dir, extensions=DEFAULT_EXTENSIONS, exclude_dir=None):
+    """
+    Relative paths of all files with the given extensions under input_dir, skipping *_kong outputs of single-file
+    mode and the output tree when it lies inside input_dir.
+    """
+    exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+    found = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude_dir)
+        for name in sorted(files):
+            base, ext = os.path.splitext(name)
+            if ext in extensions and not base.endswith('_kong'):
+                found.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return found
+
+def _convert_job(job):
+    input_path, output_path, previous_digest, mapper_path = job
+    try:
+        with open(input_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == previous_digest and os.path.exists(output_path):
+            return digest, 'unchanged', None
+        converted = apigee_to_kong_lua(data.decode('utf-8'), load_variable_mapper(mapper_path)[0])
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(converted)
+        return digest, 'converted', None
+    except Exception as e:
+        # One bad file must not stop the pool: it is reported and the other files are still converted
+        return None, 'failed', f"{type(e).__name__}: {e}"
+
+def _load_manifest(output_dir, version):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('files', {}) if manifest.get('version') == version else {}
+
+def process_directory(input_dir, output_dir=None, workers=None, extensions=DEFAULT_EXTENSIONS, mapper_path=DEFAULT_MAPPER):
+    """
+    Rewrite every matching file under input_dir into a mirrored tree, in parallel worker processes.
+    Returns a summary: {'output_dir', 'converted', 'unchanged', 'failed': [(relative path, error)]}.
+    """
+    output_dir = output_dir or f"{os.path.normpath(input_dir)}_kong"
+    files = discover_files(input_dir, extensions, exclude_dir=output_dir)
+    version = f"{RULES_VERSION}:{load_variable_mapper(mapper_path)[1]}"
+    previous = _load_manifest(output_dir, version)
+    jobs = [(os.path.join(input_dir, rel), os.path.join(output_dir, rel), previous.get(rel), mapper_path) for rel in files]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_convert_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [_convert_job(job) for job in jobs]
+    summary = {'output_dir': output_dir, 'converted': 0, 'unchanged': 0, 'failed': []}
+    manifest = {}
+    for rel, (digest, status, error) in zip(files, results):
+        if status == 'failed':
+            summary['failed'].append((rel, error))
+            continue
+        summary[status] += 1
+        manifest[rel] = digest
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump({'version': version, 'files': manifest, 'failed': dict(summary['failed'])}, f, indent=1, sort_keys=True)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite Apigee JavaScript constructs in Lua files to Kong PDK calls.")
+    parser.add_argument('input', help="Lua file, or directory searched recursively")
+    parser.add_argument('output', nargs='?', help="Output file, or output directory (default: <input_dir>_kong)")
+    parser.add_argument('--workers', type=int, help="Worker processes in directory mode (default: CPU count)")
+    parser.add_argument('--ext', action='append', help="File extension to convert in directory mode; repeatable (default: .lua)")
+    parser.add_argument('--mapper', default=DEFAULT_MAPPER, help="Apigee -> Kong variables mapper (default: mappers/variablesmapper.json)")
+    args = parser.parse_args()
+    if not os.path.isdir(args.input):
+        process_file(args.input, args.output, args.mapper)
+        return
+    summary = process_directory(args.input, args.output, args.workers, tuple(args.ext or DEFAULT_EXTENSIONS), args.mapper)
+    for rel, error in summary['failed']:
+        print(f"Failed: {rel}: {error}")
+    print(f"{summary['converted']} converted, {summary['unchanged']} unchanged, {len(summary['failed'])} failed: "
+          f"{summary['output_dir']}")
+    sys.exit(1 if summary['failed'] else 0)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python apigee_to_kong_var_replacer.py <input_lua_file> [output_lua_file]")
-        sys.exit(1)
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    process_file(input_file, output_file)
\ No newline at end of file
+    main()